@@ -0,0 +1,451 @@
+"""
+本机HTTP/WebSocket服务：在浏览器中查看sf_stats_array帧和信道统计表
+
+只依赖标准库asyncio，默认只监听127.0.0.1，无界面的实验室机器上通过ssh端口转发即可查看。
+
+HTTP接口：
+    GET /                          浏览器客户端
+    GET /api/meta                  帧布局和当前帧范围（JSON）
+    GET /api/tables                rx_total_parse输出的信道统计表（JSON）
+    GET /api/frames?start=&stop=   [start, stop)帧的原始int8数据（二进制）
+
+WebSocket /ws：
+    客户端发送 {"since": 帧号, "follow": true/false}
+    服务端发送二进制消息：<II头（起始帧号、帧数）+ 帧数据；每帧对每个连接只发送一次，
+    follow模式下有新帧就只推送新增部分。表格变化时发送 {"type": "tables", ...} 文本消息。
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlparse
+
+from rssi_success_rate import FrameSource, FrameStream
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+# 一条WebSocket消息最多携带的帧数，大的历史分批发送
+MAX_FRAMES_PER_MESSAGE = 1024
+FRAME_HEADER = struct.Struct('<II')
+POLL_INTERVAL = 0.2
+# 停止时等待WebSocket连接发送关闭帧并退出的时间（秒），超时的连接直接取消
+SHUTDOWN_TIMEOUT = 1.0
+
+
+class FrameServer:
+    """
+    向浏览器提供帧数据和统计表
+
+    frames可以是FrameSource（解析完成后的静态数据）或FrameStream（实时数据，由服务线程负责drain）。
+    tables是返回{表名: {"headers": [...], "rows": [...]}}的函数，每次轮询都会重新取，解析过程中表格可以逐步出现。
+    它在服务线程中调用，返回的必须是生产者不会再修改的快照（例如在锁内复制，见rx_total_parse.snapshot_summary_tables）。
+    """
+
+    def __init__(self, frames: FrameSource, tables: Optional[Callable[[], dict]] = None,
+                 host: str = '127.0.0.1', port: int = 8765):
+        self.frames = frames
+        self.tables = tables or dict
+        self.host = host
+        self.port = port
+        self._loop = None
+        self._stop = None
+        self._clients = set()  # 每个WebSocket连接的唤醒事件
+        self._handlers = set()  # 正在处理的连接任务，停止时等待它们结束
+        self._thread = None
+        self._tables_json = '{}'
+        self.ready = threading.Event()
+
+    # ---- 帧范围（绝对帧号，实时模式下最旧的帧被覆盖后起点会前移）----
+    def first_frame(self) -> int:
+        if isinstance(self.frames, FrameStream):
+            return self.frames.received - len(self.frames)
+        return 0
+
+    def end_frame(self) -> int:
+        return self.first_frame() + len(self.frames)
+
+    def frame_bytes(self, start: int, stop: int) -> bytes:
+        first = self.first_frame()
+        start = max(start, first)
+        stop = min(stop, self.end_frame())
+        if stop <= start:
+            return b''
+        return self.frames._block(start - first, stop - first).tobytes()
+
+    def meta(self) -> dict:
+        return {
+            'num_channels': self.frames.num_channels,
+            'rx_hist_max': self.frames.rx_hist_max,
+            'values_per_frame': self.frames.values_per_frame,
+            'dtype': self.frames.dtype.str,
+            'first': self.first_frame(),
+            'end': self.end_frame(),
+            'live': isinstance(self.frames, FrameStream) and not self.frames.closed,
+        }
+
+    # ---- 运行 ----
+    def run(self) -> None:
+        """在当前线程运行，直到stop()或Ctrl+C"""
+        try:
+            asyncio.run(self._serve())
+        except KeyboardInterrupt:
+            pass
+
+    def start(self) -> 'FrameServer':
+        """在后台线程运行，返回时已开始监听"""
+        self._thread = threading.Thread(target=self.run, name='frame-server', daemon=True)
+        self._thread.start()
+        self.ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join()
+
+    def wait(self) -> None:
+        """阻塞到服务线程结束，Ctrl+C时停止服务"""
+        try:
+            while self._thread.is_alive():
+                self._thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stop()
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._tables_json = json.dumps(self.tables())
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        print(f"帧数据服务已启动: http://{self.host}:{self.port}/")
+        self.ready.set()
+        poller = asyncio.create_task(self._poll())
+        async with server:
+            await self._stop.wait()
+            poller.cancel()
+            await self._close_connections()
+        await asyncio.gather(poller, return_exceptions=True)
+
+    async def _close_connections(self) -> None:
+        """唤醒所有WebSocket连接让它们发送关闭帧后退出，超时仍未结束的连接取消，全部等待结束"""
+        for wakeup in self._clients:
+            wakeup.set()
+        handlers = set(self._handlers)
+        if not handlers:
+            return
+        _, pending = await asyncio.wait(handlers, timeout=SHUTDOWN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    async def _poll(self) -> None:
+        """实时数据源在这里drain；有新帧或表格变化时唤醒所有follow连接"""
+        while True:
+            changed = False
+            if isinstance(self.frames, FrameStream):
+                added, _ = self.frames.drain()
+                changed = added > 0
+            tables_json = json.dumps(self.tables())
+            if tables_json != self._tables_json:
+                self._tables_json = tables_json
+                changed = True
+            if changed:
+                for wakeup in self._clients:
+                    wakeup.set()
+            await asyncio.sleep(POLL_INTERVAL)
+
+    # ---- HTTP ----
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            await self._handle_request(reader, writer)
+        except asyncio.CancelledError:
+            # 停止服务时被取消：正常结束连接任务（Python 3.11的start_server对被取消的任务也会调用
+            # task.exception()并打印CancelledError）
+            writer.close()
+        finally:
+            self._handlers.discard(task)
+
+    async def _handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            writer.close()
+            return
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        url = urlparse(target)
+        try:
+            if url.path == '/ws' and headers.get('upgrade', '').lower() == 'websocket':
+                await self._websocket(reader, writer, headers)
+                return
+            if method != 'GET':
+                await self._respond(writer, 405, 'text/plain', b'Method Not Allowed')
+            elif url.path == '/':
+                await self._respond(writer, 200, 'text/html; charset=utf-8', CLIENT_HTML.encode('utf-8'))
+            elif url.path == '/api/meta':
+                await self._respond(writer, 200, 'application/json', json.dumps(self.meta()).encode())
+            elif url.path == '/api/tables':
+                await self._respond(writer, 200, 'application/json', self._tables_json.encode())
+            elif url.path == '/api/frames':
+                query = parse_qs(url.query)
+                start = int(query.get('start', [self.first_frame()])[0])
+                stop = int(query.get('stop', [self.end_frame()])[0])
+                start = max(start, self.first_frame())
+                await self._respond(writer, 200, 'application/octet-stream', self.frame_bytes(start, stop),
+                                    {'X-First-Frame': str(start)})
+            else:
+                await self._respond(writer, 404, 'text/plain', b'Not Found')
+        except ValueError:
+            await self._respond(writer, 400, 'text/plain', b'Bad Request')
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status: int, content_type: str, body: bytes, extra: dict = None) -> None:
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}[status]
+        header_lines = [f'HTTP/1.1 {status} {reason}', f'Content-Type: {content_type}',
+                        f'Content-Length: {len(body)}', 'Cache-Control: no-store', 'Connection: close']
+        header_lines += [f'{name}: {value}' for name, value in (extra or {}).items()]
+        writer.write(('\r\n'.join(header_lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    # ---- WebSocket ----
+    async def _websocket(self, reader, writer, headers: dict) -> None:
+        accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + WS_GUID).encode()).digest())
+        writer.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                     b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        await writer.drain()
+
+        # 连接状态：下一帧要发送的帧号、是否跟随新帧、已发送的表格
+        state = {'next': None, 'follow': False, 'tables': None}
+        wakeup = asyncio.Event()
+
+        async def read_control():
+            try:
+                while True:
+                    opcode, payload = await _read_ws_message(reader)
+                    if opcode == 0x8:
+                        return
+                    if opcode == 0x9:
+                        await _send_ws(writer, 0xA, payload)
+                    elif opcode == 0x1:
+                        request = json.loads(payload)
+                        state['next'] = int(request.get('since', self.first_frame()))
+                        state['follow'] = bool(request.get('follow', False))
+                        wakeup.set()
+            finally:
+                wakeup.set()
+
+        self._clients.add(wakeup)
+        control = asyncio.create_task(read_control())
+        try:
+            await _send_ws(writer, 0x1, json.dumps({'type': 'meta', **self.meta()}).encode())
+            wakeup.set()
+            while True:
+                await wakeup.wait()
+                wakeup.clear()
+                if control.done():
+                    break
+                if self._stop.is_set():
+                    # 服务停止：发送关闭帧（1001 going away）后退出
+                    await _send_ws(writer, 0x8, struct.pack('>H', 1001))
+                    break
+                if state['tables'] != self._tables_json:
+                    state['tables'] = self._tables_json
+                    await _send_ws(writer, 0x1, ('{"type": "tables", "tables": %s}' % self._tables_json).encode())
+                if state['next'] is None:
+                    continue
+                # 被覆盖的帧无法再补发，从当前最旧的帧继续
+                state['next'] = max(state['next'], self.first_frame())
+                while state['next'] < self.end_frame():
+                    start = state['next']
+                    stop = min(self.end_frame(), start + MAX_FRAMES_PER_MESSAGE)
+                    await _send_ws(writer, 0x2, FRAME_HEADER.pack(start, stop - start) + self.frame_bytes(start, stop))
+                    state['next'] = stop
+                if not state['follow']:
+                    state['next'] = None
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.discard(wakeup)
+            control.cancel()
+            await asyncio.gather(control, return_exceptions=True)
+
+
+async def _read_ws_message(reader: asyncio.StreamReader):
+    """读取一条（可能分片的）客户端消息，返回(opcode, payload)"""
+    opcode = None
+    payload = b''
+    while True:
+        first, second = await reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length, = struct.unpack('>H', await reader.readexactly(2))
+        elif length == 127:
+            length, = struct.unpack('>Q', await reader.readexactly(8))
+        mask = await reader.readexactly(4) if second & 0x80 else b'\0\0\0\0'
+        data = bytearray(await reader.readexactly(length))
+        for i in range(length):
+            data[i] ^= mask[i & 3]
+        frame_opcode = first & 0x0F
+        if frame_opcode >= 0x8:
+            return frame_opcode, bytes(data)  # 控制帧不分片
+        if frame_opcode != 0:
+            opcode = frame_opcode
+        payload += data
+        if first & 0x80:
+            return opcode, payload
+
+
+async def _send_ws(writer: asyncio.StreamWriter, opcode: int, payload: bytes) -> None:
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('>BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('>BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('>BBQ', 0x80 | opcode, 127, length)
+    writer.write(header + payload)
+    await writer.drain()
+
+
+CLIENT_HTML = r"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>RSSI Tracker</title>
+<style>
+body { font-family: sans-serif; margin: 12px; }
+#bar { display: flex; gap: 12px; align-items: center; margin-bottom: 8px; }
+#pos { flex: 1; }
+canvas { border: 1px solid #ccc; display: block; margin-bottom: 6px; }
+table { border-collapse: collapse; font-size: 12px; margin: 8px 0 16px 0; }
+td, th { border: 1px solid #ccc; padding: 2px 6px; text-align: right; }
+</style></head>
+<body>
+<div id="bar">
+  <span id="status">connecting...</span>
+  <input id="pos" type="range" min="0" max="0" value="0">
+  <label><input id="follow" type="checkbox" checked> follow</label>
+</div>
+<canvas id="scan" width="1200" height="160"></canvas>
+<canvas id="delta" width="1200" height="160"></canvas>
+<canvas id="count" width="1200" height="160"></canvas>
+<canvas id="hist" width="1200" height="160"></canvas>
+<div id="tables"></div>
+<script>
+// 帧按服务端发来的帧号保存：实时模式下被覆盖的帧会被服务端跳过，帧号不一定连续
+let meta = null, frames = new Map(), first = 0, last = -1, current = 0;
+const pos = document.getElementById('pos'), follow = document.getElementById('follow');
+
+function bars(id, values, lo, hi, color, bottoms) {
+  const c = document.getElementById(id), g = c.getContext('2d');
+  if (!bottoms) g.clearRect(0, 0, c.width, c.height);
+  const n = values.length, w = c.width / n, y = v => c.height * (hi - v) / (hi - lo);
+  for (let i = 0; i < n; i++) {
+    const base = bottoms ? bottoms[i] : Math.min(Math.max(0, lo), hi);
+    const top = base + values[i];
+    g.fillStyle = typeof color === 'function' ? color(i, values[i]) : color;
+    g.fillRect(i * w + 1, Math.min(y(base), y(top)), w - 2, Math.abs(y(top) - y(base)));
+  }
+}
+
+function draw() {
+  const f = frames.get(current);
+  if (!f) {
+    document.getElementById('status').textContent = `Frame ${current + 1} not received (${first + 1}-${last + 1})`;
+    return;
+  }
+  const n = meta.num_channels, part = k => f.subarray(k * n, (k + 1) * n);
+  const scan = part(0), act = part(1), ok = part(2), fail = part(3), afh = part(4);
+  const has = i => ok[i] > 0 || fail[i] > 0;
+  bars('scan', scan, -100, -30, i => afh[i] === 1 ? 'purple' : 'blue');
+  bars('delta', Array.from(scan, (s, i) => has(i) ? act[i] - s : 0), -40, 40, (i, d) => d > 0 ? '#4CAF50' : '#F44336');
+  let countMax = 20;
+  for (let i = 0; i < n; i++) countMax = Math.max(countMax, ok[i] + fail[i]);
+  bars('count', ok, 0, countMax, '#4CAF50');
+  bars('count', fail, 0, countMax, '#F44336', ok);
+  const hist = f.subarray(5 * n), c = document.getElementById('hist'), g = c.getContext('2d');
+  g.clearRect(0, 0, c.width, c.height);
+  g.strokeStyle = 'teal'; g.beginPath();
+  let started = false;
+  hist.forEach((v, i) => {
+    if (v === 0) return;
+    const x = c.width * i / hist.length, y = c.height * (-30 - v) / 70;
+    started ? g.lineTo(x, y) : g.moveTo(x, y); started = true;
+  });
+  g.stroke();
+  document.getElementById('status').textContent = `Frame ${current + 1} (${first + 1}-${last + 1})`;
+}
+
+function renderTables(tables) {
+  const root = document.getElementById('tables');
+  root.innerHTML = '';
+  for (const [name, t] of Object.entries(tables)) {
+    const h = document.createElement('h3'); h.textContent = name; root.appendChild(h);
+    const table = document.createElement('table');
+    table.innerHTML = '<tr>' + t.headers.map(x => `<th>${x}</th>`).join('') + '</tr>' +
+      t.rows.map(r => '<tr>' + r.map(x => `<td>${x}</td>`).join('') + '</tr>').join('');
+    root.appendChild(table);
+  }
+}
+
+const ws = new WebSocket(`ws://${location.host}/ws`);
+ws.binaryType = 'arraybuffer';
+ws.onopen = () => ws.send(JSON.stringify({since: 0, follow: true}));
+ws.onclose = () => document.getElementById('status').textContent += ' (disconnected)';
+ws.onmessage = ev => {
+  if (typeof ev.data === 'string') {
+    const msg = JSON.parse(ev.data);
+    if (msg.type === 'meta') meta = msg;
+    if (msg.type === 'tables') renderTables(msg.tables);
+    return;
+  }
+  const head = new DataView(ev.data, 0, 8), start = head.getUint32(0, true), count = head.getUint32(4, true);
+  const size = meta.values_per_frame;
+  if (count === 0) return;
+  if (last < 0 || start < first) first = start;
+  last = Math.max(last, start + count - 1);
+  for (let k = 0; k < count; k++) frames.set(start + k, new Int8Array(ev.data, 8 + k * size, size));
+  pos.min = first; pos.max = last;
+  if (follow.checked) { current = last; pos.value = current; draw(); }
+};
+pos.oninput = () => { follow.checked = false; current = Number(pos.value); draw(); };
+follow.onchange = () => { if (follow.checked && last >= 0) { current = last; pos.value = current; draw(); } };
+</script>
+</body></html>
+"""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='本机帧数据服务')
+    parser.add_argument('frames', help='rx_total_parse.py --frames保存的帧文件')
+    parser.add_argument('--channels', type=int, default=None,
+                        help='每帧的信道数（默认读取帧文件的.layout.json，没有时为80）')
+    parser.add_argument('--rx-hist', type=int, default=None,
+                        help='每帧的RX历史长度（默认读取帧文件的.layout.json，没有时为2000）')
+    parser.add_argument('--tables', help='rx_total_parse.py --tables保存的统计表JSON')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址（默认只允许本机访问）')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    args = parser.parse_args()
+
+    tables = {}
+    if args.tables:
+        with open(args.tables, 'r', encoding='utf-8') as f:
+            tables = json.load(f)
+    FrameServer(FrameSource.from_file(args.frames, args.channels, args.rx_hist),
+                tables=lambda: tables, host=args.host, port=args.port).run()
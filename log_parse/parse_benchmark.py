@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+rx_total_parse 解析吞吐量基准测试
+
+generate: 生成指定大小的合成日志（rx total / ble_rxall / all_scan / afh_ch_map / ch_hist / afh_sco_data_stats）
+run:      分阶段测量解析流水线（行分类、十六进制解码、记录解码、统计更新、输出）的 MB/s、records/s 和峰值RSS
+
+用法:
+    python parse_benchmark.py generate synthetic.log --size 100MB
+    python parse_benchmark.py run synthetic.log --json bench.json
+    python parse_benchmark.py run --generate 10MB --ble
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from tabulate import tabulate
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STAGES = ['classify', 'hex_decode', 'record_decode', 'stats_update', 'output']
+
+BYTES_PER_LINE = 16
+SCAN_BLOCK_SIZES = {'all_scan': 40 * 4 + 1, 'all_rssi': 40 * 8 + 1, 'all_rssi2': 81, 'all_rssi6': 40 * 6 + 1}
+# rx_state中各错误位（BR/EDR和BLE分别取值）
+BR_ERROR_STATES = np.array([0x01, 0x02, 0x04, 0x80, 0x20], dtype=np.uint8)
+BLE_ERROR_STATES = np.array([0x01, 0x02, 0x04, 0x08, 0x10, 0x20, 0x40, 0x80], dtype=np.uint8)
+
+
+def parse_size(text: str) -> int:
+    """解析 "10MB"、"1.5GB"、"512K" 形式的大小为字节数"""
+    match = re.fullmatch(r'\s*([0-9.]+)\s*([KMG]?)B?\s*', text, re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid size: {text}")
+    scale = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}[match.group(2).upper()]
+    return int(float(match.group(1)) * scale)
+
+
+def peak_rss_mb():
+    """当前进程的峰值RSS（MB），不支持的平台返回None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+class SyntheticLogGenerator:
+    """按评估周期生成与设备日志格式一致的合成日志"""
+
+    def __init__(self, ble=False, records=300, loss=0.2, channel_dist='afh', afh_channels=20,
+                 rssi_mean=-70.0, rssi_std=8.0, scan_block='all_scan', ch_hist_every=5,
+                 cycle_ms=1000, seed=0):
+        self.ble = ble
+        self.records = records
+        self.loss = loss
+        self.channel_dist = channel_dist
+        self.num_channels = 40 if ble else 79
+        self.afh_channels = min(afh_channels, self.num_channels)
+        self.rssi_mean = rssi_mean
+        self.rssi_std = rssi_std
+        self.scan_block = scan_block
+        self.ch_hist_every = ch_hist_every
+        self.cycle_ms = cycle_ms
+        self.rng = np.random.default_rng(seed)
+        self.cycle = 0
+        self.sco_total = 0
+        self.sco_error = 0
+        self.sco_crc = 0
+
+    def _timestr(self) -> str:
+        ms = self.cycle * self.cycle_ms
+        return f"{ms // 3600000 % 100:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}:{ms % 1000:03d}"
+
+    def _dump(self, name: str, data: bytes, timestr: str) -> str:
+        """按 "D/HEX <name>: xxxx-yyyy: .." 的十六进制转储格式输出一个数据块"""
+        hex_str = data.hex(' ').upper()
+        step = BYTES_PER_LINE * 3
+        lines = []
+        for offset in range(0, len(data), BYTES_PER_LINE):
+            prefix = f"[{timestr}] D/HEX {name}: " if offset == 0 else f"[{timestr}] "
+            chunk = hex_str[offset // BYTES_PER_LINE * step:(offset // BYTES_PER_LINE + 1) * step].rstrip()
+            lines.append(f"{prefix}{offset:04X}-{offset + BYTES_PER_LINE:04X}: {chunk}\n")
+        lines.append(f"[{timestr}] I/bt dump end\n")
+        return ''.join(lines)
+
+    def _used_channels(self) -> np.ndarray:
+        if self.channel_dist == 'uniform':
+            return np.arange(self.num_channels)
+        return np.sort(self.rng.choice(self.num_channels, self.afh_channels, replace=False))
+
+    def _channel_map(self, used: np.ndarray) -> bytes:
+        bits = np.zeros(80, dtype=np.uint8)
+        if self.ble:
+            # RF信道 -> BLE数据信道索引
+            index = np.where(used <= 11, used - 1, used - 2)
+            bits[index[(used != 0) & (used != 12) & (used < 39)]] = 1
+            return np.packbits(bits[:40], bitorder='little').tobytes()
+        bits[used] = 1
+        afh_map = np.packbits(bits, bitorder='little').tobytes()
+        suggest = self.rng.choice([0x55, 0xFF, 0x00, 0xD7], 10).astype(np.uint8).tobytes()
+        return bytes(4) + afh_map + suggest + bytes(4)
+
+    def _rx_records(self, used: np.ndarray) -> bytes:
+        n = self.records
+        record_size = 6 if self.ble else 4
+        records = np.zeros((n, record_size), dtype=np.uint8)
+        rssi = np.clip(np.rint(self.rng.normal(self.rssi_mean, self.rssi_std, n)), -120, -1)
+        records[:, 0] = (rssi + 255).astype(np.uint8)
+        lost = self.rng.random(n) < self.loss
+        errors = BLE_ERROR_STATES if self.ble else BR_ERROR_STATES
+        records[:, 1] = np.where(lost, self.rng.choice(errors, n), 0)
+        channel = self.rng.choice(used, n).astype(np.uint8)
+        is_audio = (self.rng.random(n) < 0.5).astype(np.uint8)
+        records[:, 2] = channel | (is_audio << 7)
+        self.sco_total += n
+        self.sco_error += int(lost.sum())
+        self.sco_crc += int((lost & (records[:, 1] == 0x04)).sum())
+        return n.to_bytes(2, 'little') + records.tobytes()
+
+    def next_cycle(self) -> str:
+        """生成一个评估周期的日志文本"""
+        timestr = self._timestr()
+        used = self._used_channels()
+        parts = []
+        scan_size = SCAN_BLOCK_SIZES[self.scan_block]
+        scan = np.clip(np.rint(self.rng.normal(-75, 10, scan_size)), -100, -30).astype(np.int8)
+        rx = self._rx_records(used)
+        if self.ble:
+            parts.append(self._dump('ble_ch_map', self._channel_map(used), timestr))
+            parts.append(self._dump(self.scan_block, scan.tobytes(), timestr))
+            parts.append(self._dump('ble_rxall', rx, timestr))
+        else:
+            parts.append(f"[{timestr}] I/audio plc_afh_sco_data_stats "
+                         f"{self.sco_total} {self.sco_error} {self.sco_crc}\n")
+            parts.append(self._dump('afh_ch_map', self._channel_map(used), timestr))
+            parts.append(self._dump(self.scan_block, scan.tobytes(), timestr))
+            if self.ch_hist_every and self.cycle % self.ch_hist_every == 0:
+                ch_hist = self.rng.integers(-8, 8, 79 * 8).astype(np.int8)
+                parts.append(self._dump('ch_hist', ch_hist.tobytes(), timestr))
+            parts.append(self._dump('rx total', rx, timestr))
+        self.cycle += 1
+        return ''.join(parts)
+
+    def write(self, path: str, size: int) -> int:
+        """写入合成日志直到文件达到指定字节数，返回实际字节数"""
+        written = 0
+        with open(path, 'w', newline='\n') as outfile:
+            while written < size:
+                text = self.next_cycle()
+                outfile.write(text)
+                written += len(text)
+        return written
+
+
+def _decoder(rtp, ble):
+    if ble:
+        return rtp.decode_ble_rx_total, rtp.write_ble_rx_total_rows
+    return rtp.decode_rx_total, rtp.write_rx_total_rows
+
+
+def run_pipeline(path: str, last_stage: str, ble: bool) -> dict:
+    """
+    在当前进程中运行解析流水线直到 last_stage，分别累计各阶段耗时
+
+    阶段划分与 parse_file/process_rx_total 一致：
+        classify      - D/HEX行分类和地址匹配
+        hex_decode    - 十六进制字节提取与数据块收集
+        record_decode - 数据块解码（rx记录及扫描/AFH等块的处理函数）
+        stats_update  - ChannelStatsArray 统计更新与历史合并
+        output        - CSV行写入和统计表格打印
+    """
+    import rx_total_parse as rtp
+
+    stop = STAGES.index(last_stage)
+    max_channel = 39 if ble else 79
+    rtp.MAX_CHANNELS = max_channel
+    rtp.group_counter = 1
+    rtp.hist_array = rtp.ChannelStatsArray(max_channel=max_channel)
+    rtp.last_array = rtp.ChannelStatsArray(max_channel=max_channel)
+    rx_type = rtp.BLOCK_TYPES_BY_NAME['ble_rxall' if ble else 'rx total']
+    decode, write_rows = _decoder(rtp, ble)
+
+    elapsed = dict.fromkeys(STAGES[:stop + 1], 0.0)
+    records = 0
+    devnull = open(os.devnull, 'w', newline='')
+    writer = csv.writer(devnull)
+    state = {'block_type': None, 'bytes': [], 'timestr': ''}
+
+    def finish_block():
+        nonlocal records
+        block_type, bytes_list = state['block_type'], state['bytes']
+        state['block_type'] = None
+        if block_type is None or len(bytes_list) < 2:
+            return
+        total_groups = (int(bytes_list[1], 16) << 8) | int(bytes_list[0], 16)
+        data_bytes = block_type.payload(bytes_list, total_groups)
+        if block_type is rx_type:
+            records += len(data_bytes) // block_type.size
+        if stop < 2:
+            return
+
+        t0 = time.perf_counter()
+        if block_type is not rx_type:
+            if block_type.handler is not None:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    block_type.handler(data_bytes, writer, state['timestr'], block_type.tag)
+            elapsed['record_decode'] += time.perf_counter() - t0
+            return
+        channels = decode(data_bytes, state['timestr'])
+        t1 = time.perf_counter()
+        elapsed['record_decode'] += t1 - t0
+        if stop < 3:
+            return
+
+        stats_array = rtp.ChannelStatsArray(max_channel=max_channel)
+        for item in channels:
+            stats_array.update(item)
+        stats_array.clear_low_access_channels()
+        stats_array.get_success_rate_rssi()
+        rtp.hist_array.update_from_history(stats_array)
+        t2 = time.perf_counter()
+        elapsed['stats_update'] += t2 - t1
+        if stop < 4:
+            rtp.last_array = stats_array
+            return
+
+        write_rows(writer, channels)
+        with contextlib.redirect_stdout(devnull):
+            rtp.last_array.print_all_with_selected([], "Removed", detailed=True)
+            stats_array.print_stats(detailed=True)
+        rtp.last_array = stats_array
+        elapsed['output'] += time.perf_counter() - t2
+
+    file_size = os.path.getsize(path)
+    with open(path, 'r') as infile:
+        for line in infile:
+            t0 = time.perf_counter()
+            is_header = "D/HEX" in line
+            block_type = rtp.classify_block(line) if is_header else None
+            addr_match = rtp.addr_pattern.search(line)
+            t1 = time.perf_counter()
+            elapsed['classify'] += t1 - t0
+            if stop < 1:
+                continue
+
+            if is_header or (state['block_type'] is not None and not addr_match):
+                finish_block()
+                t1 = time.perf_counter()
+                if is_header and addr_match and block_type is not None:
+                    state['block_type'] = block_type
+                    state['timestr'] = rtp.time_pattern.findall(line)[0]
+                    state['bytes'] = rtp.byte_pattern.findall(line[addr_match.end():])
+            elif state['block_type'] is not None:
+                state['bytes'].extend(rtp.byte_pattern.findall(line[addr_match.end():]))
+            elapsed['hex_decode'] += time.perf_counter() - t1
+        finish_block()
+    devnull.close()
+
+    return {'stage': last_stage, 'elapsed': elapsed, 'records': records,
+            'bytes': file_size, 'peak_rss_mb': peak_rss_mb()}
+
+
+def run_parse_file(path: str, ble: bool) -> dict:
+    """端到端运行 parse_file（标准输出被丢弃），作为各阶段之和的对照"""
+    import rx_total_parse as rtp
+
+    max_channel = 39 if ble else 79
+    rtp.MAX_CHANNELS = max_channel
+    rtp.hist_array = rtp.ChannelStatsArray(max_channel=max_channel)
+    rtp.last_array = rtp.ChannelStatsArray(max_channel=max_channel)
+    t0 = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        rtp.parse_file(path, os.devnull)
+    return {'stage': 'parse_file', 'elapsed': {'parse_file': time.perf_counter() - t0},
+            'bytes': os.path.getsize(path), 'peak_rss_mb': peak_rss_mb()}
+
+
+def _in_fresh_process(func, *args):
+    # 每个阶段在独立的spawn进程中运行，保证峰值RSS互不影响
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(func, *args).result()
+
+
+def benchmark(path: str, ble: bool, end_to_end: bool = True) -> list:
+    """依次测量每个阶段，返回结果行列表"""
+    results = []
+    records = 0
+    for stage in STAGES:
+        result = _in_fresh_process(run_pipeline, path, stage, ble)
+        records = max(records, result['records'])
+        results.append({'stage': stage, 'seconds': result['elapsed'][stage],
+                        'bytes': result['bytes'], 'peak_rss_mb': result['peak_rss_mb']})
+    if end_to_end:
+        result = _in_fresh_process(run_parse_file, path, ble)
+        results.append({'stage': 'parse_file', 'seconds': result['elapsed']['parse_file'],
+                        'bytes': result['bytes'], 'peak_rss_mb': result['peak_rss_mb']})
+    for row in results:
+        row['records'] = records
+        row['mb_per_s'] = row['bytes'] / (1024 * 1024) / row['seconds'] if row['seconds'] > 0 else float('inf')
+        row['records_per_s'] = records / row['seconds'] if row['seconds'] > 0 else float('inf')
+    return results
+
+
+def print_results(results: list) -> None:
+    table = [[row['stage'], f"{row['seconds']:.3f}", f"{row['mb_per_s']:.2f}", f"{row['records_per_s']:.0f}",
+              "N/A" if row['peak_rss_mb'] is None else f"{row['peak_rss_mb']:.1f}"]
+             for row in results]
+    print(tabulate(table, headers=["Stage", "Time (s)", "MB/s", "Records/s", "Peak RSS (MB)"], tablefmt="pretty"))
+
+
+def add_generator_args(parser):
+    parser.add_argument('--ble', action='store_true', default=False, help='生成BLE日志（ble_rxall/ble_ch_map）')
+    parser.add_argument('--records', type=int, default=300, help='每个rx块的记录数（默认300）')
+    parser.add_argument('--loss', type=float, default=0.2, help='rx记录出错概率 0-1（默认0.2）')
+    parser.add_argument('--channel-dist', choices=['afh', 'uniform'], default='afh',
+                        help='afh: 每周期随机选取 --afh-channels 个信道; uniform: 所有信道均匀分布')
+    parser.add_argument('--afh-channels', type=int, default=20, help='afh分布下每周期使用的信道数（默认20）')
+    parser.add_argument('--rssi-mean', type=float, default=-70.0, help='rx RSSI均值 dBm（默认-70）')
+    parser.add_argument('--rssi-std', type=float, default=8.0, help='rx RSSI标准差 dB（默认8）')
+    parser.add_argument('--scan-block', choices=sorted(SCAN_BLOCK_SIZES), default='all_scan',
+                        help='扫描RSSI块类型（默认all_scan）')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+
+
+def make_generator(args) -> SyntheticLogGenerator:
+    return SyntheticLogGenerator(ble=args.ble, records=args.records, loss=args.loss,
+                                 channel_dist=args.channel_dist, afh_channels=args.afh_channels,
+                                 rssi_mean=args.rssi_mean, rssi_std=args.rssi_std,
+                                 scan_block=args.scan_block, seed=args.seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='rx_total_parse 解析吞吐量基准测试')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    gen_parser = subparsers.add_parser('generate', help='生成合成日志')
+    gen_parser.add_argument('output', help='输出日志文件路径')
+    gen_parser.add_argument('--size', type=parse_size, default=parse_size('10MB'), help='目标大小，如10MB、1GB（默认10MB）')
+    add_generator_args(gen_parser)
+
+    run_parser = subparsers.add_parser('run', help='分阶段测量解析吞吐量')
+    run_parser.add_argument('input', nargs='?', default=None, help='日志文件路径（与 --generate 二选一）')
+    run_parser.add_argument('--generate', type=parse_size, default=None, metavar='SIZE',
+                            help='先生成指定大小的临时合成日志再测量')
+    run_parser.add_argument('--no-end-to-end', action='store_true', default=False,
+                            help='不运行端到端 parse_file 对照')
+    run_parser.add_argument('--json', type=str, default=None, help='将结果写入JSON文件，便于跟踪回归')
+    add_generator_args(run_parser)
+
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        start = time.perf_counter()
+        written = make_generator(args).write(args.output, args.size)
+        print(f"Generated {written / (1024 * 1024):.1f} MB in {time.perf_counter() - start:.1f}s -> {args.output}")
+        sys.exit(0)
+
+    temp_path = None
+    if args.generate is not None:
+        fd, temp_path = tempfile.mkstemp(suffix='.log')
+        os.close(fd)
+        make_generator(args).write(temp_path, args.generate)
+        input_path = temp_path
+    elif args.input is not None:
+        input_path = args.input
+    else:
+        parser.error('run requires an input log or --generate SIZE')
+
+    try:
+        results = benchmark(input_path, args.ble, end_to_end=not args.no_end_to_end)
+    finally:
+        if temp_path is not None:
+            os.remove(temp_path)
+
+    print(f"Input: {input_path} ({results[0]['bytes'] / (1024 * 1024):.1f} MB, {results[0]['records']} rx records)")
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'input': input_path, 'ble': args.ble, 'results': results}, f, indent=2)
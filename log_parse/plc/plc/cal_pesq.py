@@ -1,9 +1,36 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import numpy as np
 from scipy.io import wavfile
 from pesq import pesq
 
+# 批处理目录中的文件名格式：<error_rate>_<variant>.wav，例如 10_without_plc.wav、10_with_plc_g711.wav
+BATCH_WAV_PATTERN = re.compile(r'^(\d+)_(.+)\.wav$', re.IGNORECASE)
+RESULT_HEADERS = ['error_rate', 'variant', 'path', 'pesq', 'error']
+# 超过这个大小的参考音频用内存映射读取，不整体读入内存
+MMAP_THRESHOLD_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_PATH = 'pesq_cache.json'
+# 分段打分的默认窗长和步长（秒）
+DEFAULT_WINDOW_SECONDS = 8.0
+DEFAULT_HOP_SECONDS = 4.0
+# 对齐参考/测试信号时搜索的最大延迟（秒）
+MAX_ALIGN_SECONDS = 0.5
+ALIGN_PREFIX_SECONDS = 20.0   # 估计延迟时只对开头这么长的信号做互相关
+SEGMENT_HEADERS = ['file', 'start_s', 'end_s', 'pesq']
+# 快速代理指标：名称 -> 是否越大越好
+PROXY_METRICS = {'seg_snr': True, 'lsd': False, 'spectral_convergence': False}
+PROXY_HEADERS = RESULT_HEADERS + list(PROXY_METRICS) + ['proxy_rank']
+SEG_SNR_RANGE = (-10.0, 35.0)   # 分段信噪比每帧的截断范围（dB）
+
 def calculate_pesq(reference_path, test_path, sample_rate=8000):
     """
     计算参考音频和测试音频之间的PESQ分数
@@ -16,55 +43,531 @@ def calculate_pesq(reference_path, test_path, sample_rate=8000):
     返回:
         PESQ分数（范围：-0.5 ~ 4.5）
     """
-    # 读取WAV文件
-    ref_rate, ref_signal = wavfile.read(reference_path)
-    test_rate, test_signal = wavfile.read(test_path)
-    
-    # 检查采样率是否一致
-    if ref_rate != test_rate:
-        raise ValueError(f"采样率不匹配: 参考文件 {ref_rate} Hz, 测试文件 {test_rate} Hz")
-    
-    # 检查是否支持该采样率
-    if ref_rate not in [8000, 16000]:
-        raise ValueError(f"不支持的采样率 {ref_rate} Hz，仅支持8000或16000 Hz")
-    
-    # 确保音频是单声道（PESQ要求）
-    if len(ref_signal.shape) > 1:
-        ref_signal = ref_signal[:, 0]  # 取左声道
-    if len(test_signal.shape) > 1:
-        test_signal = test_signal[:, 0]  # 取左声道
-    
-    # 计算PESQ分数
-    score = pesq(ref_rate, ref_signal, test_signal, 'nb')  # 'wb'表示宽带(16kHz), 'nb'表示窄带(8kHz)
-    return score
+    # 单次调用；重复打分请直接使用PesqScorer，避免每次重新读取参考音频
+    return PesqScorer(reference_path).score(test_path)
+
+def read_wav_mono(path, mmap=False):
+    """读取WAV文件，多声道时取左声道，返回(采样率, 一维信号)"""
+    rate, signal = wavfile.read(path, mmap=mmap)
+    if len(signal.shape) > 1:
+        signal = signal[:, 0]  # 取左声道
+    return rate, signal
+
+def file_digest(path, chunk_size=1 << 20):
+    """文件内容的SHA-1，用作分数缓存的键"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def estimate_delay(reference, test, max_lag, prefix=None):
+    """
+    用FFT互相关估计测试信号相对参考信号的延迟（采样点，正值表示测试信号滞后）
+
+    只取开头prefix个采样点（至少是max_lag的4倍）做互相关，长录音的内存和计算量与总长度无关，
+    内存映射的参考信号也只有这一段会被读入并转成浮点。
+    """
+    n = min(len(reference), len(test))
+    if prefix is not None:
+        n = min(n, max(int(prefix), 4 * max_lag))
+    size = 1 << int(np.ceil(np.log2(2 * n)))
+    ref = np.asarray(reference[:n], dtype=np.float64)
+    deg = np.asarray(test[:n], dtype=np.float64)
+    corr = np.fft.irfft(np.fft.rfft(deg, size) * np.conj(np.fft.rfft(ref, size)), size)
+    # 只看 [-max_lag, max_lag] 范围内的延迟
+    lags = np.concatenate([np.arange(0, max_lag + 1), np.arange(-max_lag, 0)])
+    candidates = np.concatenate([corr[:max_lag + 1], corr[size - max_lag:]])
+    return int(lags[np.argmax(candidates)])
+
+def align_signals(reference, test, max_lag, prefix=None):
+    """去掉估计的延迟并截成相同长度（切片，不拷贝），返回(参考信号, 测试信号, 延迟)"""
+    delay = estimate_delay(reference, test, max_lag, prefix) if max_lag > 0 else 0
+    if delay > 0:
+        test = test[delay:]
+    elif delay < 0:
+        reference = reference[-delay:]
+    n = min(len(reference), len(test))
+    return reference[:n], test[:n], delay
+
+def segment_starts(length, window, hop):
+    """分段起点，步长为hop，保证最后一段覆盖到信号末尾"""
+    if length <= window:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.arange(0, length - window + 1, hop, dtype=np.int64)
+    if starts[-1] + window < length:
+        starts = np.append(starts, length - window)
+    return starts
+
+def _score_segment(task):
+    """工作进程：对一段信号打分，静音等无法打分的段返回NaN"""
+    rate, mode, ref_segment, test_segment = task
+    try:
+        return pesq(rate, ref_segment, test_segment, mode)
+    except Exception:
+        return float('nan')
+
+def frame_signal(signal, frame, hop):
+    """按帧切分（sliding_window_view视图，不拷贝），返回(帧数, frame)"""
+    signal = np.asarray(signal, dtype=np.float64)
+    if len(signal) < frame:
+        signal = np.pad(signal, (0, frame - len(signal)))
+    return np.lib.stride_tricks.sliding_window_view(signal, frame)[::hop]
+
+def segmental_snr(reference, test, frame, hop=None):
+    """分段信噪比（dB）：每帧SNR截断到SEG_SNR_RANGE后取平均，越大越好"""
+    ref = frame_signal(reference, frame, hop or frame)
+    noise = ref - frame_signal(test, frame, hop or frame)
+    eps = np.finfo(np.float64).eps
+    snr = 10 * np.log10((np.einsum('ij,ij->i', ref, ref) + eps) / (np.einsum('ij,ij->i', noise, noise) + eps))
+    return float(np.clip(snr, *SEG_SNR_RANGE).mean())
+
+def stft_magnitude(signal, frame, hop):
+    """汉宁窗STFT幅度谱，返回(帧数, frame//2+1)"""
+    return np.abs(np.fft.rfft(frame_signal(signal, frame, hop) * np.hanning(frame), axis=1))
+
+def log_spectral_distance(ref_spec, test_spec):
+    """对数谱距离（dB）：每帧对数功率谱差的均方根再取平均，越小越好"""
+    eps = 1e-10
+    diff = 20 * np.log10((ref_spec + eps) / (test_spec + eps))
+    return float(np.sqrt(np.mean(diff ** 2, axis=1)).mean())
+
+def spectral_convergence(ref_spec, test_spec):
+    """谱收敛度：||S_ref - S_test||_F / ||S_ref||_F，越小越好"""
+    return float(np.linalg.norm(ref_spec - test_spec) / max(np.linalg.norm(ref_spec), 1e-10))
+
+def proxy_metrics(reference, test, rate, max_align=MAX_ALIGN_SECONDS):
+    """
+    对齐后计算快速代理指标（全部是帧化后的NumPy向量运算）
+
+    返回:
+        {'seg_snr': dB, 'lsd': dB, 'spectral_convergence': 比值}
+    """
+    reference, test, _ = align_signals(reference, test, int(max_align * rate), int(ALIGN_PREFIX_SECONDS * rate))
+    seg_frame = int(0.02 * rate)    # 20ms
+    stft_frame = int(0.032 * rate)  # 32ms，步长一半
+    ref_spec = stft_magnitude(reference, stft_frame, stft_frame // 2)
+    test_spec = stft_magnitude(test, stft_frame, stft_frame // 2)
+    return {
+        'seg_snr': segmental_snr(reference, test, seg_frame),
+        'lsd': log_spectral_distance(ref_spec, test_spec),
+        'spectral_convergence': spectral_convergence(ref_spec, test_spec),
+    }
+
+def rank_by_proxies(metrics):
+    """
+    按代理指标排序：每个指标分别排名后取平均名次，返回每个候选的综合名次（1为最好）
+
+    参数:
+        metrics: 每个候选的proxy_metrics结果，计算失败的为None（排在最后）
+    """
+    valid = [i for i, m in enumerate(metrics) if m is not None]
+    ranks = np.zeros(len(valid))
+    for name, higher_is_better in PROXY_METRICS.items():
+        values = np.array([metrics[i][name] for i in valid])
+        order = np.argsort(-values if higher_is_better else values, kind='stable')
+        ranks[order] += np.arange(len(valid))
+    proxy_rank = [len(metrics)] * len(metrics)
+    for rank, pos in enumerate(np.argsort(ranks, kind='stable'), start=1):
+        proxy_rank[valid[pos]] = rank
+    return proxy_rank
+
+@dataclass
+class WindowedPesq:
+    """分段PESQ结果：每段的起止时间（秒）和分数，以及汇总值"""
+    starts: np.ndarray
+    ends: np.ndarray
+    scores: np.ndarray
+    delay: int              # 对齐时去掉的延迟（采样点）
+
+    @property
+    def valid(self):
+        return self.scores[~np.isnan(self.scores)]
+
+    @property
+    def mean(self):
+        return float(self.valid.mean()) if self.valid.size else float('nan')
+
+    @property
+    def min(self):
+        return float(self.valid.min()) if self.valid.size else float('nan')
+
+    @property
+    def worst_start(self):
+        """分数最低那一段的起始时间（秒）"""
+        return float(self.starts[np.nanargmin(self.scores)]) if self.valid.size else float('nan')
+
+class PesqScorer:
+    """
+    对同一个参考音频反复打分
+
+    参考音频只读取和校验一次，保存为连续的int16/float缓冲区（大文件用内存映射），
+    之后每个测试信号直接和它比较。给出cache_path时，分数按（参考音频内容、模式、测试文件内容）
+    的哈希保存在JSON缓存中，内容相同的测试文件不会重复计算。
+    """
+
+    def __init__(self, reference_path, mode='nb', cache_path=None):
+        use_mmap = os.path.getsize(reference_path) > MMAP_THRESHOLD_BYTES
+        rate, signal = read_wav_mono(reference_path, mmap=use_mmap)
+        self._set_reference(rate, signal, mode)
+        self.reference_path = reference_path
+        self.cache_path = cache_path
+        self.reference_digest = file_digest(reference_path) if cache_path else None
+        self.cache = self._load_cache()
+        self.cache_hits = 0
+
+    @classmethod
+    def from_signal(cls, signal, rate, mode='nb'):
+        """用内存中的参考信号创建打分器（没有文件内容可做键，因此不使用缓存）"""
+        scorer = cls.__new__(cls)
+        scorer._set_reference(rate, np.asarray(signal), mode)
+        scorer.reference_path = None
+        scorer.cache_path = None
+        scorer.reference_digest = None
+        scorer.cache = {}
+        scorer.cache_hits = 0
+        return scorer
+
+    def _set_reference(self, rate, signal, mode):
+        # 检查是否支持该采样率
+        if rate not in [8000, 16000]:
+            raise ValueError(f"不支持的采样率 {rate} Hz，仅支持8000或16000 Hz")
+        if mode == 'wb' and rate != 16000:
+            raise ValueError("宽带(wb)模式需要16000 Hz的音频")
+        self.rate = rate
+        # 取左声道后的内存映射是跨步视图，需要拷贝成连续缓冲区
+        self.reference = signal if signal.flags.c_contiguous else np.ascontiguousarray(signal)
+        self.mode = mode
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"警告: 无法读取分数缓存 {self.cache_path}: {e}")
+            return {}
+
+    def save_cache(self):
+        """写回缓存文件（先合并其他进程已写入的条目，再原子替换）"""
+        if not self.cache_path:
+            return
+        merged = self._load_cache()
+        merged.update(self.cache)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(merged, f)
+        os.replace(tmp_path, self.cache_path)
+        self.cache = merged
+
+    def _key(self, digest):
+        return f"{self.reference_digest}:{self.mode}:{digest}"
+
+    def cached(self, digest):
+        """按测试文件内容哈希查找缓存的分数，没有时返回None"""
+        if self.reference_digest is None:
+            return None
+        return self.cache.get(self._key(digest))
+
+    def store(self, digest, score):
+        if self.reference_digest is not None:
+            self.cache[self._key(digest)] = score
+
+    def score_signal(self, test_signal):
+        """对内存中的测试信号打分（采样率必须与参考音频相同）"""
+        return pesq(self.rate, self.reference, test_signal, self.mode)
+
+    def score_windows(self, test_signal, window=DEFAULT_WINDOW_SECONDS, hop=DEFAULT_HOP_SECONDS,
+                      workers=None, max_align=MAX_ALIGN_SECONDS):
+        """
+        分段打分：对齐后把参考和测试信号切成重叠的固定长度段，用进程池并行计算每段的PESQ
+
+        参数:
+            test_signal: 测试信号（采样率与参考音频相同）
+            window: 窗长（秒）
+            hop: 步长（秒），小于窗长时各段重叠
+            workers: 进程数（默认为CPU核数）
+            max_align: 对齐时搜索的最大延迟（秒），0表示认为两者已经对齐
+
+        返回:
+            WindowedPesq
+        """
+        reference, test, delay = align_signals(self.reference, test_signal, int(max_align * self.rate),
+                                               int(ALIGN_PREFIX_SECONDS * self.rate))
+        size = int(window * self.rate)
+        starts = segment_starts(len(reference), size, max(1, int(hop * self.rate)))
+        # 切片是视图（参考音频可能是内存映射），只在提交给工作进程时拷贝
+        tasks = ((self.rate, self.mode, reference[i:i + size], test[i:i + size]) for i in starts)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            scores = np.fromiter(executor.map(_score_segment, tasks), dtype=np.float64, count=len(starts))
+        ends = np.minimum(starts + size, len(reference))
+        return WindowedPesq(starts / self.rate, ends / self.rate, scores, delay)
+
+    def proxies(self, test_signal):
+        """快速代理指标（见proxy_metrics），用于在完整PESQ之前筛选候选"""
+        return proxy_metrics(self.reference, test_signal, self.rate)
+
+    def score(self, test_path, digest=None):
+        """对测试WAV文件打分，命中缓存时不读取音频"""
+        if self.reference_digest is not None:
+            digest = digest or file_digest(test_path)
+            score = self.cached(digest)
+            if score is not None:
+                self.cache_hits += 1
+                return score
+        test_rate, test_signal = read_wav_mono(test_path)
+        # 检查采样率是否一致
+        if test_rate != self.rate:
+            raise ValueError(f"采样率不匹配: 参考文件 {self.rate} Hz, 测试文件 {test_rate} Hz")
+        score = self.score_signal(test_signal)
+        if digest is not None:
+            self.store(digest, score)
+        return score
+
+def read_manifest(manifest_path):
+    """
+    读取批处理清单（CSV，列：error_rate,variant,path），相对路径按清单所在目录解析
+
+    返回:
+        [(error_rate, variant, path), ...]
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    entries = []
+    with open(manifest_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            path = row['path'].strip()
+            if not os.path.isabs(path):
+                path = os.path.join(base_dir, path)
+            entries.append((int(row['error_rate']), row['variant'].strip(), path))
+    return entries
+
+def scan_directory(directory):
+    """在目录中查找 <error_rate>_<variant>.wav，按错误率和变体排序"""
+    entries = []
+    for name in os.listdir(directory):
+        match = BATCH_WAV_PATTERN.match(name)
+        if match:
+            entries.append((int(match.group(1)), match.group(2), os.path.join(directory, name)))
+    return sorted(entries)
+
+# 工作进程中的打分器，由_init_worker在进程启动时创建（参考音频只读取一次）
+_scorer = None
+
+def _init_worker(reference_path, mode):
+    global _scorer
+    _scorer = PesqScorer(reference_path, mode)
+
+def _score_path(path):
+    """工作进程：对一个测试文件打分，返回(分数, 错误信息)"""
+    try:
+        return _scorer.score(path), ''
+    except Exception as e:
+        return None, str(e)
+
+def score_batch(reference_path, entries, workers=None, cache_path=None, mode='nb'):
+    """
+    用进程池对所有测试文件打分，每个工作进程只读取一次参考音频
+
+    内容相同的测试文件只计算一次；给出cache_path时，已缓存的分数直接复用，新分数写回缓存。
+
+    返回:
+        与entries顺序一致的结果行（字典，键为RESULT_HEADERS）
+    """
+    scorer = PesqScorer(reference_path, mode, cache_path)
+    digests = []
+    for _, _, path in entries:
+        try:
+            digests.append(file_digest(path))
+        except OSError as e:
+            digests.append(e)
+
+    # 同一内容只保留一个需要计算的路径
+    pending = {}
+    for (_, _, path), digest in zip(entries, digests):
+        if isinstance(digest, str) and scorer.cached(digest) is None:
+            pending.setdefault(digest, path)
+
+    results = {}
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(reference_path, mode)) as executor:
+            chunksize = max(1, len(pending) // 64)
+            for digest, result in zip(pending, executor.map(_score_path, pending.values(), chunksize=chunksize)):
+                results[digest] = result
+                if result[0] is not None:
+                    scorer.store(digest, result[0])
+        scorer.save_cache()
+    print(f"共 {len(entries)} 个文件，计算 {len(pending)} 个，其余来自缓存或重复内容")
+
+    rows = []
+    for (error_rate, variant, path), digest in zip(entries, digests):
+        row = {'error_rate': error_rate, 'variant': variant, 'path': path, 'pesq': '', 'error': ''}
+        if not isinstance(digest, str):
+            row['error'] = str(digest)
+        else:
+            score, error = results.get(digest, (scorer.cached(digest), ''))
+            if score is not None:
+                row['pesq'] = f"{score:.3f}"
+            row['error'] = error
+        rows.append(row)
+    return rows
+
+def score_fast(reference_path, entries, top_n, workers=None, cache_path=None, mode='nb'):
+    """
+    先用代理指标给所有候选排名，只对前top_n个计算完整PESQ
+
+    返回:
+        与entries顺序一致的结果行（字典，键为PROXY_HEADERS），未进入前top_n的pesq为空
+    """
+    scorer = PesqScorer(reference_path, mode)
+    metrics = []
+    errors = []
+    for _, _, path in entries:
+        try:
+            test_rate, test_signal = read_wav_mono(path)
+            if test_rate != scorer.rate:
+                raise ValueError(f"采样率不匹配: 参考文件 {scorer.rate} Hz, 测试文件 {test_rate} Hz")
+            metrics.append(scorer.proxies(test_signal))
+            errors.append('')
+        except Exception as e:
+            metrics.append(None)
+            errors.append(str(e))
+    proxy_rank = rank_by_proxies(metrics)
+
+    selected = [i for i in np.argsort(proxy_rank, kind='stable')[:top_n] if metrics[i] is not None]
+    print(f"代理指标排名完成，前 {len(selected)} 个计算完整PESQ")
+    full_rows = score_batch(reference_path, [entries[i] for i in selected], workers, cache_path, mode) if selected else []
+
+    rows = []
+    for (error_rate, variant, path), m, error, rank in zip(entries, metrics, errors, proxy_rank):
+        row = {'error_rate': error_rate, 'variant': variant, 'path': path, 'pesq': '', 'error': error,
+               'proxy_rank': rank}
+        for name in PROXY_METRICS:
+            row[name] = '' if m is None else f"{m[name]:.4f}"
+        rows.append(row)
+    for i, full_row in zip(selected, full_rows):
+        rows[i]['pesq'] = full_row['pesq']
+        rows[i]['error'] = full_row['error']
+    return rows
+
+def write_results(rows, output_path, headers=RESULT_HEADERS):
+    """保存为长表格式的CSV：每行一个(error_rate, variant)"""
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=headers)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def write_segments(results, output_path):
+    """保存分段结果：每个文件的每一段一行"""
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(SEGMENT_HEADERS)
+        for path, result in results:
+            for start, end, score in zip(result.starts, result.ends, result.scores):
+                writer.writerow([path, f"{start:.3f}", f"{end:.3f}", '' if np.isnan(score) else f"{score:.3f}"])
+
+def print_results(rows):
+    """按错误率打印，每个变体一列（与evaluate.bat原来的输出格式相同）"""
+    variants = list(dict.fromkeys(row['variant'] for row in rows))
+    table = {}
+    for row in rows:
+        table.setdefault(row['error_rate'], {})[row['variant']] = row['pesq'] or 'N/A'
+    print('error_rate(%),' + ','.join(variants))
+    for error_rate in sorted(table):
+        print(f"{error_rate}," + ','.join(table[error_rate].get(v, '') for v in variants))
+    for row in rows:
+        if row['error']:
+            print(f"计算失败: {row.get('path') or row.get('model', '')}: {row['error']}")
 
 if __name__ == "__main__":
     # 解析命令行参数
     parser = argparse.ArgumentParser(description='计算两个WAV文件的PESQ分数')
     parser.add_argument('reference', help='参考音频WAV文件路径')
-    parser.add_argument('test', help='测试音频WAV文件路径')
-    parser.add_argument('test2', help='测试音频WAV文件路径2')
+    parser.add_argument('test', nargs='?', default=None, help='测试音频WAV文件路径')
+    parser.add_argument('test2', nargs='?', default=None, help='测试音频WAV文件路径2')
     parser.add_argument('--error_rate', type=int, default=0, 
                       help='Error rate between 0-100')
     parser.add_argument('--sample-rate', type=int, default=8000, 
                       help='采样率（默认16000 Hz，支持8000或16000）')
     parser.add_argument('--path', type=str, default="", 
                       help='wav生成目录')
+    parser.add_argument('--manifest', type=str, default=None,
+                      help='批处理清单CSV（列：error_rate,variant,path）')
+    parser.add_argument('--dir', type=str, default=None,
+                      help='批处理目录，包含 <error_rate>_<variant>.wav 文件')
+    parser.add_argument('--output', type=str, default='pesq_results.csv',
+                      help='批处理结果CSV（默认为pesq_results.csv）')
+    parser.add_argument('--workers', type=int, default=None,
+                      help='批处理进程数（默认为CPU核数）')
+    parser.add_argument('--cache', type=str, default=DEFAULT_CACHE_PATH,
+                      help=f'分数缓存文件，内容相同的测试文件不重复计算（默认为{DEFAULT_CACHE_PATH}）')
+    parser.add_argument('--no-cache', action='store_true', default=False,
+                      help='不使用分数缓存')
+    parser.add_argument('--fast', type=int, default=None, metavar='N',
+                      help='批处理时先用代理指标（分段信噪比、对数谱距离、谱收敛度）排名，只对前N个计算完整PESQ')
+    parser.add_argument('--window', type=float, default=None,
+                      help=f'分段打分的窗长（秒），例如{DEFAULT_WINDOW_SECONDS:g}；给出时对每个测试文件输出逐段分数')
+    parser.add_argument('--hop', type=float, default=DEFAULT_HOP_SECONDS,
+                      help=f'分段打分的步长（秒，默认{DEFAULT_HOP_SECONDS:g}）')
+    parser.add_argument('--segments', type=str, default='pesq_segments.csv',
+                      help='分段结果CSV（默认为pesq_segments.csv）')
     
     args = parser.parse_args()
+    cache_path = None if args.no_cache else args.cache
+
+    if args.manifest or args.dir:
+        entries = read_manifest(args.manifest) if args.manifest else scan_directory(args.dir)
+        if not entries:
+            parser.error("没有找到需要打分的WAV文件")
+        if args.fast:
+            rows = score_fast(args.reference, entries, args.fast, args.workers, cache_path)
+            write_results(rows, args.output, PROXY_HEADERS)
+        else:
+            rows = score_batch(args.reference, entries, args.workers, cache_path)
+            write_results(rows, args.output)
+        print_results(rows)
+        print(f"结果已保存到 {args.output}")
+        raise SystemExit(0)
+    if args.window:
+        if args.test is None:
+            parser.error("分段打分需要至少一个测试文件")
+        scorer = PesqScorer(args.reference)
+        results = []
+        for path in [p for p in (args.test, args.test2) if p]:
+            test_rate, test_signal = read_wav_mono(path)
+            if test_rate != scorer.rate:
+                parser.error(f"采样率不匹配: 参考文件 {scorer.rate} Hz, 测试文件 {test_rate} Hz")
+            result = scorer.score_windows(test_signal, args.window, args.hop, args.workers)
+            results.append((path, result))
+            print(f"{path}: {len(result.scores)} 段, 平均 {result.mean:.3f}, 最低 {result.min:.3f} "
+                  f"(从 {result.worst_start:.1f}s 开始), 延迟 {result.delay} 个采样点")
+        write_segments(results, args.segments)
+        print(f"分段结果已保存到 {args.segments}")
+        raise SystemExit(0)
+    if args.test is None or args.test2 is None:
+        parser.error("需要两个测试文件，或使用 --manifest/--dir 批处理")
 
     print(f"{args.error_rate},", end="")
+
+    try:
+        # 参考音频只读取一次，两个测试文件共用
+        scorer = PesqScorer(args.reference, cache_path=cache_path)
+    except Exception as e:
+        print(f"计算失败: {str(e)}")
+        raise SystemExit(1)
     
     try:
         # 计算并打印PESQ分数
-        pesq_score = calculate_pesq(args.reference, args.test, args.sample_rate)
+        pesq_score = scorer.score(args.test)
         print(f"{pesq_score:.3f}", end="")
     except Exception as e:
         print(f"计算失败: {str(e)}")
 
     try:
         # 计算并打印PESQ分数
-        pesq_score = calculate_pesq(args.reference, args.test2, args.sample_rate)
+        pesq_score = scorer.score(args.test2)
         print(f",{pesq_score:.3f}")
     except Exception as e:
         print(f"计算失败: {str(e)}")
+    scorer.save_cache()
@@ -0,0 +1,52 @@
+#include <stdint.h>
+#include <stdbool.h>
+#include <string.h>
+#include "plc.h"
+#include "audio_msbc_plc.h"
+
+/*
+ * Same per-frame loop as main() in test.c, but on memory buffers so that
+ * plc_harness.py can drive it through ctypes without WAV files.
+ *
+ * input:          frames * FRAME_SIZE samples (8kHz)
+ * lost:           one byte per frame, non-zero = frame lost
+ * with_plc:       output of plc_process()
+ * without_plc:    lost frames replaced by silence
+ * with_plc_g711:  output of the G.711 Appendix I PLC (cvsd configuration)
+ *
+ * Returns the number of frames processed.
+ */
+int plc_run(const int16_t* input, const uint8_t* lost, int frames,
+    int16_t* with_plc, int16_t* without_plc, int16_t* with_plc_g711)
+{
+    AudioFrame history = { 0 };
+    AudioFrame output;
+    LowcFE_c g711_lpc = { 0 };
+    int loss_count = 0;
+
+    cvsd_g711plc_construct(&g711_lpc);
+
+    for (int i = 0; i < frames; i++) {
+        const int16_t* in = &input[i * FRAME_SIZE];
+        bool is_lost = lost[i] != 0;
+        loss_count = is_lost ? loss_count + 1 : 0;
+
+        memcpy(history.pcm, in, FRAME_SIZE * sizeof(int16_t));
+        plc_process(&output, &history, is_lost, loss_count);
+        memcpy(&with_plc[i * FRAME_SIZE], output.pcm, FRAME_SIZE * sizeof(int16_t));
+
+        int16_t* no_plc_output = &without_plc[i * FRAME_SIZE];
+        int16_t* g711_pcm = &with_plc_g711[i * FRAME_SIZE];
+        if (is_lost) {
+            memset(no_plc_output, 0, FRAME_SIZE * sizeof(int16_t));
+            memset(g711_pcm, 0, FRAME_SIZE * sizeof(int16_t));
+            g711plc_dofe(&g711_lpc, g711_pcm);
+        }
+        else {
+            memcpy(no_plc_output, in, FRAME_SIZE * sizeof(int16_t));
+            memcpy(g711_pcm, in, FRAME_SIZE * sizeof(int16_t));
+            g711plc_addtohistory(&g711_lpc, g711_pcm);
+        }
+    }
+    return frames;
+}
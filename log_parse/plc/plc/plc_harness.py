@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+PLC评估工具（跨平台，替代evaluate.bat）
+
+把plc.c/audio_msbc_plc.c编译成动态库，用ctypes直接在numpy缓冲区上调用，
+丢包图案（Bernoulli、Gilbert-Elliott突发或rx日志的丢包轨迹）在进程内生成，
+三种输出（无PLC、plc_process、G.711 PLC）直接在内存中计算PESQ，不经过WAV文件。
+"""
+
+import argparse
+import ctypes
+import multiprocessing
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from cal_pesq import PesqScorer, print_results, read_wav_mono, write_results
+
+PLC_DIR = os.path.dirname(os.path.abspath(__file__))
+PLC_SOURCES = ['plc.c', 'audio_msbc_plc.c', 'fft.c', 'plc_harness.c']
+PLC_HEADERS = ['plc.h', 'audio_msbc_plc.h']
+BUILD_DIR = os.path.join(PLC_DIR, 'build')
+LIBRARY_NAME = {'win32': 'plc.dll', 'darwin': 'libplc.dylib'}.get(sys.platform, 'libplc.so')
+FRAME_SIZE = 60         # 与plc.h中的FRAME_SIZE一致（8kHz下7.5ms）
+SAMPLE_RATE = 8000
+VARIANTS = ['without_plc', 'with_plc', 'with_plc_g711']
+HARNESS_HEADERS = ['error_rate', 'model', 'actual_loss', 'variant', 'pesq', 'error']
+LOSS_MODELS = ['bernoulli', 'gilbert']
+
+def build_library(force=False, compiler=None):
+    """
+    编译PLC动态库（源文件比库新时才重新编译），返回库路径
+
+    fft.c使用MSVC的_alloca，这里映射到编译器内建的alloca。
+    """
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    library = os.path.join(BUILD_DIR, LIBRARY_NAME)
+    sources = [os.path.join(PLC_DIR, name) for name in PLC_SOURCES]
+    if not force and os.path.exists(library):
+        newest = max(os.path.getmtime(os.path.join(PLC_DIR, name)) for name in PLC_SOURCES + PLC_HEADERS)
+        if os.path.getmtime(library) >= newest:
+            return library
+    compiler = compiler or os.environ.get('CC', 'cc')
+    cmd = [compiler, '-O2', '-shared', '-fPIC', '-D_alloca=__builtin_alloca', '-o', library] + sources + ['-lm']
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"编译PLC库失败:\n{' '.join(cmd)}\n{result.stderr}")
+    return library
+
+def load_library(path=None):
+    """加载PLC动态库并声明plc_run的参数类型"""
+    lib = ctypes.CDLL(path or build_library())
+    pcm = np.ctypeslib.ndpointer(dtype=np.int16, ndim=1, flags='C_CONTIGUOUS')
+    lib.plc_run.argtypes = [pcm, np.ctypeslib.ndpointer(dtype=np.uint8, ndim=1, flags='C_CONTIGUOUS'),
+                            ctypes.c_int, pcm, pcm, pcm]
+    lib.plc_run.restype = ctypes.c_int
+    return lib
+
+def load_input(path):
+    """读取输入音频，转成8kHz并截成整帧（与test.c的read_wav_8khz相同的长度处理）"""
+    rate, signal = read_wav_mono(path)
+    if rate != SAMPLE_RATE:
+        signal = resample_poly(signal.astype(np.float64), SAMPLE_RATE, rate)
+        signal = np.clip(np.round(signal), -32768, 32767)
+    signal = np.ascontiguousarray(signal, dtype=np.int16)
+    return signal[:len(signal) // FRAME_SIZE * FRAME_SIZE]
+
+def run_plc(lib, signal, lost, fading_count=None):
+    """
+    对整段信号按丢包图案运行PLC
+
+    参数:
+        lib: load_library()的返回值
+        signal: int16信号，长度为FRAME_SIZE的整数倍
+        lost: 每帧一个布尔值，True表示丢包
+        fading_count: G.711 PLC的衰减帧数（test.c的第二个命令行参数），None表示使用默认值
+
+    返回:
+        {variant: int16信号}
+    """
+    frames = len(signal) // FRAME_SIZE
+    lost = np.ascontiguousarray(lost[:frames], dtype=np.uint8)
+    if len(lost) < frames:
+        raise ValueError(f"丢包图案只有 {len(lost)} 帧，信号有 {frames} 帧")
+    if fading_count is not None:
+        ctypes.c_int.in_dll(lib, 'fading_count').value = fading_count
+    outputs = {variant: np.empty(frames * FRAME_SIZE, dtype=np.int16) for variant in VARIANTS}
+    lib.plc_run(signal, lost, frames, outputs['with_plc'], outputs['without_plc'], outputs['with_plc_g711'])
+    return outputs
+
+def bernoulli_loss(frames, rate, rng):
+    """每帧独立以概率rate丢包"""
+    return rng.random(frames) < rate
+
+def gilbert_elliott_loss(frames, rate, burst, rng):
+    """
+    两状态Gilbert-Elliott丢包：坏状态全丢、好状态不丢，平均丢包率rate，坏状态平均持续burst帧
+
+    按状态持续时间（几何分布）整段生成，不逐帧模拟马尔可夫链。规则与simu/loss_models.py的
+    GilbertElliottLoss相同（两个工具的突发统计可以直接比较）：好状态至少持续1帧，
+    rate高于burst/(burst+1)时好状态已经最短，这时加长坏状态的平均持续时间来保持平均丢包率。
+    """
+    if rate <= 0:
+        return np.zeros(frames, dtype=bool)
+    if rate >= 1:
+        return np.ones(frames, dtype=bool)
+    odds = rate / (1 - rate)
+    burst = max(float(burst), 1.0, odds)
+    p_enter = odds / burst   # 好状态每帧进入坏状态的概率，好状态平均持续1/p_enter帧
+    runs = []
+    total = 0
+    # 初始状态按稳态概率选择
+    state = rng.random() < rate
+    while total < frames:
+        n = int((frames - total) * p_enter) + 16
+        bad = rng.geometric(1 / burst, n)
+        good = rng.geometric(p_enter, n)
+        lengths = np.column_stack([bad, good] if state else [good, bad]).ravel()
+        runs.append(lengths)
+        total += int(lengths.sum())
+    lengths = np.concatenate(runs)
+    states = np.resize(np.array([state, not state]), len(lengths))
+    return np.repeat(states, lengths)[:frames]
+
+def unpack_loss_bitmap(record):
+    """解开rx_total_parse.py --loss-trace保存的按位打包记录（slots个时隙，1=丢包）"""
+    return np.unpackbits(record['bits'], count=int(record['slots']), bitorder='little').astype(bool)
+
+def load_loss_trace(path, frames):
+    """
+    读取丢包轨迹，每个元素对应一个音频帧（一个音频时隙），循环或截断到frames帧
+
+    支持rx_total_parse.py --loss-trace导出的按位打包.npy、普通布尔/0-1数组.npy，
+    以及每行一个0/1的文本（与simu/loss_models.py的load_trace读取的格式相同）。
+    """
+    if path.endswith('.npy'):
+        trace = np.load(path)
+        if trace.dtype.names and 'bits' in trace.dtype.names:
+            trace = unpack_loss_bitmap(trace)
+        trace = trace.astype(bool).ravel()
+    else:
+        trace = np.loadtxt(path, dtype=np.uint8).astype(bool).ravel()
+    if trace.size == 0:
+        raise ValueError(f"丢包轨迹为空: {path}")
+    if trace.size < frames:
+        print(f"丢包轨迹只有 {trace.size} 帧，循环使用到 {frames} 帧")
+    return np.resize(trace, frames)
+
+def make_conditions(frames, model, rates, burst=4.0, trace=None, seed=None):
+    """生成(error_rate, model描述, 丢包图案)列表；给出trace时只有一个条件"""
+    if trace:
+        lost = load_loss_trace(trace, frames)
+        return [(int(round(lost.mean() * 100)), f"trace:{os.path.basename(trace)}", lost)]
+    rng = np.random.default_rng(seed)
+    conditions = []
+    for rate in rates:
+        if model == 'gilbert':
+            lost = gilbert_elliott_loss(frames, rate / 100, burst, rng)
+            label = f"gilbert(burst={burst:g})"
+        else:
+            lost = bernoulli_loss(frames, rate / 100, rng)
+            label = 'bernoulli'
+        conditions.append((rate, label, lost))
+    return conditions
+
+# 工作进程状态，由_init_worker在进程启动时准备一次
+_worker = None
+
+def _init_worker(library, input_path, fading_count):
+    global _worker
+    signal = load_input(input_path)
+    _worker = (load_library(library), signal, PesqScorer.from_signal(signal, SAMPLE_RATE), fading_count)
+
+def _run_condition(condition):
+    """工作进程：运行一种丢包条件下的三种输出并打分，返回结果行"""
+    error_rate, label, lost = condition
+    lib, signal, scorer, fading_count = _worker
+    rows = []
+    outputs = run_plc(lib, signal, lost, fading_count)
+    for variant in VARIANTS:
+        row = {'error_rate': error_rate, 'model': label, 'actual_loss': f"{lost.mean():.4f}",
+               'variant': variant, 'pesq': '', 'error': ''}
+        try:
+            row['pesq'] = f"{scorer.score_signal(outputs[variant]):.3f}"
+        except Exception as e:
+            row['error'] = str(e)
+        rows.append(row)
+    return rows
+
+def evaluate(input_path, conditions, fading_count=None, workers=None):
+    """用进程池评估所有丢包条件（每个工作进程只编译/加载一次库并读取一次音频）"""
+    library = build_library()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(library, input_path, fading_count)) as executor:
+        return [row for rows in executor.map(_run_condition, conditions) for row in rows]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='PLC评估：进程内注入丢包、运行PLC并计算PESQ')
+    parser.add_argument('input', nargs='?', default=os.path.join(PLC_DIR, 'input.wav'),
+                      help='输入音频WAV文件路径（默认为input.wav）')
+    parser.add_argument('--model', choices=LOSS_MODELS, default='bernoulli',
+                      help='丢包模型：bernoulli独立丢包，gilbert突发丢包（默认bernoulli）')
+    parser.add_argument('--rates', type=int, nargs='+', default=list(range(0, 100, 10)),
+                      help='丢包率列表（百分比，默认0 10 ... 90）')
+    parser.add_argument('--burst', type=float, default=4.0,
+                      help='gilbert模型的平均突发长度（帧，默认4）')
+    parser.add_argument('--trace', type=str, default=None,
+                      help='丢包轨迹文件（rx_total_parse.py --loss-trace导出的.npy、布尔.npy或0/1文本），给出时忽略--model和--rates')
+    parser.add_argument('--fading', type=int, default=None,
+                      help='G.711 PLC的衰减帧数（默认使用库中的默认值）')
+    parser.add_argument('--seed', type=int, default=None,
+                      help='随机数种子（默认每次不同）')
+    parser.add_argument('--workers', type=int, default=None,
+                      help='进程数（默认为CPU核数）')
+    parser.add_argument('--output', type=str, default='plc_results.csv',
+                      help='结果CSV（默认为plc_results.csv）')
+    args = parser.parse_args()
+
+    frames = len(load_input(args.input)) // FRAME_SIZE
+    conditions = make_conditions(frames, args.model, args.rates, args.burst, args.trace, args.seed)
+    rows = evaluate(args.input, conditions, args.fading, args.workers)
+    write_results(rows, args.output, HARNESS_HEADERS)
+    print_results(rows)
+    print(f"结果已保存到 {args.output}")
@@ -1,36 +1,681 @@
+import json
+import multiprocessing
+import os
+import queue
+import shutil
 import struct
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 from matplotlib.ticker import MultipleLocator
-from typing import List, Union, Optional
-import tkinter as tk
-from tkinter import simpledialog
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import to_rgba, to_rgba_array
+from matplotlib.transforms import Bbox
+from typing import List, Union, Optional, Tuple
 import matplotlib.font_manager as fm
 
-# 改进的中文字体配置 - 自动适配系统字体
-def setup_chinese_fonts():
-    # 尝试获取系统已安装的中文字体
-    chinese_fonts = ["SimHei", "Microsoft YaHei", "Arial Unicode MS", "SimSun", "NSimSun"]
-    available_fonts = []
-    
-    for font in chinese_fonts:
-        if any(font.lower() in f.lower() for f in fm.findSystemFonts()):
-            available_fonts.append(font)
-    
+# 候选中文字体，按优先级排列
+CHINESE_FONT_CANDIDATES = ["SimHei", "Microsoft YaHei", "Arial Unicode MS", "SimSun", "NSimSun"]
+# 字体扫描结果缓存到matplotlib的缓存目录，后续启动无需再遍历系统字体
+FONT_CACHE_PATH = os.path.join(matplotlib.get_cachedir(), 'rssi_success_rate_fonts.json')
+
+_chinese_fonts: Optional[List[str]] = None
+
+
+def _load_font_cache() -> Optional[List[str]]:
+    try:
+        with open(FONT_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get('candidates') != CHINESE_FONT_CANDIDATES:
+        return None
+    return cached.get('available')
+
+
+def _save_font_cache(available: List[str]) -> None:
+    try:
+        with open(FONT_CACHE_PATH, 'w', encoding='utf-8') as f:
+            json.dump({'candidates': CHINESE_FONT_CANDIDATES, 'available': available}, f)
+    except OSError:
+        pass  # 缓存写不进去只是下次多扫描一次
+
+
+def find_chinese_fonts(refresh: bool = False) -> List[str]:
+    """返回系统中可用的候选中文字体，系统字体只扫描一次，结果缓存在内存和磁盘中"""
+    global _chinese_fonts
+    if _chinese_fonts is not None and not refresh:
+        return _chinese_fonts
+
+    available = None if refresh else _load_font_cache()
+    if available is None:
+        system_fonts = [f.lower() for f in fm.findSystemFonts()]
+        available = [font for font in CHINESE_FONT_CANDIDATES
+                     if any(font.lower() in f for f in system_fonts)]
+        _save_font_cache(available)
+    _chinese_fonts = available
+    return available
+
+
+# 改进的中文字体配置 - 自动适配系统字体，只在创建图形时调用
+def setup_chinese_fonts(refresh: bool = False) -> bool:
+    global use_chinese
+    first_time = _chinese_fonts is None or refresh
+    available_fonts = find_chinese_fonts(refresh)
+
     # 如果找到可用中文字体，设置它
     if available_fonts:
         plt.rcParams["font.family"] = available_fonts
+        plt.rcParams["axes.unicode_minus"] = False  # 正确显示负号
+        use_chinese = True
     else:
         #  fallback到默认字体，使用英文显示标题
-        print("警告：未找到中文字体，将使用英文显示")
+        if first_time:
+            print("警告：未找到中文字体，将使用英文显示")
+        use_chinese = False
+    return use_chinese
+
+# 导入时不扫描字体，只读取上次的缓存结果决定提示语言
+use_chinese = bool(_load_font_cache())
+
+class BarCollection:
+    """用单个PolyCollection绘制一组柱子，高度和颜色按数组整体更新，避免逐个Rectangle设置"""
+
+    def __init__(self, ax, x, width: float = 0.8, **kwargs):
+        x = np.asarray(x, dtype=float)
+        self._verts = np.zeros((len(x), 4, 2))
+        self._verts[:, 0:2, 0] = (x - width / 2)[:, None]
+        self._verts[:, 2:4, 0] = (x + width / 2)[:, None]
+        self.collection = PolyCollection(self._verts, **kwargs)
+        ax.add_collection(self.collection)
+
+    def set_heights(self, heights, bottoms=0):
+        bottoms = np.broadcast_to(np.asarray(bottoms, dtype=float), len(self._verts))
+        tops = bottoms + np.asarray(heights, dtype=float)
+        self._verts[:, 0, 1] = bottoms
+        self._verts[:, 1, 1] = tops
+        self._verts[:, 2, 1] = tops
+        self._verts[:, 3, 1] = bottoms
+        self.collection.set_verts(self._verts)
+
+    def set_facecolors(self, rgba):
+        self.collection.set_facecolor(rgba)
+
+class BlitManager:
+    """
+    缓存不含动画对象的背景，每帧只重绘动画对象并blit发生变化的区域
+
+    完整重绘（暂停、切换方向、窗口缩放）时通过draw_event重新缓存背景。
+    """
+
+    def __init__(self, canvas, animated_artists):
+        self.canvas = canvas
+        self._background = None
+        self._artists = []
+        for artist in animated_artists:
+            artist.set_animated(True)
+            self._artists.append(artist)
+        self._draw_cid = canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self._artists:
+            self.canvas.figure.draw_artist(artist)
+
+    def update(self, bboxes):
+        """恢复背景、重绘动画对象，并只blit给定区域"""
+        if self._background is None or not self.canvas.supports_blit:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_animated()
+        for bbox in bboxes:
+            self.canvas.blit(bbox)
+        self.canvas.flush_events()
+
+@dataclass
+class TrackerFrame:
+    """单帧数据：各字段均为frame缓冲区上的视图"""
+    rssi: np.ndarray
+    act_rssi: np.ndarray
+    success: np.ndarray
+    failure: np.ndarray
+    afh_ch_map: np.ndarray
+    rx_hist: np.ndarray
+    delta: np.ndarray
+
+# 每帧概要：总体成功率、有收发信道的平均差值、AFH使能信道数、RX历史非零样本数
+FRAME_SUMMARY_DTYPE = np.dtype([
+    ('success_rate', np.float32),
+    ('mean_delta', np.float32),
+    ('afh_channels', np.int16),
+    ('rx_hist_count', np.int16),
+])
+
+# rx_total_parse.py --frames写出的帧布局（BT：79个信道+1，RX历史RX_HISTORY_MAX=2000个值）
+DEFAULT_FRAME_CHANNELS = 80
+DEFAULT_FRAME_RX_HIST = 2000
+
+def summary_path(frames_path: str) -> str:
+    """帧文件对应的概要索引缓存文件"""
+    return frames_path + '.summary.npy'
+
+def layout_path(frames_path: str) -> str:
+    """帧文件对应的布局描述文件（信道数、RX历史长度、数值格式）"""
+    return frames_path + '.layout.json'
+
+def write_layout(frames_path: str, num_channels: int, rx_hist_max: int, int_format: str = 'b') -> None:
+    with open(layout_path(frames_path), 'w', encoding='utf-8') as f:
+        json.dump({'num_channels': num_channels, 'rx_hist_max': rx_hist_max, 'int_format': int_format}, f)
+
+def read_layout(frames_path: str) -> Optional[dict]:
+    """读取帧文件旁的布局描述，没有时返回None"""
+    path = layout_path(frames_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+class FrameSource:
+    """
+    按需解码的帧数据源
+
+    帧布局：扫描RSSI、实际RSSI、成功数、失败数、AFH map各num_channels个值，之后是rx_hist_max个RX历史值。
+    数据可以来自字节数组列表、(帧数, 帧长度)的数组视图或内存映射的帧文件。
+    只在current_frame附近保持一个小的LRU窗口，并在后台按播放方向预取。
+    """
+
+    def __init__(self, frames, num_channels: int = 80, rx_hist_max: int = 320, int_format: str = 'b',
+                 cache_window: int = 64, prefetch: int = 8):
+        self.num_channels = num_channels
+        self.rx_hist_max = rx_hist_max
+        self.dtype = np.dtype(int_format)
+        self.values_per_frame = num_channels * 5 + rx_hist_max
+        self.frame_bytes = self.values_per_frame * self.dtype.itemsize
+        self.cache_window = max(cache_window, 1)
+        self.prefetch_count = prefetch
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._prefetcher = None
+        self._summary = None
+        self.path = None  # 来自帧文件时记录路径，导出进程可以直接重新映射
+
+        if isinstance(frames, np.ndarray):
+            self._array = frames.view(self.dtype).reshape(-1, self.values_per_frame)
+            self._arrays = None
+            self._valid = None
+        else:
+            self._array = None
+            self._arrays = frames
+            self._valid = self._index_valid_arrays(frames)
+
+    @classmethod
+    def from_file(cls, path: str, num_channels: Optional[int] = None, rx_hist_max: Optional[int] = None,
+                  int_format: Optional[str] = None, **kwargs):
+        """
+        以内存映射方式打开由save_frames写出的帧文件
+
+        布局优先取帧文件旁的.layout.json；显式给出的参数必须与之一致。
+        没有布局文件时默认为rx_total_parse.py的布局（80个信道、2000个RX历史值）。
+        文件长度不是整数帧时报错，避免按错误的布局读出错位的数据。
+        """
+        stored = read_layout(path) or {}
+        requested = {'num_channels': num_channels, 'rx_hist_max': rx_hist_max, 'int_format': int_format}
+        defaults = {'num_channels': DEFAULT_FRAME_CHANNELS, 'rx_hist_max': DEFAULT_FRAME_RX_HIST, 'int_format': 'b'}
+        layout = {}
+        for key, value in requested.items():
+            if value is not None and key in stored and stored[key] != value:
+                raise ValueError(f"{path}: {key}={value} 与布局文件中的 {stored[key]} 不一致")
+            layout[key] = value if value is not None else stored.get(key, defaults[key])
+        num_channels, rx_hist_max, int_format = layout['num_channels'], layout['rx_hist_max'], layout['int_format']
+
+        values_per_frame = num_channels * 5 + rx_hist_max
+        array = np.memmap(path, dtype=np.dtype(int_format), mode='r')
+        if len(array) % values_per_frame:
+            raise ValueError(f"{path}: 文件长度 {len(array)} 不是帧长度 {values_per_frame} 的整数倍"
+                             f"（信道数 {num_channels}，RX历史 {rx_hist_max}），请检查布局")
+        source = cls(array, num_channels, rx_hist_max, int_format, **kwargs)
+        source.path = path
+        return source
+
+    def _index_valid_arrays(self, arrays) -> list:
+        # 只检查类型和长度，不解包数据
+        valid = []
+        for i, arr in enumerate(arrays):
+            if not isinstance(arr, (bytes, bytearray, memoryview)):
+                print(f"警告：第{i+1}个元素不是字节数组 - 已跳过" if use_chinese else f"Warning: Element {i+1} is not a byte array - skipping")
+                continue
+            if len(arr) != self.frame_bytes:
+                print(f"警告：第{i+1}个字节数组长度无效（{len(arr)}），预期长度为{self.frame_bytes} - 已跳过" if use_chinese else f"Warning: Byte array {i+1} has invalid length {len(arr)} (expected {self.frame_bytes}) - skipping")
+                continue
+            valid.append(i)
+        return valid
+
+    def __len__(self) -> int:
+        if self._array is not None:
+            return len(self._array)
+        return len(self._valid)
+
+    def values(self, index: int) -> np.ndarray:
+        """返回第index帧的原始数值（不拷贝）"""
+        if self._array is not None:
+            return self._array[index]
+        return np.frombuffer(self._arrays[self._valid[index]], dtype=self.dtype)
+
+    def _decode(self, index: int) -> TrackerFrame:
+        values = self.values(index)
+        n = self.num_channels
+        rssi = values[:n]
+        act_rssi = values[n:2*n]
+        return TrackerFrame(
+            rssi=rssi,
+            act_rssi=act_rssi,
+            success=values[2*n:3*n],
+            failure=values[3*n:4*n],
+            afh_ch_map=values[4*n:5*n],
+            rx_hist=values[5*n:],
+            delta=act_rssi.astype(np.int32) - rssi
+        )
+
+    def __getitem__(self, index: int) -> TrackerFrame:
+        with self._lock:
+            frame = self._cache.get(index)
+            if frame is not None:
+                self._cache.move_to_end(index)
+                return frame
+        frame = self._decode(index)
+        self._store(index, frame)
+        return frame
+
+    def _store(self, index: int, frame: TrackerFrame) -> None:
+        with self._lock:
+            self._cache[index] = frame
+            self._cache.move_to_end(index)
+            while len(self._cache) > self.cache_window:
+                self._cache.popitem(last=False)
+
+    def prefetch(self, index: int, direction: int = 1) -> None:
+        """在后台解码index之后（按播放方向）的若干帧"""
+        if self.prefetch_count <= 0:
+            return
+        with self._lock:
+            pending = [i for i in (index + direction * k for k in range(1, self.prefetch_count + 1))
+                       if 0 <= i < len(self) and i not in self._cache]
+        if not pending:
+            return
+        if self._prefetcher is None:
+            self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='frame-prefetch')
+        self._prefetcher.submit(self._prefetch, pending)
+
+    def _prefetch(self, indexes: list) -> None:
+        for index in indexes:
+            with self._lock:
+                if index in self._cache:
+                    continue
+            self._store(index, self._decode(index))
+
+    def column_max(self, start: int, stop: int) -> int:
+        """所有帧中[start, stop)列的最大值"""
+        if len(self) == 0:
+            return 0
+        if self._array is not None:
+            return int(self._array[:, start:stop].max())
+        return max(int(self.values(i)[start:stop].max()) for i in range(len(self)))
+
+    def _block(self, start: int, stop: int) -> np.ndarray:
+        if self._array is not None:
+            return self._array[start:stop]
+        return np.stack([self.values(i) for i in range(start, stop)])
+
+    def _summarize(self, block: np.ndarray, out: np.ndarray) -> None:
+        n = self.num_channels
+        rssi = block[:, :n].astype(np.int32)
+        act_rssi = block[:, n:2*n].astype(np.int32)
+        success = block[:, 2*n:3*n].astype(np.int32)
+        failure = block[:, 3*n:4*n].astype(np.int32)
+        has_data = (success > 0) | (failure > 0)
+
+        total_success = success.sum(axis=1)
+        total = total_success + failure.sum(axis=1)
+        data_channels = has_data.sum(axis=1)
+        delta_sum = np.where(has_data, act_rssi - rssi, 0).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out['success_rate'] = np.where(total > 0, total_success / total, np.nan)
+            out['mean_delta'] = np.where(data_channels > 0, delta_sum / data_channels, np.nan)
+        out['afh_channels'] = (block[:, 4*n:5*n] == 1).sum(axis=1)
+        out['rx_hist_count'] = (block[:, 5*n:] != 0).sum(axis=1)
+
+    def summary(self, chunk_frames: int = 4096) -> np.ndarray:
+        """
+        计算每帧的概要索引（FRAME_SUMMARY_DTYPE结构化数组）
+
+        按块对帧矩阵做向量化归约，内存映射的大文件不会整体读入。
+        来自帧文件时结果缓存在帧文件旁边，帧文件更新后自动重新计算。
+        """
+        if self._summary is not None:
+            return self._summary
+
+        cache_path = summary_path(self.path) if self.path else None
+        if cache_path and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(self.path):
+            try:
+                cached = np.load(cache_path)
+            except (OSError, ValueError):
+                cached = None
+            if cached is not None and cached.dtype == FRAME_SUMMARY_DTYPE and len(cached) == len(self):
+                self._summary = cached
+                return cached
+
+        summary = np.empty(len(self), dtype=FRAME_SUMMARY_DTYPE)
+        for start in range(0, len(self), chunk_frames):
+            stop = min(start + chunk_frames, len(self))
+            self._summarize(self._block(start, stop), summary[start:stop])
+        self._summary = summary
+
+        if cache_path:
+            # 先写临时文件再替换，多个导出进程同时写也不会读到半个文件
+            temp_path = f"{cache_path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_path, 'wb') as f:
+                    np.save(f, summary)
+                os.replace(temp_path, cache_path)
+            except OSError:
+                pass  # 帧文件所在目录不可写时只保留内存中的结果
+        return summary
+
+    def channel_heatmaps(self, max_columns: int = 2000, chunk_frames: int = 4096):
+        """
+        计算通道×时间矩阵：每通道成功率、差值（实际-扫描）和AFH是否使能
+
+        帧数超过max_columns时按时间做最小/最大池化，每个时间段输出相邻的最小值列和最大值列，
+        短时的跌落和尖峰都会保留。没有收发数据的位置为NaN。
+        返回({名称: (通道数, 列数)数组}, 每列对应的帧数)。
+        """
+        total = len(self)
+        n = self.num_channels
+        if total <= max_columns:
+            frames_per_column = 1
+        else:
+            frames_per_column = -(-total // max(max_columns // 2, 1))
+        bins = -(-total // frames_per_column)
+        names = ('success_rate', 'delta', 'afh')
+        mins = {name: np.empty((bins, n)) for name in names}
+        maxs = {name: np.empty((bins, n)) for name in names}
+
+        # 块大小取每列帧数的整数倍，池化不会跨块
+        chunk = max(chunk_frames // frames_per_column, 1) * frames_per_column
+        for start in range(0, total, chunk):
+            stop = min(start + chunk, total)
+            block = self._block(start, stop)
+            success = block[:, 2*n:3*n].astype(np.int32)
+            failure = block[:, 3*n:4*n].astype(np.int32)
+            counts = success + failure
+            with np.errstate(invalid='ignore', divide='ignore'):
+                matrices = {
+                    'success_rate': np.where(counts > 0, success / counts, np.nan),
+                    'delta': np.where(counts > 0, block[:, n:2*n].astype(np.int32) - block[:, :n], np.nan),
+                    'afh': (block[:, 4*n:5*n] == 1).astype(float),
+                }
+            first_bin = start // frames_per_column
+            chunk_bins = -(-(stop - start) // frames_per_column)
+            for name, matrix in matrices.items():
+                padded = np.full((chunk_bins * frames_per_column, n), np.nan)
+                padded[:len(matrix)] = matrix
+                padded = padded.reshape(chunk_bins, frames_per_column, n)
+                # fmin/fmax忽略NaN，整段都是NaN时结果仍为NaN
+                mins[name][first_bin:first_bin + chunk_bins] = np.fmin.reduce(padded, axis=1)
+                maxs[name][first_bin:first_bin + chunk_bins] = np.fmax.reduce(padded, axis=1)
+
+        heatmaps = {}
+        for name in names:
+            if frames_per_column == 1:
+                heatmaps[name] = mins[name].T
+            else:
+                pooled = np.empty((bins * 2, n))
+                pooled[0::2] = mins[name]
+                pooled[1::2] = maxs[name]
+                heatmaps[name] = pooled.T
+        return heatmaps, frames_per_column
+
+    def save(self, path: str) -> None:
+        """把所有有效帧写成帧文件（连同布局文件）"""
+        with open(path, 'wb') as f:
+            for i in range(len(self)):
+                f.write(self.values(i).tobytes())
+        write_layout(path, self.num_channels, self.rx_hist_max, self.dtype.char)
+
+def save_frames(path: str, byte_arrays: List[Union[bytes, bytearray]], num_channels: int = DEFAULT_FRAME_CHANNELS,
+                rx_hist_max: int = DEFAULT_FRAME_RX_HIST, int_format: str = 'b') -> None:
+    """将帧字节数组按顺序写入文件，并在旁边写布局文件，供FrameSource.from_file内存映射读取"""
+    with open(path, 'wb') as f:
+        for arr in byte_arrays:
+            f.write(arr)
+    write_layout(path, num_channels, rx_hist_max, int_format)
+
+class FrameStream(FrameSource):
+    """
+    实时帧数据源
+
+    生产者（另一个线程中的日志解析，或者通过multiprocessing.Queue的其他进程）调用put把帧放进有界队列，
+    队列满时生产者阻塞等待。显示线程调用drain把队列里的帧批量移入环形存储：
+    存储按需倍增到max_frames，之后覆盖最旧的帧，帧号始终从保留的最旧帧开始计。
+    """
+
+    def __init__(self, num_channels: int = 80, rx_hist_max: int = 320, int_format: str = 'b',
+                 capacity: int = 1024, max_frames: int = 65536, queue_size: int = 256,
+                 frame_queue=None, cache_window: int = 64):
+        super().__init__(np.empty(0, dtype=np.dtype(int_format)), num_channels, rx_hist_max, int_format,
+                         cache_window, prefetch=0)
+        self.max_frames = max(max_frames, 1)
+        self.queue_size = queue_size
+        self.queue = frame_queue if frame_queue is not None else queue.Queue(maxsize=queue_size)
+        self._capacity = min(max(capacity, 1), self.max_frames)
+        self._buffer = np.empty((self._capacity, self.values_per_frame), dtype=self.dtype)
+        self._summary_buffer = np.empty(self._capacity, dtype=FRAME_SUMMARY_DTYPE)
+        self._start = 0
+        self._count = 0
+        self.received = 0
+        self.closed = False  # 生产者已调用close
+        self._detached = False  # 显示端已退出，不再接收
+
+    def put(self, frame: Union[bytes, bytearray], timeout: float = 0.1) -> bool:
+        """生产者接口：放入一帧，队列满时等待；显示端已退出时丢弃并返回False"""
+        while not self._detached:
+            try:
+                self.queue.put(bytes(frame), timeout=timeout)
+                return True
+            except queue.Full:
+                continue
         return False
-    
-    plt.rcParams["axes.unicode_minus"] = False  # 正确显示负号
-    return True
 
-# 初始化中文字体
-use_chinese = setup_chinese_fonts()
+    def close(self) -> None:
+        """生产者接口：通知不会再有新帧"""
+        while not self._detached:
+            try:
+                self.queue.put(None, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def detach(self) -> None:
+        """显示端接口：停止接收，阻塞在put上的生产者会随即返回"""
+        self._detached = True
+
+    def drain(self, block: bool = False, timeout: Optional[float] = None) -> Tuple[int, int]:
+        """把队列中已有的帧移入环形存储，返回(新增帧数, 因容量上限丢弃的最旧帧数)"""
+        incoming = []
+        try:
+            if block and not self.closed:
+                incoming.append(self.queue.get(timeout=timeout))
+            # 每次最多取一个队列长度，避免生产者很快时卡住界面
+            while len(incoming) < self.queue_size:
+                incoming.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        frames = []
+        for frame in incoming:
+            if frame is None:
+                self.closed = True
+            elif len(frame) == self.frame_bytes:
+                frames.append(frame)
+            else:
+                print(f"警告：帧长度无效（{len(frame)}），预期长度为{self.frame_bytes} - 已跳过" if use_chinese else f"Warning: Frame has invalid length {len(frame)} (expected {self.frame_bytes}) - skipping")
+        if not frames:
+            return 0, 0
+        return len(frames), self._append(np.frombuffer(b''.join(frames), dtype=self.dtype).reshape(len(frames), -1))
+
+    def _append(self, block: np.ndarray) -> int:
+        self.received += len(block)
+        dropped = 0
+        if len(block) > self.max_frames:
+            dropped = self._count + len(block) - self.max_frames
+            block = block[-self.max_frames:]
+        if self._count + len(block) > self._capacity and self._capacity < self.max_frames:
+            self._grow(min(max(self._count + len(block), self._capacity * 2), self.max_frames))
+
+        summary = np.empty(len(block), dtype=FRAME_SUMMARY_DTYPE)
+        self._summarize(block, summary)
+        positions = (self._start + self._count + np.arange(len(block))) % self._capacity
+        self._buffer[positions] = block
+        self._summary_buffer[positions] = summary
+
+        overflow = max(self._count + len(block) - self._capacity, 0)
+        if dropped == 0:
+            dropped = overflow
+        self._start = (self._start + overflow) % self._capacity
+        self._count = min(self._count + len(block), self._capacity)
+        if dropped:
+            # 帧号整体前移，缓存的解码结果不再对应
+            with self._lock:
+                self._cache.clear()
+        return dropped
+
+    def _grow(self, capacity: int) -> None:
+        order = self._positions(0, self._count)
+        buffer = np.empty((capacity, self.values_per_frame), dtype=self.dtype)
+        buffer[:self._count] = self._buffer[order]
+        summary = np.empty(capacity, dtype=FRAME_SUMMARY_DTYPE)
+        summary[:self._count] = self._summary_buffer[order]
+        self._buffer, self._summary_buffer, self._capacity, self._start = buffer, summary, capacity, 0
+
+    def _positions(self, start: int, stop: int) -> np.ndarray:
+        return (self._start + np.arange(start, stop)) % self._capacity
+
+    def __len__(self) -> int:
+        return self._count
+
+    def values(self, index: int) -> np.ndarray:
+        return self._buffer[(self._start + index) % self._capacity]
+
+    def _block(self, start: int, stop: int) -> np.ndarray:
+        return self._buffer[self._positions(start, stop)]
+
+    def column_max(self, start: int, stop: int) -> int:
+        if self._count == 0:
+            return 0
+        return int(self._block(0, self._count)[:, start:stop].max())
+
+    def summary(self, chunk_frames: int = 4096) -> np.ndarray:
+        """概要在帧进入存储时已逐批算好，这里只按帧号顺序取出"""
+        return self._summary_buffer[self._positions(0, self._count)]
+
+def find_anomaly_frames(summary: np.ndarray, threshold: float = 3.5) -> np.ndarray:
+    """
+    用中位数/MAD的稳健z分数找出概要指标明显偏离的帧
+
+    返回每段连续异常的起始帧，便于逐段跳转。
+    """
+    flags = np.zeros(len(summary), dtype=bool)
+    for name in summary.dtype.names:
+        values = summary[name].astype(float)
+        finite = np.isfinite(values)
+        if not finite.any():
+            continue
+        median = np.median(values[finite])
+        mad = np.median(np.abs(values[finite] - median))
+        if mad == 0:
+            continue
+        with np.errstate(invalid='ignore'):
+            flags |= np.abs(values - median) > threshold * 1.4826 * mad
+    frames = np.flatnonzero(flags)
+    return frames[np.diff(frames, prepend=-2) > 1]
+
+def downsample_extremes(values: np.ndarray, max_columns: int) -> np.ndarray:
+    """把时间序列压缩到最多max_columns列，每列取偏离整体中位数最远的值，异常帧不会被平均掉"""
+    values = np.asarray(values, dtype=float)
+    if len(values) <= max_columns:
+        return values
+    per_column = -(-len(values) // max_columns)
+    padded = np.full(-(-len(values) // per_column) * per_column, np.nan)
+    padded[:len(values)] = values
+    bins = padded.reshape(-1, per_column)
+    finite = np.isfinite(values)
+    median = np.median(values[finite]) if finite.any() else 0.0
+    deviation = np.nan_to_num(np.abs(bins - median), nan=-1.0)
+    return bins[np.arange(len(bins)), deviation.argmax(axis=1)]
+
+def show_channel_heatmaps(frames: FrameSource, output: Optional[str] = None, max_columns: int = 2000,
+                          delta_min: int = -20, delta_max: int = 20) -> None:
+    """
+    整个抓包的静态分析视图：成功率、RSSI差值和AFH使能三张通道×时间热力图，每张一次imshow
+
+    output不为空时保存为图片，否则直接显示。
+    """
+    if len(frames) == 0:
+        print("没有可可视化的有效数据" if use_chinese else "No valid data to visualize")
+        return
+    chinese = setup_chinese_fonts()
+    heatmaps, frames_per_column = frames.channel_heatmaps(max_columns)
+    n = frames.num_channels
+    columns = heatmaps['success_rate'].shape[1]
+    # 池化后每个时间段占最小、最大两列
+    frames_covered = columns * frames_per_column // (2 if frames_per_column > 1 else 1)
+    extent = (-0.5, frames_covered - 0.5, 0.5, n + 0.5)
+
+    panels = [
+        ('success_rate', 'RdYlGn', 0, 1, '成功率' if chinese else 'Success rate'),
+        ('delta', 'coolwarm', delta_min, delta_max, '差值 (dBm)' if chinese else 'Delta (dBm)'),
+        ('afh', 'Greys', 0, 1, 'AFH使能' if chinese else 'AFH enabled'),
+    ]
+    fig, axes = plt.subplots(len(panels), 1, figsize=(16, 12), sharex=True)
+    for ax, (name, cmap_name, vmin, vmax, label) in zip(axes, panels):
+        cmap = plt.get_cmap(cmap_name).copy()
+        cmap.set_bad('lightgray')
+        image = ax.imshow(np.ma.masked_invalid(heatmaps[name]), aspect='auto', origin='lower',
+                          interpolation='nearest', cmap=cmap, vmin=vmin, vmax=vmax, extent=extent)
+        fig.colorbar(image, ax=ax, pad=0.01).set_label(label, fontweight='bold')
+        ax.set_ylabel('通道编号' if chinese else 'Channel Number', fontweight='bold')
+        ax.set_title(label, fontweight='bold')
+    axes[-1].set_xlabel('帧' if chinese else 'Frame', fontweight='bold')
+
+    if frames_per_column > 1:
+        pooling = f"（每{frames_per_column}帧取最小/最大值）" if chinese else f" (min/max of every {frames_per_column} frames)"
+    else:
+        pooling = ""
+    fig.suptitle((f"通道×时间统计，共{len(frames)}帧" if chinese else f"Channel x Time Statistics, {len(frames)} frames") + pooling,
+                 fontsize=16, fontweight='bold')
+
+    if output:
+        fig.savefig(output, dpi=100)
+        plt.close(fig)
+    else:
+        plt.show()
+
+# 概览条最多显示的列数，长时间的抓包按列降采样
+OVERVIEW_MAX_COLUMNS = 2000
+OVERVIEW_HEIGHT = 0.08
+# 实时模式下概览条属于静态背景，更新需要整图重绘，限制刷新频率
+OVERVIEW_REFRESH_SECONDS = 2.0
 
 class RSSISuccessTracker:
     def __init__(
@@ -50,7 +695,9 @@ class RSSISuccessTracker:
         subplot_heights: List[float] = [0.2, 0.2, 0.2, 0.4],
         update_interval: int = 1000,
         start_frame: int = 0,
-        rx_hist_max: int = 320
+        rx_hist_max: int = 320,
+        cache_window: int = 64,
+        prefetch: int = 8
     ):
         self.byte_arrays = byte_arrays
         self.num_channels = num_channels
@@ -68,81 +715,95 @@ class RSSISuccessTracker:
         self.update_interval = update_interval
         self.start_frame = start_frame
         self.rx_hist_max = rx_hist_max
+        self.cache_window = cache_window
+        self.prefetch = prefetch
         self.use_chinese = use_chinese  # 传递中文字体可用性标志
         
         # 动画控制参数
         self.animation_running = True
         self.current_frame = 0
         self.play_direction = 1
-        self.animation = None
+        self.timer = None
+        self.blit_manager = None
+        self.fig = None
+        self._overview_drawn = 0.0
 
-        # Tkinter配置
-        self.tk_root = tk.Tk()
-        self.tk_root.withdraw()
+        # Tkinter只在弹出帧号输入框时才创建，无界面运行时不需要显示环境
+        self.tk_root = None
         
-        # 数据处理
-        self.rssi_data, self.act_rssi_data, self.success_data, self.failure_data, self.afh_ch_maps, self.rx_hist = self._process_data()
-        self.delta_data = self.act_rssi_data - self.rssi_data if self.act_rssi_data is not None else None
-        self.total_samples = len(self.rssi_data) if self.rssi_data is not None else 0
+        # 数据处理（按需解码，不在启动时展开所有帧）
+        self.frames = self._open_frames()
+        self.total_samples = len(self.frames) if self.frames is not None else 0
+        # 实时模式：帧从FrameStream持续到达，运行时显示固定在最新一帧
+        self.streaming = isinstance(self.frames, FrameStream)
         
         if self.total_samples > 0:
-            self._initialize_plot()
-            self.set_current_frame(self.start_frame)
+            # 图形在第一次显示时才创建，这里只记录起始帧
+            self.current_frame = int(np.clip(self.start_frame, 0, self.total_samples - 1))
+            # 概要索引在加载时一次算好，用于概览条和异常跳转
+            self.summary = self.frames.summary()
+            self.anomaly_frames = find_anomaly_frames(self.summary)
         else:
-            print("没有可可视化的有效数据" if use_chinese else "No valid data to visualize")
+            self.summary = np.empty(0, dtype=FRAME_SUMMARY_DTYPE)
+            self.anomaly_frames = np.empty(0, dtype=np.intp)
+            if not self.streaming:
+                print("没有可可视化的有效数据" if use_chinese else "No valid data to visualize")
 
-    def _process_data(self):
+    def _open_frames(self) -> Optional[FrameSource]:
+        if isinstance(self.byte_arrays, FrameSource):
+            return self.byte_arrays
+        if isinstance(self.byte_arrays, np.ndarray):
+            return FrameSource(self.byte_arrays, self.num_channels, self.rx_hist_max, self.int_format,
+                               self.cache_window, self.prefetch)
+        
         if not isinstance(self.byte_arrays, list):
             print("错误：输入必须是字节数组列表" if self.use_chinese else "Error: Input must be a list of byte arrays")
-            return None, None, None, None, None, None
+            return None
             
         if len(self.byte_arrays) == 0:
             print("错误：字节数组列表为空" if self.use_chinese else "Error: Byte array list is empty")
-            return None, None, None, None, None, None
+            return None
 
-        total_values = self.num_channels * 5 + self.rx_hist_max
-        bytes_per_value = struct.calcsize(self.int_format)
-        required_length = total_values * bytes_per_value
-        
-        rssi_data, act_rssi_data, success_data, failure_data, afh_ch_maps, rx_hist = [], [], [], [], [], []
-        for i, arr in enumerate(self.byte_arrays):
-            if not isinstance(arr, (bytes, bytearray)):
-                print(f"警告：第{i+1}个元素不是字节数组 - 已跳过" if self.use_chinese else f"Warning: Element {i+1} is not a byte array - skipping")
-                continue
-                
-            if len(arr) != required_length:
-                print(f"警告：第{i+1}个字节数组长度无效（{len(arr)}），预期长度为{required_length} - 已跳过" if self.use_chinese else f"Warning: Byte array {i+1} has invalid length {len(arr)} (expected {required_length}) - skipping")
-                continue
-                
-            try:
-                all_values = struct.unpack(f'{total_values}{self.int_format}', arr)
-                rssi_data.append(all_values[:self.num_channels])
-                act_rssi_data.append(all_values[self.num_channels:2*self.num_channels])
-                success_data.append(all_values[2*self.num_channels:3*self.num_channels])
-                failure_data.append(all_values[3*self.num_channels:4*self.num_channels])
-                afh_ch_maps.append(all_values[4*self.num_channels:5*self.num_channels])
-                rx_hist.append(all_values[5*self.num_channels:])
-            except Exception as e:
-                print(f"解析第{i+1}个字节数组时出错：{e} - 已跳过" if self.use_chinese else f"Error unpacking byte array {i+1}: {e} - skipping")
-                continue
-        
-        if not rssi_data:
+        frames = FrameSource(self.byte_arrays, self.num_channels, self.rx_hist_max, self.int_format,
+                             self.cache_window, self.prefetch)
+        if len(frames) == 0:
             print("错误：未处理到有效的RSSI数据" if self.use_chinese else "Error: No valid RSSI data processed")
-            return None, None, None, None, None, None
-        
-        return (
-            np.array(rssi_data),
-            np.array(act_rssi_data),
-            np.array(success_data),
-            np.array(failure_data),
-            np.array(afh_ch_maps),
-            np.array(rx_hist)
-        )
+            return None
+        return frames
+
+    def _ensure_plot(self):
+        """第一次需要图形时才配置字体并创建figure"""
+        if self.fig is not None:
+            return
+        self.use_chinese = setup_chinese_fonts()
+        self._initialize_plot()
+        self._draw_frame()
+
+    def _get_tk_root(self):
+        if self.tk_root is None:
+            import tkinter as tk
+            self.tk_root = tk.Tk()
+            self.tk_root.withdraw()
+        return self.tk_root
+
+    def _show_error(self, title: str, message: str):
+        from tkinter import messagebox
+        messagebox.showerror(title=title, message=message, parent=self._get_tk_root())
+
+    def _resolve_count_max(self) -> int:
+        if self.count_max is None:
+            n = self.num_channels
+            max_success = self.frames.column_max(2*n, 3*n)
+            max_failure = self.frames.column_max(3*n, 4*n)
+            self.count_max = max(max_success + max_failure, self.min_count_max)
+        else:
+            self.count_max = max(self.count_max, self.min_count_max)
+        return self.count_max
 
     def _initialize_plot(self):
-        self.fig, (self.ax_scan_rssi, self.ax_delta, self.ax_success, self.ax_rx_hist) = plt.subplots(
-            4, 1, figsize=(16, 20), sharex=False,
-            gridspec_kw={'height_ratios': self.subplot_heights}
+        self.fig, (self.ax_scan_rssi, self.ax_delta, self.ax_success, self.ax_rx_hist, self.ax_overview) = plt.subplots(
+            5, 1, figsize=(16, 20), sharex=False,
+            gridspec_kw={'height_ratios': list(self.subplot_heights) + [OVERVIEW_HEIGHT]}
         )
         self.fig.subplots_adjust(top=0.95, hspace=0.3)
         
@@ -160,18 +821,19 @@ class RSSISuccessTracker:
         
         self.channels = np.arange(1, self.num_channels + 1)
         
-        if self.count_max is None:
-            max_success = self.success_data.max() if len(self.success_data) else 0
-            max_failure = self.failure_data.max() if len(self.failure_data) else 0
-            self.count_max = max(max_success + max_failure, self.min_count_max)
-        else:
-            self.count_max = max(self.count_max, self.min_count_max)
+        self._resolve_count_max()
+        
+        # 柱子颜色预先转换为RGBA，每帧用np.where整体选择
+        self.rgba_blue = to_rgba('blue', 0.8)
+        self.rgba_purple = to_rgba('purple', 0.8)
+        self.rgba_delta = to_rgba_array(['#4CAF50', '#F44336', '#9E9E9E'], 0.8)
         
         # 1. 扫描RSSI子图
-        self.scan_rssi_bars = self.ax_scan_rssi.bar(
-            self.channels, np.zeros(self.num_channels), 
-            color='blue', alpha=0.8, label='扫描RSSI (dBm)' if self.use_chinese else 'Scanned RSSI (dBm)'
+        self.scan_rssi_bars = BarCollection(
+            self.ax_scan_rssi, self.channels,
+            facecolor=self.rgba_blue, label='扫描RSSI (dBm)' if self.use_chinese else 'Scanned RSSI (dBm)'
         )
+        self.ax_scan_rssi.set_xlim(0, self.num_channels + 1)
         self.ax_scan_rssi.set_ylim(self.db_min, self.db_max)
         self.ax_scan_rssi.yaxis.set_major_locator(MultipleLocator(self.db_step))
         self.ax_scan_rssi.grid(axis='y', linestyle='-', alpha=0.7)
@@ -180,10 +842,11 @@ class RSSISuccessTracker:
         self.ax_scan_rssi.set_title('各通道扫描RSSI' if self.use_chinese else 'Scanned RSSI by Channel', fontweight='bold')
         
         # 2. 差值子图
-        self.delta_bars = self.ax_delta.bar(
-            self.channels, np.zeros(self.num_channels), 
-            alpha=0.8, label='差值（实际-扫描）' if self.use_chinese else 'Delta (Actual - Scanned)'
+        self.delta_bars = BarCollection(
+            self.ax_delta, self.channels,
+            facecolor=self.rgba_delta[2], label='差值（实际-扫描）' if self.use_chinese else 'Delta (Actual - Scanned)'
         )
+        self.ax_delta.set_xlim(0, self.num_channels + 1)
         self.ax_delta.set_ylim(self.delta_min, self.delta_max)
         self.ax_delta.yaxis.set_major_locator(MultipleLocator(self.delta_step))
         self.ax_delta.grid(axis='y', linestyle='-', alpha=0.7)
@@ -192,9 +855,12 @@ class RSSISuccessTracker:
         self.ax_delta.legend(loc='upper right')
         self.ax_delta.set_title('RSSI差值' if self.use_chinese else 'RSSI Difference', fontweight='bold')
         
-        # 3. 成功/失败计数子图
-        self.success_container = None
-        self.failure_container = None
+        # 3. 成功/失败计数子图（失败柱叠加在成功柱之上）
+        self.success_bars = BarCollection(self.ax_success, self.channels, facecolor=to_rgba('#4CAF50', 0.8),
+                                          label='成功' if self.use_chinese else 'Success')
+        self.failure_bars = BarCollection(self.ax_success, self.channels, facecolor=to_rgba('#F44336', 0.8),
+                                          label='失败' if self.use_chinese else 'Failure')
+        self.ax_success.set_xlim(0, self.num_channels + 1)
         self.ax_success.set_ylim(self.count_min, self.count_max)
         self.ax_success.yaxis.set_major_locator(MultipleLocator(5))
         self.ax_success.grid(axis='y', linestyle='-', alpha=0.7)
@@ -202,8 +868,6 @@ class RSSISuccessTracker:
         self.ax_success.set_ylabel('计数' if self.use_chinese else 'Count', fontweight='bold')
         self.ax_success.set_xticks(self.channels[::5])
         self.ax_success.set_title('成功/失败计数' if self.use_chinese else 'Success/Failure Counts', fontweight='bold')
-        self.ax_success.bar([], [], color='#4CAF50', label='成功' if self.use_chinese else 'Success')
-        self.ax_success.bar([], [], color='#F44336', label='失败' if self.use_chinese else 'Failure')
         self.ax_success.legend(loc='upper right')
         
         # 4. RX历史子图
@@ -218,6 +882,9 @@ class RSSISuccessTracker:
         self.ax_rx_hist.set_title('接收历史（仅显示非零值）' if self.use_chinese else 'Receiver History (Non-Zero Values Only)', fontweight='bold')
         self.ax_rx_hist.legend(['RX历史数据' if self.use_chinese else 'RX History Data'])
         
+        # 5. 概览条
+        self._initialize_overview()
+        
         # 主标题和操作说明
         self.main_title = self.fig.suptitle(
             self._get_status_text(), fontsize=16, fontweight='bold'
@@ -226,33 +893,94 @@ class RSSISuccessTracker:
         if self.use_chinese:
             self.instruction_text = self.fig.text(
                 0.5, 0.01,
-                "点击：暂停/继续 | →：前进 | ←：后退 | s：设置当前帧",
+                "点击：暂停/继续 | →：前进 | ←：后退 | s：设置当前帧 | n/p：下一个/上一个异常 | 点击概览条：跳转",
                 ha='center', style='italic'
             )
         else:
             self.instruction_text = self.fig.text(
                 0.5, 0.01,
-                "Click: Pause/Resume | →: Forward | ←: Reverse | s: Set current frame",
+                "Click: Pause/Resume | →: Forward | ←: Reverse | s: Set current frame | n/p: Next/previous anomaly | Click overview: Seek",
                 ha='center', style='italic'
             )
+        
+        self.blit_manager = BlitManager(self.fig.canvas, [
+            self.scan_rssi_bars.collection, self.delta_bars.collection,
+            self.success_bars.collection, self.failure_bars.collection,
+            self.rx_hist_line, self.overview_cursor, self.main_title
+        ])
+
+    def _initialize_overview(self):
+        """按帧显示概要索引的热力条，每行按固定量程归一化，超出列数时保留偏离最大的帧"""
+        cmap = plt.get_cmap('viridis').copy()
+        cmap.set_bad('lightgray')
+        self.overview_image = self.ax_overview.imshow(
+            np.zeros((4, 1)), aspect='auto', cmap=cmap, vmin=0, vmax=1, interpolation='nearest'
+        )
+        self.ax_overview.set_yticks(range(4))
+        if self.use_chinese:
+            self.ax_overview.set_yticklabels(['成功率', '平均差值', 'AFH信道', 'RX历史'])
+            self.ax_overview.set_xlabel('帧（点击跳转）', fontweight='bold')
+        else:
+            self.ax_overview.set_yticklabels(['Success', 'Delta', 'AFH', 'RX hist'])
+            self.ax_overview.set_xlabel('Frame (click to seek)', fontweight='bold')
+        self.overview_markers, = self.ax_overview.plot([], [], 'v', color='red', markersize=5, clip_on=False)
+        self.overview_cursor = self.ax_overview.axvline(self.current_frame, color='red', linewidth=1.5)
+        self._update_overview()
+
+    def _update_overview(self):
+        rows = [
+            (self.summary['success_rate'], 0, 1),
+            (self.summary['mean_delta'], self.delta_min, self.delta_max),
+            (self.summary['afh_channels'], 0, self.num_channels),
+            (self.summary['rx_hist_count'], 0, self.rx_hist_max),
+        ]
+        image = np.vstack([
+            (downsample_extremes(values, OVERVIEW_MAX_COLUMNS) - low) / (high - low)
+            for values, low, high in rows
+        ])
+        frames_per_column = -(-self.total_samples // image.shape[1])
+        self.overview_image.set_data(np.ma.masked_invalid(image))
+        self.overview_image.set_extent((-0.5, image.shape[1] * frames_per_column - 0.5, len(rows) - 0.5, -0.5))
+        self.ax_overview.set_xlim(-0.5, self.total_samples - 0.5)
+        self.overview_markers.set_data(self.anomaly_frames, np.full(len(self.anomaly_frames), -0.5))
+        self._overview_drawn = time.monotonic()
+
+    def _jump_to_anomaly(self, direction: int):
+        if direction > 0:
+            candidates = self.anomaly_frames[self.anomaly_frames > self.current_frame]
+        else:
+            candidates = self.anomaly_frames[self.anomaly_frames < self.current_frame][::-1]
+        if len(candidates) == 0:
+            print("没有更多异常帧" if self.use_chinese else "No more anomalies")
+            return
+        self.set_current_frame(int(candidates[0]))
 
     def _get_status_text(self):
         if self.use_chinese:
             status = "运行中" if self.animation_running else "已暂停"
             direction = "正向" if self.play_direction == 1 else "反向"
+            if self.streaming and self.animation_running:
+                direction = "实时"
             return f'帧 {self.current_frame + 1}/{self.total_samples} | {status} | {direction}'
         else:
             status = "Running" if self.animation_running else "Paused"
             direction = "Forward" if self.play_direction == 1 else "Reverse"
+            if self.streaming and self.animation_running:
+                direction = "Live"
             return f'Frame {self.current_frame + 1}/{self.total_samples} | {status} | {direction}'
 
     def _on_click(self, event):
         if event.inaxes is None:
             return
+        if event.inaxes is self.ax_overview:
+            if event.xdata is not None:
+                self.set_current_frame(int(np.clip(round(event.xdata), 0, self.total_samples - 1)))
+            return
         self.animation_running = not self.animation_running
-        if self.animation:
-            (self.animation.event_source.start() if self.animation_running 
-             else self.animation.event_source.stop())
+        # 实时模式暂停时定时器继续接收新帧，只是不再跟随最新帧
+        if self.timer and not self.streaming:
+            (self.timer.start() if self.animation_running 
+             else self.timer.stop())
         self.main_title.set_text(self._get_status_text())
         self.fig.canvas.draw_idle()
 
@@ -264,6 +992,9 @@ class RSSISuccessTracker:
         elif event.key == 's':
             self.set_current_frame()
             return
+        elif event.key in ['n', 'p']:
+            self._jump_to_anomaly(1 if event.key == 'n' else -1)
+            return
         self.main_title.set_text(self._get_status_text())
         self.fig.canvas.draw_idle()
 
@@ -271,18 +1002,20 @@ class RSSISuccessTracker:
         if self.total_samples == 0:
             return
 
-        if frame_num is None:
+        from_dialog = frame_num is None
+        if from_dialog:
+            from tkinter import simpledialog
             if self.use_chinese:
                 user_input = simpledialog.askstring(
                     title="设置当前帧",
                     prompt=f"请输入帧号（1到{self.total_samples}，当前：{self.current_frame + 1}）：",
-                    parent=self.tk_root
+                    parent=self._get_tk_root()
                 )
             else:
                 user_input = simpledialog.askstring(
                     title="Set Current Frame",
                     prompt=f"Enter frame (1 to {self.total_samples}, current: {self.current_frame + 1}):",
-                    parent=self.tk_root
+                    parent=self._get_tk_root()
                 )
             if not user_input:
                 return
@@ -290,102 +1023,257 @@ class RSSISuccessTracker:
                 frame_num = int(user_input) - 1
             except ValueError:
                 if self.use_chinese:
-                    simpledialog.showerror(
-                        title="输入无效",
-                        message="请输入有效的整数。",
-                        parent=self.tk_root
-                    )
+                    self._show_error("输入无效", "请输入有效的整数。")
                 else:
-                    simpledialog.showerror(
-                        title="Invalid Input",
-                        message="Please enter a valid integer.",
-                        parent=self.tk_root
-                    )
+                    self._show_error("Invalid Input", "Please enter a valid integer.")
                 return
 
         if not (0 <= frame_num < self.total_samples):
             if self.use_chinese:
-                simpledialog.showerror(
-                    title="帧号无效",
-                    message=f"帧号必须在1到{self.total_samples}之间。",
-                    parent=self.tk_root
-                )
+                title, message = "帧号无效", f"帧号必须在1到{self.total_samples}之间。"
             else:
-                simpledialog.showerror(
-                    title="Invalid Frame",
-                    message=f"Frame must be between 1 and {self.total_samples}.",
-                    parent=self.tk_root
-                )
+                title, message = "Invalid Frame", f"Frame must be between 1 and {self.total_samples}."
+            if from_dialog:
+                self._show_error(title, message)
+            else:
+                print(f"{title}: {message}")
             return
 
         self.current_frame = frame_num
-        self._update_plot(None)
-        self.main_title.set_text(self._get_status_text())
-        self.fig.canvas.draw_idle()
+        # 图形还没创建时只记录帧号，创建时会直接画这一帧
+        if self.fig is not None:
+            self._draw_frame()
+            self.fig.canvas.draw_idle()
+
+    def _poll_stream(self, block: bool = False) -> int:
+        """取出实时队列中的新帧，返回新增帧数"""
+        added, dropped = self.frames.drain(block=block)
+        if added == 0:
+            return 0
+        self.total_samples = len(self.frames)
+        self.summary = self.frames.summary()
+        self.anomaly_frames = find_anomaly_frames(self.summary)
+        if self.animation_running:
+            self.current_frame = self.total_samples - 1
+        else:
+            # 最旧的帧被覆盖后帧号整体前移，暂停时仍停在同一帧上
+            self.current_frame = max(self.current_frame - dropped, 0)
+        if self.fig is not None and time.monotonic() - self._overview_drawn >= OVERVIEW_REFRESH_SECONDS:
+            self._update_overview()
+            self.fig.canvas.draw_idle()
+        return added
 
     def _update_plot(self, frame):
-        self.current_frame = np.clip(
-            self.current_frame + self.play_direction,
-            0, self.total_samples - 1
-        )
+        if self.streaming:
+            if self._poll_stream() == 0 or not self.animation_running:
+                return []
+        else:
+            self.current_frame = int(np.clip(
+                self.current_frame + self.play_direction,
+                0, self.total_samples - 1
+            ))
+        artists = self._draw_frame()
+        self.blit_manager.update(self._blit_regions())
+        return artists
+
+    def _draw_frame(self):
+        """将current_frame的数据批量写入已有的图形对象"""
+        frame = self.frames[self.current_frame]
+        self.frames.prefetch(self.current_frame, self.play_direction)
         
         # 更新RSSI柱状图
-        current_rssi = self.rssi_data[self.current_frame]
-        current_afh = self.afh_ch_maps[self.current_frame]
-        for i, (bar, val) in enumerate(zip(self.scan_rssi_bars, current_rssi)):
-            bar.set_height(val)
-            bar.set_color('purple' if current_afh[i] == 1 else 'blue')
+        self.scan_rssi_bars.set_heights(frame.rssi)
+        self.scan_rssi_bars.set_facecolors(
+            np.where((frame.afh_ch_map == 1)[:, None], self.rgba_purple, self.rgba_blue)
+        )
         
-        # 更新差值柱状图
-        current_delta = self.delta_data[self.current_frame]
-        current_success = self.success_data[self.current_frame]
-        current_failure = self.failure_data[self.current_frame]
-        for i, delta in enumerate(current_delta):
-            if current_success[i] > 0 or current_failure[i] > 0:
-                self.delta_bars[i].set_height(delta)
-                self.delta_bars[i].set_color(
-                    '#4CAF50' if delta > 0 else '#F44336' if delta < 0 else '#9E9E9E'
-                )
-                self.delta_bars[i].set_alpha(0.8)
-            else:
-                self.delta_bars[i].set_height(0)
-                self.delta_bars[i].set_alpha(0)
+        # 更新差值柱状图，没有收发数据的信道隐藏
+        current_delta = frame.delta
+        current_success = frame.success
+        current_failure = frame.failure
+        has_data = (current_success > 0) | (current_failure > 0)
+        delta_colors = self.rgba_delta[np.where(current_delta > 0, 0, np.where(current_delta < 0, 1, 2))]
+        delta_colors[~has_data, 3] = 0
+        self.delta_bars.set_heights(np.where(has_data, current_delta, 0))
+        self.delta_bars.set_facecolors(delta_colors)
         
         # 更新成功/失败柱状图
-        if self.success_container:
-            for bar in self.success_container + self.failure_container:
-                bar.remove()
-        self.success_container = self.ax_success.bar(
-            self.channels, current_success, color='#4CAF50', alpha=0.8
-        )
-        self.failure_container = self.ax_success.bar(
-            self.channels, current_failure, color='#F44336', alpha=0.8, bottom=current_success
-        )
+        self.success_bars.set_heights(current_success)
+        self.failure_bars.set_heights(current_failure, bottoms=current_success)
         
         # 更新RX历史图
-        current_rx_hist = self.rx_hist[self.current_frame]
+        current_rx_hist = frame.rx_hist
         non_zero_mask = current_rx_hist != 0
         non_zero_indices = np.where(non_zero_mask)[0]
         non_zero_values = current_rx_hist[non_zero_mask]
         self.rx_hist_line.set_data(non_zero_indices, non_zero_values)
+        self.overview_cursor.set_xdata([self.current_frame, self.current_frame])
         
         self.main_title.set_text(self._get_status_text())
-        return (list(self.scan_rssi_bars) + list(self.delta_bars) +
-                list(self.success_container) + list(self.failure_container) +
-                [self.rx_hist_line])
+        return [self.scan_rssi_bars.collection, self.delta_bars.collection,
+                self.success_bars.collection, self.failure_bars.collection,
+                self.rx_hist_line, self.overview_cursor, self.main_title]
+
+    def _blit_regions(self):
+        """每帧需要blit的区域：各子图、概览条和标题所在的整行"""
+        title_extent = self.main_title.get_window_extent()
+        title_row = Bbox([[self.fig.bbox.x0, title_extent.y0], [self.fig.bbox.x1, title_extent.y1]])
+        return [self.ax_scan_rssi.bbox, self.ax_delta.bbox, self.ax_success.bbox,
+                self.ax_rx_hist.bbox, self.ax_overview.bbox, title_row]
 
     def start_visualization(self):
+        if self.streaming and self.total_samples == 0:
+            # 等到第一帧到达再创建图形
+            print("等待实时数据..." if self.use_chinese else "Waiting for live frames...")
+            while self.total_samples == 0 and not self.frames.closed:
+                self._poll_stream(block=True)
         if self.total_samples == 0:
             return
-        self.animation = FuncAnimation(
-            self.fig, self._update_plot,
-            interval=self.update_interval, blit=False, repeat=True,
-            cache_frame_data=False
+        self._ensure_plot()
+        self.timer = self.fig.canvas.new_timer(interval=self.update_interval)
+        self.timer.add_callback(self._update_plot, None)
+        self.timer.start()
+        try:
+            plt.show()
+        finally:
+            if self.streaming:
+                self.frames.detach()
+
+    def _layout_kwargs(self) -> dict:
+        """导出进程重建相同布局所需的参数，count_max按全部帧预先确定，保证各段坐标一致"""
+        return dict(
+            num_channels=self.num_channels, int_format=self.int_format,
+            db_min=self.db_min, db_max=self.db_max, db_step=self.db_step,
+            delta_min=self.delta_min, delta_max=self.delta_max, delta_step=self.delta_step,
+            count_min=self.count_min, count_max=self._resolve_count_max(), min_count_max=self.min_count_max,
+            subplot_heights=self.subplot_heights, rx_hist_max=self.rx_hist_max
         )
-        plt.show()
+
+    def export_frames(self, output: str, start: int = 0, stop: Optional[int] = None, step: int = 1,
+                      workers: Optional[int] = None, fps: int = 10, dpi: Optional[int] = None) -> List[str]:
+        """
+        无界面批量导出帧
+
+        output以.mp4等视频后缀结尾时导出视频（需要ffmpeg），否则作为目录写出frame_XXXXXX.png序列。
+        导出[start, stop)中每step帧，按连续分段分给多个工作进程，每个进程用Agg后端渲染自己的一段。
+        """
+        if self.total_samples == 0:
+            return []
+        indices = np.arange(self.total_samples)[start:stop:step]
+        if len(indices) == 0:
+            print("没有需要导出的帧" if self.use_chinese else "No frames to export")
+            return []
+
+        as_video = output.lower().endswith(VIDEO_EXTENSIONS)
+        ffmpeg = shutil.which(matplotlib.rcParams['animation.ffmpeg_path'])
+        if as_video and ffmpeg is None:
+            print("错误：导出视频需要ffmpeg" if self.use_chinese else "Error: ffmpeg is required for video export")
+            return []
+        if not as_video:
+            os.makedirs(output, exist_ok=True)
+
+        workers = max(1, min(workers or os.cpu_count() or 1, len(indices)))
+        slices = [chunk for chunk in np.array_split(indices, workers) if len(chunk)]
+
+        # 工作进程通过内存映射读取帧文件，内存中的数据先落盘一次
+        frames_path = self.frames.path
+        temp_path = None
+        if frames_path is None:
+            fd, temp_path = tempfile.mkstemp(suffix='.frames')
+            os.close(fd)
+            self.frames.save(temp_path)
+            frames_path = temp_path
+
+        if as_video:
+            root, ext = os.path.splitext(output)
+            outputs = [f"{root}.part{i:03d}{ext}" for i in range(len(slices))]
+        else:
+            outputs = [output] * len(slices)
+        tasks = [dict(frames_path=frames_path, indices=chunk.tolist(), output=part, fps=fps, dpi=dpi,
+                      ffmpeg=ffmpeg, layout=self._layout_kwargs())
+                 for chunk, part in zip(slices, outputs)]
+
+        try:
+            # spawn进程不继承交互后端的状态
+            with ProcessPoolExecutor(max_workers=len(tasks), mp_context=multiprocessing.get_context('spawn')) as pool:
+                results = list(pool.map(_render_slice, tasks))
+        finally:
+            if temp_path is not None:
+                for path in (temp_path, summary_path(temp_path), layout_path(temp_path)):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+        if not as_video:
+            return [path for paths in results for path in paths]
+
+        # 各段视频编码参数相同，直接无损拼接
+        list_path = f"{os.path.splitext(output)[0]}.parts.txt"
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for part in outputs:
+                f.write(f"file '{os.path.abspath(part)}'\n")
+        try:
+            subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                            '-i', list_path, '-c', 'copy', output], check=True)
+        finally:
+            os.remove(list_path)
+            for part in outputs:
+                if os.path.exists(part):
+                    os.remove(part)
+        return [output]
+
+# 导出为视频的文件后缀，其他输出路径都当作PNG序列的目录
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.mov', '.avi')
+
+def _render_slice(task: dict) -> List[str]:
+    """导出工作进程：用Agg后端按交互界面相同的布局渲染一段帧"""
+    plt.switch_backend('Agg')
+    layout = task['layout']
+    frames = FrameSource.from_file(task['frames_path'], layout['num_channels'], layout['rx_hist_max'],
+                                   layout['int_format'], prefetch=0)
+    tracker = RSSISuccessTracker(frames, **layout)
+    tracker._ensure_plot()
+    tracker.instruction_text.set_visible(False)
+    if task['dpi']:
+        tracker.fig.set_dpi(task['dpi'])
+    canvas = tracker.fig.canvas
+    canvas.draw()  # 缓存静态背景，之后每帧只重绘动画对象
+
+    output = task['output']
+    writer = None
+    if output.lower().endswith(VIDEO_EXTENSIONS):
+        width, height = canvas.get_width_height()
+        writer = subprocess.Popen(
+            [task['ffmpeg'], '-y', '-loglevel', 'error',
+             '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}', '-r', str(task['fps']), '-i', '-',
+             '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-c:v', 'libx264', '-pix_fmt', 'yuv420p', output],
+            stdin=subprocess.PIPE
+        )
+
+    written = []
+    try:
+        for index in task['indices']:
+            tracker.current_frame = index
+            tracker._draw_frame()
+            tracker.blit_manager.update([])
+            image = np.asarray(canvas.buffer_rgba())
+            if writer is not None:
+                writer.stdin.write(image.tobytes())
+            else:
+                path = os.path.join(output, f'frame_{index + 1:06d}.png')
+                # 帧图主要是大块纯色，低压缩级别的PNG体积相差不大，编码快很多
+                plt.imsave(path, image, pil_kwargs={'compress_level': 1})
+                written.append(path)
+    finally:
+        if writer is not None:
+            writer.stdin.close()
+            if writer.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed while writing {output}")
+    plt.close(tracker.fig)
+    return written if writer is None else [output]
 
 # 示例用法
 if __name__ == "__main__":
+    import argparse
     import random
     
     def generate_sample_data(num_samples=15, num_channels=80, rx_hist_max=320):
@@ -408,11 +1296,44 @@ if __name__ == "__main__":
             sample_arrays.append(struct.pack(f'{len(all_vals)}b', *all_vals))
         return sample_arrays
     
+    parser = argparse.ArgumentParser(description='RSSI跟踪器')
+    parser.add_argument('frames', nargs='?', help='rx_total_parse.py --frames保存的帧文件，不指定时使用随机示例数据')
+    parser.add_argument('--channels', type=int, default=None,
+                        help='每帧的信道数（默认读取帧文件的.layout.json，没有时为80；示例数据为80）')
+    parser.add_argument('--rx-hist', type=int, default=None,
+                        help='每帧的RX历史长度（默认读取帧文件的.layout.json，没有时为2000；示例数据为320）')
+    parser.add_argument('--export', help='无界面导出：视频文件（.mp4等）或PNG序列目录')
+    parser.add_argument('--start', type=int, default=1, help='导出起始帧（从1开始）')
+    parser.add_argument('--stop', type=int, help='导出结束帧（包含）')
+    parser.add_argument('--step', type=int, default=1, help='每N帧导出一帧')
+    parser.add_argument('--workers', type=int, help='导出进程数，默认CPU核数')
+    parser.add_argument('--fps', type=int, default=10, help='导出视频的帧率')
+    parser.add_argument('--dpi', type=int, help='导出图像的DPI')
+    parser.add_argument('--heatmap', nargs='?', const='', default=None,
+                        help='显示整个抓包的通道×时间热力图，给出文件名时保存为图片')
+    args = parser.parse_args()
+
+    if args.frames:
+        data = FrameSource.from_file(args.frames, args.channels, args.rx_hist)
+        num_channels, rx_hist_max = data.num_channels, data.rx_hist_max
+    else:
+        num_channels, rx_hist_max = args.channels or 80, args.rx_hist or 320
+        data = generate_sample_data(num_channels=num_channels, rx_hist_max=rx_hist_max)
+
     tracker = RSSISuccessTracker(
-        generate_sample_data(),
+        data,
+        num_channels=num_channels,
         min_count_max=80,
         update_interval=800,
         start_frame=4,
-        rx_hist_max=320
+        rx_hist_max=rx_hist_max
     )
-    tracker.start_visualization()
\ No newline at end of file
+    if args.heatmap is not None:
+        show_channel_heatmaps(tracker.frames, output=args.heatmap or None,
+                              delta_min=tracker.delta_min, delta_max=tracker.delta_max)
+    elif args.export:
+        written = tracker.export_frames(args.export, start=args.start - 1, stop=args.stop, step=args.step,
+                                        workers=args.workers, fps=args.fps, dpi=args.dpi)
+        print(f"已导出 {len(written)} 个文件到 {args.export}")
+    else:
+        tracker.start_visualization()
\ No newline at end of file
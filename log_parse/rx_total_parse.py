@@ -1,13 +1,21 @@
 import csv
+import json
 import re
 import argparse
 import sys
 import math
+import contextlib
+import glob
+import multiprocessing
+import os
+import threading
 
 from dataclasses import dataclass
 from collections import defaultdict
-from typing import List, Optional, Union
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, List, Optional, Union
 from tabulate import tabulate
+import numpy as np
 
 # Summry only contain MIN_RSSI_THRESHOLD <= RSSI <= MAX_RSSI_THRESHOLD
 MAX_RSSI_THRESHOLD = 0
@@ -32,8 +40,50 @@ afh_ch_map=bytes(80)
 sf_scaned_chns=[]
 sf_stats_array=[]
 sf_stats_rssi_hist=[]
+# 汇总表（表名 -> {"headers", "rows"}），与打印的表格内容一致，供--tables/--serve输出
+# 每张表构造完后在锁内整体放入，之后不再修改；--serve的服务线程通过snapshot_summary_tables()读取
+summary_tables = {}
+summary_tables_lock = threading.Lock()
+# 统计帧的实时接收者（例如FrameStream.put），每生成一帧就推送一次
+stats_frame_sink: Optional[Callable[[bytes], object]] = None
+# 每个rx total块中音频时隙的丢包标志（True=未正确接收），按时间顺序，供--loss-trace导出
+audio_slot_loss = []
+
+def snapshot_summary_tables() -> dict:
+    """汇总表的快照（其他线程读取用）"""
+    with summary_tables_lock:
+        return dict(summary_tables)
+
+def record_audio_slots(channels):
+    """记录一个块中音频时隙的收包结果：is_audio的记录里rx_ok为0即视为该音频帧丢失"""
+    audio_slot_loss.append(np.fromiter((not c.rx_ok for c in channels if c.is_audio), dtype=bool))
+
+def save_loss_bitmap(path, chunks):
+    """
+    把音频时隙丢包标志保存为按位打包的.npy文件
+
+    文件内容是一个结构化记录：slots为时隙数，bits为np.packbits(bitorder='little')打包的丢包位，
+    1表示丢包。plc/plc/plc_harness.py --trace 可以直接读取。
+    """
+    lost = np.concatenate(chunks) if chunks else np.zeros(0, dtype=bool)
+    bits = np.packbits(lost, bitorder='little')
+    record = np.zeros((), dtype=[('slots', '<u8'), ('bits', 'u1', (len(bits),))])
+    record['slots'] = len(lost)
+    record['bits'] = bits
+    np.save(path, record)
+    return lost
+
+def append_stats_frames(frames):
+    global sf_stats_array
+    sf_stats_array += frames
+    if stats_frame_sink is not None:
+        for frame in frames:
+            stats_frame_sink(frame)
 
 class error_rate_cls:
+    __slots__ = ('rssi', 'arith_rssi', 'error_rate', 'ok_cnt', 'scan', 'cnt', 'arith_scan',
+                 'arith_sinr', 'sinr_db', 'rx_audio_crc_err', 'rx_total', 'crc_error')
+
     def __init__(self, rssi, error_rate, ok_cnt, cnt, arith_rssi, scan, arith_scan, arith_sinr, sinr_db, rx_audio_crc_err, rx_total, crc_error):
         self.rssi = rssi
         self.arith_rssi = arith_rssi
@@ -51,6 +101,9 @@ class error_rate_cls:
         return self.rssi < other.rssi
 
 class ble_error_rate_cls:
+    __slots__ = ('rssi', 'arith_rssi', 'error_rate', 'ok_cnt', 'scan', 'cnt', 'arith_scan',
+                 'arith_sinr', 'sinr_db', 'ble_rx_err', 'rx_total', 'crc_error')
+
     def __init__(self, rssi, error_rate, ok_cnt, cnt, arith_rssi, scan, arith_scan, arith_sinr, sinr_db, ble_rx_err, rx_total,crc_error ):
         self.rssi = rssi
         self.arith_rssi = arith_rssi
@@ -136,6 +189,16 @@ def parse_afh_log_line(log_line):
         print("未找到匹配的0000-0020数据模式")
         return []
 
+# 预计算查找表：字节 -> 8个信道位（低位在前）
+AFH_BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder='little')
+# 预计算查找表：字节 -> 4个2bit信道质量码（低位在前）
+CH_QUALITY_CODES = (np.arange(256, dtype=np.uint8)[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8)) & 0b11
+# BLE数据信道索引 -> RF信道号（跳过广播信道1和12）
+BLE_INDEX_TO_RF_CHANNEL = np.array(
+    [index + 1 if index < 11 else index + 2 if index < 37 else index for index in range(40)],
+    dtype=np.intp
+)
+
 def parse_afh_map(bytes_array: list) -> list:
     """
     解析蓝牙AFH map字节数组，返回可用信道列表
@@ -146,18 +209,8 @@ def parse_afh_map(bytes_array: list) -> list:
     返回:
     list: 可用信道号码列表（从0开始）
     """
-    # 初始化AFH映射数组
-    afh_map = []
-    
-    # 遍历每个字节，转换为8位二进制数组（低位在前）
-    for byte in bytes_array:
-        for i in range(8):  # 从低位到高位处理每个位
-            afh_map.append((byte >> i) & 1)  # 提取第i位的值
-    
-    # 提取所有可用信道的号码（值为1的索引）
-    used_channels = [i for i, bit in enumerate(afh_map) if bit == 1]
-    
-    return used_channels
+    afh_map = AFH_BYTE_BITS[np.frombuffer(bytes(bytes_array), dtype=np.uint8)].ravel()
+    return np.flatnonzero(afh_map).tolist()
 
 def print_afh_channels(used_channels: list, group_size: int = 40) -> None:
     """
@@ -186,42 +239,23 @@ def parse_channel_quality(byte_array):
     - 01 (1) = good
     - 11 (3) = bad
     """
-    result = []
-    for byte in byte_array:
-        # Extract 4 channels from the byte (2 bits each), LSB-first
-        for i in range(4):
-            # Shift to isolate each 2-bit channel (LSB to MSB)
-            channel_bits = (byte >> (i * 2)) & 0b11
-            result.append(channel_bits)
-    
-    groups = {
-    "good": [],    # 1 对应 "good"
-    "bad": [],     # 3 对应 "bad"
-    "unknown": []  # 0 对应 "unknown"
-    }
-    
-    # 遍历数组，按状态分组并记录索引（注意：索引从 0 开始）
-    for index, quality in enumerate(result):
-        if quality == 1:
-            groups["good"].append(2*index)
-            groups["good"].append(2*index+1)
-        elif quality == 3:
-            groups["bad"].append(2*index)
-            groups["bad"].append(2*index+1)
-        elif quality == 0:
-            groups["unknown"].append(2*index)
-            groups["unknown"].append(2*index+1)
+    result = CH_QUALITY_CODES[np.frombuffer(bytes(byte_array), dtype=np.uint8)].ravel()
+    
+    def channel_indexes(quality):
+        # 每个质量码对应相邻的两个信道：2*index 和 2*index+1
+        index = np.flatnonzero(result == quality)
+        return np.stack((2 * index, 2 * index + 1), axis=1).ravel().tolist()
             
-    return groups["good"], groups["bad"], groups ["unknown"]
+    return channel_indexes(1), channel_indexes(3), channel_indexes(0)
        
+# 匹配地址模式：xxxx-yyyy:
+addr_pattern = re.compile(r'[0-9a-fA-F]{4}-[0-9a-fA-F]{4}:', re.IGNORECASE)
+# 匹配十六进制字节
+byte_pattern = re.compile(r'[0-9a-fA-F]{2}', re.IGNORECASE)
+
+time_pattern = re.compile(r'[0-9]{2}\:[0-9]{2}:[0-9]{2}\:[0-9]{3}', re.IGNORECASE)
+
 def parse_file(input_txt, output_csv):
-    # 匹配地址模式：xxxx-yyyy:
-    addr_pattern = re.compile(r'[0-9a-fA-F]{4}-[0-9a-fA-F]{4}:', re.IGNORECASE)
-    # 匹配十六进制字节
-    byte_pattern = re.compile(r'[0-9a-fA-F]{2}', re.IGNORECASE)
-    
-    time_pattern = re.compile(r'[0-9]{2}\:[0-9]{2}:[0-9]{2}\:[0-9]{3}', re.IGNORECASE)
-    
     global group_counter, afh_group, afh_group_count
     # 状态管理
     active_block = False    # 是否在数据块中
@@ -285,55 +319,16 @@ def parse_file(input_txt, output_csv):
                 if (active_block):
                     process_block(collected_bytes, total_groups, writer, timestr_in_line, tag)
                 # 结束前一个块（如果未完成）
-                unknown=0
-                if "D/HEX rx total:" in line:
-                    print("Mark Line ", line_number, ", Index ", index)
-                    index+=1
-                    tag=1
-                    afh_group_count=0;
-                    afh_group = afh_group + 1
-                elif "D/HEX ch_hist:" in line:
-                    print("Read channel history at line", line_number)
-                    tag=2
-                elif "D/HEX si_ch_ass:" in line:
-                    tag=3
-                elif "D/HEX all_scan:" in line:
-                    tag=4
-                elif "D/HEX ch_scan:" in line:
-                    tag=5
-                elif "D/HEX ch_assess:" in line:
-                    tag=6                    
-                elif "D/HEX afh_ch_map:" in line:
-                    tag=7
-                elif "D/HEX ch_sinr:" in line:
-                    tag=8
-                elif "D/HEX scan_rssi:" in line:
-                    tag=9
-                elif "D/HEX ch_rssi:" in line:
-                    tag=10                    
-                elif "D/HEX wifi_est:" in line:
-                    tag=11          
-                elif "D/HEX temp_ch:" in line:
-                    tag=12         
-                elif "D/HEX temp_ch2:" in line:
-                    tag=13     
-                elif "D/HEX all_rssi:" in line:
-                    tag=14                         
-                elif "D/HEX all_rssi2:" in line:
-                    tag=15                         
-                elif "D/HEX ble_rxall:" in line:
-                    tag=16     
-                    index+=1
-                    afh_group_count=0;
-                    afh_group = afh_group + 1                    
-                elif "D/HEX ble_ch_map:" in line:
-                    tag=17
-                elif "D/HEX all_rssi6:" in line:
-                    tag=18  
+                block_type = classify_block(line)
+                if block_type is None:
+                    tag = UNKNOWN_BLOCK_TAG
                 else:
-                    tag=19
-                    unknown=1
-                if (unknown==0):
+                    tag = block_type.tag
+                    if block_type.starts_afh_group:
+                        print("Mark Line ", line_number, ", Index ", index)
+                        index+=1
+                        afh_group_count=0;
+                        afh_group = afh_group + 1
                     print("Processing block ", line_number, tag)
                 
                 # 开始新数据块
@@ -396,7 +391,8 @@ def parse_file2(input_txt, output_csv):
         for line_number, line in enumerate(infile, start = 1):
             words=line.split(re.split(r'[,\s]+', line))
             
-@dataclass
+# 每个rx记录都会生成一个实例，使用slots避免每实例__dict__的内存和GC开销
+@dataclass(slots=True)
 class channel_assess:
     channel: int
     afh_group: int
@@ -410,7 +406,7 @@ class channel_assess:
     crc_err: int
     other_err: int
     
-@dataclass
+@dataclass(slots=True)
 class ble_channel_assess:
     channel: int
     afh_group: int
@@ -1187,19 +1183,17 @@ class ChannelStatsArray:
         print(json.dumps(output, indent=2))
 
         
-def process_ble_rx_total(data_bytes, writer, timestr_in_line):
+def decode_ble_rx_total(data_bytes, timestr_in_line):
+    """将ble_rxall数据块解码为ble_channel_assess记录列表"""
     channels=[]
-    global group_counter, afh_group, afh_group_count
-    global last_array, hist_array, last_removed
+    global afh_group, afh_group_count
     
-        # 每6字节一组写入CSV
+    # 每6字节一组
     for i in range(0, len(data_bytes), 6):
         if i + 6 > len(data_bytes):
             break
             
-        index_range = math.floor(group_counter/10000)
         channel = int(data_bytes[i+2], 16) & 0x7F;
-        freq = 2402 + channel*2
         is_audio = (int(data_bytes[i+2], 16)>>7) & 0x1;
         rssi = int(data_bytes[i], 16) - 255
         rx_state = int(data_bytes[i+1], 16);
@@ -1231,25 +1225,6 @@ def process_ble_rx_total(data_bytes, writer, timestr_in_line):
         else:
             rx_ok = 1
         afh_group_count=afh_group_count+1
-        writer.writerow([
-            group_counter,
-            afh_group,    
-            index_range,
-            timestr_in_line,
-            channel,
-            freq,
-            rssi,
-            is_audio,
-            rx_ok,
-            sync_err,
-            rx_time_err,
-            len_err,
-            crc_err,
-            mic_err,
-            llid_err,
-            sn_err,
-            nesn_err,
-        ])
         channels.append(ble_channel_assess(
             channel,
             afh_group,
@@ -1266,7 +1241,38 @@ def process_ble_rx_total(data_bytes, writer, timestr_in_line):
             sn_err,
             nesn_err,             
         ))
+    return channels
+
+def write_ble_rx_total_rows(writer, channels):
+    """将ble_rxall记录逐行写入CSV"""
+    global group_counter
+    for item in channels:
+        writer.writerow([
+            group_counter,
+            item.afh_group,
+            math.floor(group_counter/10000),
+            item.timestr_in_line,
+            item.channel,
+            2402 + item.channel*2,
+            item.rssi,
+            item.is_audio,
+            item.rx_ok,
+            item.sync_err,
+            item.rx_time_err,
+            item.len_err,
+            item.crc_err,
+            item.mic_err,
+            item.llid_err,
+            item.sn_err,
+            item.nesn_err,
+        ])
         group_counter += 1
+
+def process_ble_rx_total(data_bytes, writer, timestr_in_line):
+    global last_array, hist_array, last_removed
+    channels = decode_ble_rx_total(data_bytes, timestr_in_line)
+    write_ble_rx_total_rows(writer, channels)
+    record_audio_slots(channels)
     
     stats_array = ChannelStatsArray(max_channel=39)    
     for i in channels:
@@ -1283,8 +1289,7 @@ def process_ble_rx_total(data_bytes, writer, timestr_in_line):
     print("Evaluate Current block as Below--------------------")
     stats_array.print_stats(detailed=True)
     
-    global sf_stats_array
-    sf_stats_array+=stats_array.get_success_rate_rssi();
+    append_stats_frames(stats_array.get_success_rate_rssi())
 
     print("Removed ", end="")
     print(removed_array)    
@@ -1310,19 +1315,17 @@ def process_ble_rx_total(data_bytes, writer, timestr_in_line):
     last_array=stats_array    
     last_removed=removed_array
         
-def process_rx_total(data_bytes, writer, timestr_in_line):
+def decode_rx_total(data_bytes, timestr_in_line):
+    """将rx total数据块解码为channel_assess记录列表"""
     channels=[]
-    global group_counter, afh_group, afh_group_count
-    global last_array, hist_array, last_removed
+    global afh_group, afh_group_count
     
-        # 每4字节一组写入CSV
+    # 每4字节一组
     for i in range(0, len(data_bytes), 4):
         if i + 4 > len(data_bytes):
             break
             
-        index_range = math.floor(group_counter/10000)
         channel = int(data_bytes[i+2], 16) & 0x7F;
-        freq = 2402 + channel
         is_audio = (int(data_bytes[i+2], 16)>>7) & 0x1;
         rssi = int(data_bytes[i], 16) - 255
         rx_state = int(data_bytes[i+1], 16);
@@ -1347,22 +1350,6 @@ def process_rx_total(data_bytes, writer, timestr_in_line):
         else:
             rx_ok = 1
         afh_group_count=afh_group_count+1
-        writer.writerow([
-            group_counter,
-            afh_group,    
-            index_range,
-            timestr_in_line,
-            channel,
-            freq,
-            rssi,
-            is_audio,
-            rx_ok,
-            sync_err,
-            hec_err,
-            guard_err,
-            crc_err,
-            other_err,
-        ])
         channels.append(channel_assess(
             channel,
             afh_group,
@@ -1376,7 +1363,35 @@ def process_rx_total(data_bytes, writer, timestr_in_line):
             crc_err,
             other_err,               
         ))
+    return channels
+
+def write_rx_total_rows(writer, channels):
+    """将rx total记录逐行写入CSV"""
+    global group_counter
+    for item in channels:
+        writer.writerow([
+            group_counter,
+            item.afh_group,
+            math.floor(group_counter/10000),
+            item.timestr_in_line,
+            item.channel,
+            2402 + item.channel,
+            item.rssi,
+            item.is_audio,
+            item.rx_ok,
+            item.sync_err,
+            item.hec_err,
+            item.guard_err,
+            item.crc_err,
+            item.other_err,
+        ])
         group_counter += 1
+
+def process_rx_total(data_bytes, writer, timestr_in_line):
+    global last_array, hist_array, last_removed
+    channels = decode_rx_total(data_bytes, timestr_in_line)
+    write_rx_total_rows(writer, channels)
+    record_audio_slots(channels)
     
     stats_array = ChannelStatsArray(max_channel=MAX_CHANNELS)    
     for i in channels:
@@ -1393,8 +1408,7 @@ def process_rx_total(data_bytes, writer, timestr_in_line):
     print("Evaluate Current block as Below--------------------")
     stats_array.print_stats(detailed=True)
     
-    global sf_stats_array
-    sf_stats_array+=stats_array.get_success_rate_rssi();
+    append_stats_frames(stats_array.get_success_rate_rssi())
 
     print("Removed ", end="")
     print(removed_array)    
@@ -1420,7 +1434,7 @@ def process_rx_total(data_bytes, writer, timestr_in_line):
     last_array=stats_array    
     last_removed=removed_array
 
-@dataclass
+@dataclass(slots=True)
 class channel_hist:
     channel: int
     score: int
@@ -1435,13 +1449,9 @@ def hex_to_signed_int(hex_str):
     
 def process_ch_hist(data_bytes):
     global channel_score_hist
-    channel_score_hist=[]
-    chan=0
-    for i in range(0, len(data_bytes), 8):
-        if i + 8 > len(data_bytes):
-            break
-        chan=chan+1
-        channel_score_hist +=  [channel_hist(chan, hex_to_signed_int(data_bytes[i+4]), hex_to_signed_int(data_bytes[i+5]))]    
+    records = BLOCK_TYPES_BY_TAG[2].decode(data_bytes)
+    channel_score_hist = [channel_hist(chan, score, ttl) for chan, (score, ttl)
+                          in enumerate(zip(records['score'].tolist(), records['ttl'].tolist()), start=1)]
 
 def hex_to_signed_integers(hex_input):
     """
@@ -1478,56 +1488,34 @@ def hex_to_signed_integers(hex_input):
     except ValueError as e:
         raise ValueError(f"Invalid hex format: {e}")
         
-def process_ch_scan(data_bytes, type=1, tag=4):
+# dBm(int8) -> mW 查找表，按字节的无符号值索引
+DBM_TO_MW = np.array([10 ** ((u - 256 if u > 127 else u) / 10) for u in range(256)])
+# 扫描RSSI块布局：tag -> (扫描重复次数, 合并方式)，每次扫描40个信道
+SCAN_RSSI_LAYOUTS = {
+    4: (4, 'mean'),      # all_scan
+    14: (8, 'max'),      # all_rssi
+    15: (2, 'max'),      # all_rssi2
+    18: (6, 'max'),      # all_rssi6
+}
+# 40个扫描信道扩展为80个BR/EDR信道，信道1和25沿用相邻信道的值
+SCAN_EXPAND_INDEX = np.repeat(np.arange(40), 2)
+SCAN_EXPAND_INDEX[1] = SCAN_EXPAND_INDEX[2]
+SCAN_EXPAND_INDEX[25] = SCAN_EXPAND_INDEX[26]
+
+def process_ch_scan(data_bytes, tag=4):
     global sf_scaned_chn, sf_scaned_chns
     print("SF scanned chn:", tag)
-    data_bytes=hex_to_signed_integers(data_bytes)
-    scaned_chn = []
-    for i in range(40):
-        if (tag==15):
-            val1 = data_bytes[i]
-            val2 = data_bytes[i + 40]
-            val=max(val1,val2)
-        else:
-            # Get the three elements from a
-            val1 = data_bytes[i]
-            val2 = data_bytes[i + 40]
-            val3 = data_bytes[i + 80]
-            val4 = data_bytes[i + 120]
-            if (tag==18):
-                val5=data_bytes[i + 160]
-                val6=data_bytes[i + 200]
-            if (tag==14):
-                val5=data_bytes[i + 160]
-                val6=data_bytes[i + 200]
-                val7=data_bytes[i + 240]
-                val8=data_bytes[i + 280]
-            if (type==1):
-                total_mw = (10 ** (val1 / 10)) 
-                total_mw += (10 ** (val2 / 10)) 
-                total_mw += (10 ** (val3 / 10)) 
-                total_mw += (10 ** (val4 / 10)) 
-                if (tag==4):
-                    total_mw /= 4
-                else:
-                    total_mw += (10 ** (val5 / 10)) 
-                    total_mw += (10 ** (val6 / 10)) 
-                    if (tag==14):
-                        total_mw += (10 ** (val7 / 10)) 
-                        total_mw += (10 ** (val8 / 10)) 
-                val=10 * math.log10(total_mw)
-            else:
-                val=max(val1,val2,val3,val4)    
-                if (tag==14):
-                    val=max(val,val5,val6,val7,val8) 
-                if (tag==18):
-                    val=max(val,val5,val6)     
-        scaned_chn.append(val)    
-    sf_scaned_chn = [int(x) for x in scaned_chn]
+    reps, combine = SCAN_RSSI_LAYOUTS[tag]
+    scans = BLOCK_TYPES_BY_TAG[tag].decode(data_bytes[:reps * 40]).reshape(reps, 40)
+    if combine == 'mean':
+        # 线性功率平均后再转换回dBm
+        total_mw = DBM_TO_MW[scans.view(np.uint8)].mean(axis=0)
+        scaned_chn = np.trunc(10 * np.log10(total_mw)).astype(np.int64)
+    else:
+        scaned_chn = scans.max(axis=0).astype(np.int64)
     if (MAX_CHANNELS>40):
-        sf_scaned_chn = [elem for elem in sf_scaned_chn for _ in range(2)]
-        sf_scaned_chn[1]=sf_scaned_chn[2]
-        sf_scaned_chn[25]=sf_scaned_chn[26]    
+        scaned_chn = scaned_chn[SCAN_EXPAND_INDEX]
+    sf_scaned_chn = scaned_chn.tolist()
     sf_scaned_chns += [sf_scaned_chn]
     
 def hex_to_bytes(hex_input):
@@ -1573,151 +1561,154 @@ def process_afh(data_bytes):
 
 def process_afh_map(data_bytes):
     global afh_ch_map
-    afh_ch_map = [0] * (MAX_CHANNELS+1)        
-    for i in range(10):
-        temp=data_bytes[i+4]
-        temp=int(temp, 16)
-        for j in range(8):
-            if not ((temp & (1<<j)) == 0):
-                afh_ch_map[i*8+j]=1;        
+    bits = AFH_BYTE_BITS[np.frombuffer(hex_to_bytes(data_bytes[4:14]), dtype=np.uint8)].ravel()
+    ch_map = np.zeros(MAX_CHANNELS+1, dtype=np.uint8)
+    count = min(len(bits), len(ch_map))
+    ch_map[:count] = bits[:count]
+    afh_ch_map = ch_map.tolist()
 
 def process_ble_ch_map(data_bytes):
     global afh_ch_map
-    afh_ch_map = [0] * (MAX_CHANNELS+1)        
-    for i in range(5):
-        temp=data_bytes[i]
-        temp=int(temp, 16)
-        for j in range(8):
-            if not ((temp & (1<<j)) == 0):
-                index=i*8+j
-                if (index<11):
-                    index=index+1
-                elif (index<37):
-                    index=index+2                    
-                afh_ch_map[index]=1;        
+    bits = AFH_BYTE_BITS[np.frombuffer(hex_to_bytes(data_bytes[0:5]), dtype=np.uint8)].ravel()
+    ch_map = np.zeros(MAX_CHANNELS+1, dtype=np.uint8)
+    ch_map[BLE_INDEX_TO_RF_CHANNEL[np.flatnonzero(bits)]] = 1
+    afh_ch_map = ch_map.tolist()
 
                 
+@dataclass(frozen=True)
+class BlockType:
+    """D/HEX数据块类型描述：名称、长度布局、numpy数据布局和处理函数"""
+    tag: int
+    name: str                           # 日志中 "D/HEX <name>:" 的名称
+    size: int                           # 固定长度块的总字节数，或长度前缀块的每组字节数
+    dtype: np.dtype = np.dtype(np.uint8)
+    length_prefixed: bool = False       # 前2个字节为小端组数
+    handler: Optional[Callable] = None  # handler(data_bytes, writer, timestr_in_line, tag)
+    starts_afh_group: bool = False      # 该块开始一个新的AFH统计组
+
+    def expected_bytes(self, total_groups: int) -> int:
+        """计算数据块的预期字节数"""
+        if self.length_prefixed:
+            return 2 + total_groups * self.size
+        return self.size
+
+    def payload(self, bytes_list: list, total_groups: int) -> list:
+        """返回交给handler的十六进制字节列表（长度前缀块跳过前2个组数字节）"""
+        if self.length_prefixed:
+            return bytes_list[2:self.expected_bytes(total_groups)]
+        return bytes_list
+
+    def decode(self, data_bytes: list) -> np.ndarray:
+        """按dtype布局将十六进制字节列表解码为numpy数组，不完整的尾部记录被丢弃"""
+        raw = hex_to_bytes(data_bytes)
+        return np.frombuffer(raw, dtype=self.dtype, count=len(raw) // self.dtype.itemsize)
+
+# 未注册的D/HEX块使用该tag，只收集数据不处理
+UNKNOWN_BLOCK_TAG = 19
+BLOCK_TYPES_BY_TAG = {}
+BLOCK_TYPES_BY_NAME = {}
+block_name_pattern = re.compile(r'D/HEX ([^:]+):')
+
+def register_block_type(block_type: BlockType) -> BlockType:
+    """注册一个D/HEX数据块类型，parse_file和process_block都从注册表分发"""
+    if block_type.tag in BLOCK_TYPES_BY_TAG or block_type.tag == UNKNOWN_BLOCK_TAG:
+        raise ValueError(f"Block tag {block_type.tag} already registered")
+    if block_type.name in BLOCK_TYPES_BY_NAME:
+        raise ValueError(f"Block name '{block_type.name}' already registered")
+    BLOCK_TYPES_BY_TAG[block_type.tag] = block_type
+    BLOCK_TYPES_BY_NAME[block_type.name] = block_type
+    return block_type
+
+def classify_block(line: str) -> Optional[BlockType]:
+    """根据 "D/HEX <name>:" 行查找数据块类型，未注册时返回None"""
+    match = block_name_pattern.search(line)
+    if not match:
+        return None
+    return BLOCK_TYPES_BY_NAME.get(match.group(1))
+
+RX_TOTAL_DTYPE = np.dtype([('rssi', 'u1'), ('rx_state', 'u1'), ('channel', 'u1'), ('reserved', 'u1')])
+BLE_RXALL_DTYPE = np.dtype([('rssi', 'u1'), ('rx_state', 'u1'), ('channel', 'u1'), ('reserved', 'u1', (3,))])
+CH_HIST_DTYPE = np.dtype([('reserved', 'u1', (4,)), ('score', 'i1'), ('ttl', 'i1'), ('reserved2', 'u1', (2,))])
+
+for _block_type in [
+    BlockType(1, 'rx total', 4, RX_TOTAL_DTYPE, length_prefixed=True, starts_afh_group=True,
+              handler=lambda data, writer, timestr, tag: process_rx_total(data, writer, timestr)),
+    BlockType(2, 'ch_hist', 79 * 8, CH_HIST_DTYPE,
+              handler=lambda data, writer, timestr, tag: process_ch_hist(data)),
+    BlockType(3, 'si_ch_ass', 480),
+    BlockType(4, 'all_scan', 40 * 4 + 1, np.dtype(np.int8),
+              handler=lambda data, writer, timestr, tag: process_ch_scan(data, tag=tag)),
+    BlockType(5, 'ch_scan', 10,
+              handler=lambda data, writer, timestr, tag: process_afh(data)),
+    BlockType(6, 'ch_assess', 560),
+    BlockType(7, 'afh_ch_map', 28,
+              handler=lambda data, writer, timestr, tag: process_afh_map(data)),
+    BlockType(8, 'ch_sinr', 242),
+    BlockType(9, 'scan_rssi', 80, np.dtype(np.int8)),
+    BlockType(10, 'ch_rssi', 79, np.dtype(np.int8)),
+    BlockType(11, 'wifi_est', 10),
+    BlockType(12, 'temp_ch', 10),
+    BlockType(13, 'temp_ch2', 10),
+    BlockType(14, 'all_rssi', 40 * 8 + 1, np.dtype(np.int8),
+              handler=lambda data, writer, timestr, tag: process_ch_scan(data, tag=tag)),
+    BlockType(15, 'all_rssi2', 81, np.dtype(np.int8),
+              handler=lambda data, writer, timestr, tag: process_ch_scan(data, tag=tag)),
+    BlockType(16, 'ble_rxall', 6, BLE_RXALL_DTYPE, length_prefixed=True, starts_afh_group=True,
+              handler=lambda data, writer, timestr, tag: process_ble_rx_total(data, writer, timestr)),
+    BlockType(17, 'ble_ch_map', 5,
+              handler=lambda data, writer, timestr, tag: process_ble_ch_map(data)),
+    BlockType(18, 'all_rssi6', 40 * 6 + 1, np.dtype(np.int8),
+              handler=lambda data, writer, timestr, tag: process_ch_scan(data, tag=tag)),
+]:
+    register_block_type(_block_type)
+
 def process_block(bytes_list, total_groups, writer, timestr_in_line, tag=1):
     """处理一个完整数据块并写入CSV"""
-    unknown=0
-    # 计算预期总字节数 = 2(组数字节) + total_groups * 4
-    if (tag==1):      # 1== 'rx total:' 
-        expected_bytes = 2 + total_groups * 4
-        # 跳过前2个组数字节，从第3个字节开始
-        data_bytes = bytes_list[2:expected_bytes]
-    elif (tag==2):              # ch_hist
-        expected_bytes = 79 * 8
-        data_bytes = bytes_list
-    elif (tag==3):              # si_ch_ass
-        expected_bytes = 480
-        data_bytes = bytes_list            
-    elif (tag==4):              # all_scan
-        expected_bytes = 40 * 4 + 1
-        data_bytes = bytes_list
-    elif (tag==5):              # ch_scan
-        expected_bytes = 10
-        data_bytes = bytes_list        
-    elif (tag==6):              # ch_assess
-        expected_bytes = 560
-        data_bytes = bytes_list
-    elif (tag==7):              # afh_ch_map
-        expected_bytes = 28     
-        data_bytes = bytes_list   
-    elif (tag==8):              # ch_sinr
-        expected_bytes = 242
-        data_bytes = bytes_list    
-    elif (tag==9):              # scan_rssi
-        expected_bytes = 80
-        data_bytes = bytes_list         
-    elif (tag==10):             # ch_rssi
-        expected_bytes = 79
-        data_bytes = bytes_list
-    elif (tag==11):             # wifi_est
-        expected_bytes = 10
-        data_bytes = bytes_list
-    elif (tag==12):             # temp_ch
-        expected_bytes = 10
-        data_bytes = bytes_list
-    elif (tag==13):             # temp_ch2
-        expected_bytes = 10
-        data_bytes = bytes_list        
-    elif (tag==14):             # all_rssi
-        expected_bytes = 40 * 8 + 1
-        data_bytes = bytes_list   
-    elif (tag==18):             # all_rssi6
-        expected_bytes = 40 * 6 + 1
-        data_bytes = bytes_list   
-    elif (tag==15):             # all_rssi2
-        expected_bytes = 81
-        data_bytes = bytes_list  
-    elif (tag==16):             # ble_rxall
-        expected_bytes = 2 + total_groups * 6
-        # 跳过前2个组数字节，从第3个字节开始
-        data_bytes = bytes_list[2:expected_bytes]
-    elif (tag==17):             # ble_ch_map    
-        expected_bytes = 5
-        data_bytes = bytes_list
-    else:
-        unknown=1
-        expected_bytes = 10000
-        
-    if len(bytes_list) < expected_bytes and unknown==0 :
+    block_type = BLOCK_TYPES_BY_TAG.get(tag)
+    if block_type is None:
+        return
+    
+    expected_bytes = block_type.expected_bytes(total_groups)
+    if len(bytes_list) < expected_bytes:
         print("Not enought data,", len(bytes_list), "<", expected_bytes)
-        expected_bytes=len(bytes_list)
-        #return  # 数据不完整    
-        
-    if (tag==1):
-        process_rx_total(data_bytes,writer, timestr_in_line)
-    elif (tag==2):
-        process_ch_hist(data_bytes)
-    elif (tag==4) or (tag==15):
-        process_ch_scan(data_bytes,type=1,tag=tag)
-    elif (tag==14)or (tag==18):
-        process_ch_scan(data_bytes,type=2,tag=tag)
-    elif (tag==5):
-        process_afh(data_bytes)
-    elif (tag==7):
-        process_afh_map(data_bytes)
-    elif (tag==16):
-        process_ble_rx_total(data_bytes,writer, timestr_in_line)
-    elif (tag==17):
-        process_ble_ch_map(data_bytes)
+        
+    if block_type.handler is not None:
+        block_type.handler(block_type.payload(bytes_list, total_groups), writer, timestr_in_line, tag)
     
                 
 last_removed = []
 error_rate_stat = []
 
-import matplotlib.pyplot as plt
-import numpy as np
-from matplotlib.animation import FuncAnimation
-import struct
-
-from typing import List, Union
-import struct
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-from matplotlib.ticker import MultipleLocator
-
 def visualize_rssi_list(
-    byte_arrays: List[Union[bytes, bytearray]], 
+    byte_arrays: List[Union[bytes, bytearray, List[int]]], 
     num_channels: int = 80, 
     int_format: str = 'b',
     db_min: int = -100,    # Typical minimum RSSI value
     db_max: int = -30,     # Typical maximum RSSI value
-    db_step: int = 5       # Major tick interval in dB
+    db_step: int = 5,      # Major tick interval in dB
+    mode: str = 'bars',    # 'bars' animates one sample at a time, 'heatmap' draws channel x time at once
+    interval: int = 1000
 ):
     """
     Visualize RSSI data from a list of byte arrays with accurate dB axis.
     
     Parameters:
-    - byte_arrays: List of bytes/bytearray objects, each containing RSSI values
+    - byte_arrays: List of bytes/bytearray objects (or lists of ints such as sf_scaned_chns), each containing RSSI values
     - num_channels: Number of channels per array (default: 80)
     - int_format: Struct format for integers (default: 'b' for 8-bit signed int)
     - db_min: Minimum value for dB axis (default: -100)
     - db_max: Maximum value for dB axis (default: -30)
     - db_step: Interval between major ticks on dB axis (default: 5)
+    - mode: 'bars' for the animated bar view, 'heatmap' for an imshow of the whole history (default: 'bars')
+    - interval: Animation interval in ms for the bar view (default: 1000)
     """
+    # 绘图依赖只在真正可视化时导入，纯解析不承担matplotlib的启动开销
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import to_rgba
+    from matplotlib.ticker import MultipleLocator
+    from matplotlib.transforms import Bbox
+    from rssi_success_rate import BarCollection, BlitManager
+
     # Validate input list
     if not isinstance(byte_arrays, list):
         print("Error: Input must be a list of byte arrays")
@@ -1728,13 +1719,15 @@ def visualize_rssi_list(
         return
     
     # Calculate required byte length
-    bytes_per_value = struct.calcsize(int_format)
-    required_length = num_channels * bytes_per_value
-    print(f"Expecting {required_length} bytes per array ({num_channels} channels × {bytes_per_value} bytes each)")
+    dtype = np.dtype(int_format)
+    required_length = num_channels * dtype.itemsize
+    print(f"Expecting {required_length} bytes per array ({num_channels} channels × {dtype.itemsize} bytes each)")
     
-    # Process each byte array with strict validation
-    rssi_data = []
+    # Only validate type and length per element, the values are decoded in one frombuffer below
+    valid_arrays = []
     for i, arr in enumerate(byte_arrays):
+        if isinstance(arr, (list, tuple)) and len(arr) == num_channels:
+            arr = np.asarray(arr, dtype=dtype).tobytes()
         # Check if element is a bytes-like object
         if not isinstance(arr, (bytes, bytearray)):
             print(f"Error: Element {i+1} is not a byte array. Found type: {type(arr).__name__}. Skipping.")
@@ -1745,24 +1738,41 @@ def visualize_rssi_list(
             print(f"Warning: Byte array {i+1} has incorrect length. "
                   f"Expected {required_length} bytes, got {len(arr)}. Skipping.")
             continue
-            
-        # Unpack byte array into integers
-        try:
-            values = struct.unpack(f'{num_channels}{int_format}', arr)
-            # Clamp values to our dB range for better visualization
-            clamped_values = [max(db_min, min(v, db_max)) for v in values]
-            rssi_data.append(clamped_values)
-        except Exception as e:
-            print(f"Error unpacking byte array {i+1}: {str(e)}. Skipping.")
-            continue
+        valid_arrays.append(arr)
     
-    if not rssi_data:
+    if not valid_arrays:
         print("Error: No valid RSSI data to visualize after validation")
         return
     
-    print(f"Successfully loaded {len(rssi_data)} valid data samples")
-    rssi_data_np = np.array(rssi_data)
+    print(f"Successfully loaded {len(valid_arrays)} valid data samples")
+    # Clamp values to our dB range for better visualization
+    rssi_data_np = np.clip(
+        np.frombuffer(b''.join(valid_arrays), dtype=dtype).reshape(len(valid_arrays), num_channels),
+        db_min, db_max
+    )
     total_samples = len(rssi_data_np)
+    channels = np.arange(1, num_channels + 1)
+
+    if mode == 'heatmap':
+        # 整个扫描历史一次imshow画出，横轴为样本，纵轴为通道
+        fig, ax = plt.subplots(figsize=(16, 10))
+        fig.canvas.manager.set_window_title('RSSI Channel Heatmap')
+        image = ax.imshow(
+            rssi_data_np.T, aspect='auto', origin='lower', interpolation='nearest',
+            cmap='viridis', vmin=db_min, vmax=db_max,
+            extent=(0.5, total_samples + 0.5, 0.5, num_channels + 0.5)
+        )
+        colorbar = fig.colorbar(image, ax=ax)
+        colorbar.set_label('RSSI (dBm)', fontsize=12, fontweight='bold')
+        colorbar.locator = MultipleLocator(db_step)
+        colorbar.update_ticks()
+        ax.set_xlabel('Sample', fontsize=12, fontweight='bold')
+        ax.set_ylabel('Channel Number', fontsize=12, fontweight='bold')
+        ax.set_yticks(channels[::5])
+        ax.set_title(f'RSSI Values ({total_samples} samples)', fontsize=18, fontweight='bold',
+                     pad=20, color='darkblue')
+        plt.show()
+        return
 
     # Initialize plot
     fig, ax = plt.subplots(figsize=(16, 10))
@@ -1770,8 +1780,10 @@ def visualize_rssi_list(
     fig.canvas.manager.set_window_title('RSSI Channel Visualizer')
     
     # Create bars
-    channels = np.arange(1, num_channels + 1)
-    bars = ax.bar(channels, np.zeros(num_channels), color='blue', alpha=0.8)
+    rgba_blue = to_rgba('blue', 0.8)
+    rgba_red = to_rgba('red', 0.8)
+    bars = BarCollection(ax, channels, facecolor=rgba_blue)
+    ax.set_xlim(0, num_channels + 1)
     
     # Configure dB axis with precise settings
     ax.set_ylim(db_min, db_max)  # Fixed range based on typical RSSI values
@@ -1796,90 +1808,110 @@ def visualize_rssi_list(
         pad=20,
         color='darkblue'
     )
+    blit_manager = BlitManager(fig.canvas, [bars.collection, title])
+    # Out-of-range flags for all samples at once, the update only indexes rows
+    out_of_range = (rssi_data_np <= db_min) | (rssi_data_np >= db_max)
+    state = {'frame': 0}
     
     # Update function
-    def update(frame):
-        current_values = rssi_data_np[frame]
-        
-        # Update bars with precise height values
-        for bar, value in zip(bars, current_values):
-            bar.set_height(value)
-            # Maintain color coding for out-of-range values
-            if value <= db_min or value >= db_max:
-                bar.set_color('red')
-            else:
-                bar.set_color('blue')
+    def update():
+        frame = state['frame']
+        bars.set_heights(rssi_data_np[frame])
+        # Maintain color coding for out-of-range values
+        bars.set_facecolors(np.where(out_of_range[frame][:, None], rgba_red, rgba_blue))
         
         # Update title
         title.set_text(f'RSSI Values (Sample {frame + 1}/{total_samples})')
+        title_extent = title.get_window_extent()
+        title_row = Bbox([[fig.bbox.x0, title_extent.y0], [fig.bbox.x1, title_extent.y1]])
+        blit_manager.update([ax.bbox, title_row])
         
-        fig.canvas.draw_idle()
-        return bars
-    
-    # Create animation
-    animation = FuncAnimation(
-        fig,
-        update,
-        frames=total_samples,
-        interval=1000,
-        blit=False,
-        repeat=False
-    )
+        state['frame'] += 1
+        if state['frame'] >= total_samples:
+            timer.stop()
+    
+    # 定时器先建好，只有一个样本时第一次update()就会停掉它
+    timer = fig.canvas.new_timer(interval=interval)
+    timer.add_callback(update)
+    update()
+    if state['frame'] < total_samples:
+        timer.start()
     
     plt.show()
 
 
 
-from rssi_success_rate import  RSSISuccessTracker 
-if __name__ == "__main__":
+@dataclass
+class ParseSummary:
+    """
+    单个文件（或多个文件合并后）的汇总结果
 
-    # 创建命令行参数解析器
-    parser = argparse.ArgumentParser(description='文件处理工具')
-    
-    # 添加参数
-    parser.add_argument('--isble', action='store_true', 
-                      default=False,  # 显式设置默认值为False
-                      help='启用BLE文件处理功能（默认不启用）')
-    # 添加参数
-    parser.add_argument('--figure', action='store_true', 
-                      default=False,  # 显式设置默认值为False
-                      help='启用Matlab画图（默认不启用）')
-    # input参数默认为argv[1]，如果未提供则使用位置参数
-    parser.add_argument('input', nargs='?', default=None,
-                      help='输入文件路径（默认为第一个位置参数）')
-    parser.add_argument('--output', type=str, default='result2.csv',
-                      help=f'输出文件路径（默认为result2.csv）')
-    
-    # 解析参数
-    args = parser.parse_args()
-    
-    if (args.isble):
-        MAX_CHANNELS=39
-    else:
-        MAX_CHANNELS=79    
-    print("MAX_CHANNELS:", MAX_CHANNELS)
-    
-    last_array = ChannelStatsArray(max_channel=MAX_CHANNELS)
-    hist_array = ChannelStatsArray(max_channel=MAX_CHANNELS)
+    只保存可以直接拼接/相加的量：每个统计块的错误率记录，以及每信道的计数、
+    SINR的dB和与线性功率和。跨文件合并只做拼接和相加，线性平均值由合并后的和重新计算，不需要重新解析日志。
+    """
+    sources: List[str]
+    max_channels: int
+    error_rates: list              # error_rate_cls / ble_error_rate_cls
+    channel_rx_ok: np.ndarray      # 每信道rx_ok之和
+    channel_total: np.ndarray      # 每信道收包总数
+    channel_sinr_db: np.ndarray    # 每信道 Σ sinr*total
+    channel_sinr_mw: np.ndarray    # 每信道 Σ 10^(sinr/10)*total
 
-    # 确定输入文件路径：如果未通过位置参数提供，则检查argv[1]
-    input_path = args.input if args.input is not None else (sys.argv[1] if len(sys.argv) > 1 else None)    
-    parse_file(input_path, args.output)
-    
-    print(f"处理完成，结果已保存到 {args.output}")
-    error_rate_sorted = sorted(error_rate_stat, key=lambda p: p.rssi)
+    def merge(self, other: 'ParseSummary') -> 'ParseSummary':
+        if other.max_channels != self.max_channels:
+            raise ValueError(f"Cannot merge summaries with different channel counts: "
+                             f"{self.max_channels} vs {other.max_channels}")
+        return ParseSummary(
+            sources=self.sources + other.sources,
+            max_channels=self.max_channels,
+            error_rates=self.error_rates + other.error_rates,
+            channel_rx_ok=self.channel_rx_ok + other.channel_rx_ok,
+            channel_total=self.channel_total + other.channel_total,
+            channel_sinr_db=self.channel_sinr_db + other.channel_sinr_db,
+            channel_sinr_mw=self.channel_sinr_mw + other.channel_sinr_mw,
+        )
+
+def channel_success_sums(stats_frames, max_channels):
+    """从sf_stats_array统计每信道的rx_ok、收包数和SINR的dB/线性功率加权和（只统计实际RSSI在有效范围内的帧）"""
+    n = max_channels + 1
+    sums = [np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64), np.zeros(n), np.zeros(n)]
+    if not stats_frames:
+        return sums
+    frames = np.frombuffer(b''.join(stats_frames), dtype=np.uint8).reshape(len(stats_frames), -1)
+    scan_rssi = frames[:, :max_channels].view(np.int8).astype(np.int64)
+    act_rssi = frames[:, n:n + max_channels].view(np.int8).astype(np.int64)
+    rx_ok = frames[:, 2*n:2*n + max_channels].astype(np.int64)
+    total = rx_ok + frames[:, 3*n:3*n + max_channels]
+    valid = (act_rssi <= MAX_RSSI_THRESHOLD) & (act_rssi >= MIN_RSSI_THRESHOLD)
+    total = np.where(valid, total, 0)
+    sinr = act_rssi - scan_rssi
+    sums[0][:max_channels] = np.where(valid, rx_ok, 0).sum(axis=0)
+    sums[1][:max_channels] = total.sum(axis=0)
+    sums[2][:max_channels] = (sinr * total).sum(axis=0)
+    sums[3][:max_channels] = (10.0 ** (sinr / 10) * total).sum(axis=0)
+    return sums
+
+def summarize_parse(source: str) -> ParseSummary:
+    """把当前解析状态（error_rate_stat、sf_stats_array）整理成可合并的ParseSummary"""
+    rx_ok, total, sinr_db, sinr_mw = channel_success_sums(sf_stats_array, MAX_CHANNELS)
+    return ParseSummary([source], MAX_CHANNELS, list(error_rate_stat), rx_ok, total, sinr_db, sinr_mw)
+
+def print_parse_summary(summary: 'ParseSummary') -> None:
+    """打印RSSI错误率表、信道成功率表和整体平均值，同时记录到summary_tables"""
+    error_rate_sorted = sorted(summary.error_rates, key=lambda p: p.rssi)
     
-    if (MAX_CHANNELS>40):
+    if (summary.max_channels>40):
         # 转换为表格数据
         table_data = [
             [f"{item.rssi:.2f}", f"{item.error_rate:.2%}", f"{item.ok_cnt}", f"{item.cnt}", f"{item.arith_sinr:.2f}"]
                 for item in error_rate_sorted
         ]
 
+        headers = ["RSSI (dBm)", "Error Rate", "rx_ok", "cnt", "Sinr"]
         # 使用 tabulate 打印表格
         print(tabulate(
             table_data,
-            headers=["RSSI (dBm)", "Error Rate", "rx_ok", "cnt", "Sinr"],
+            headers=headers,
             tablefmt="pretty",  # 可选: "plain", "simple", "grid", "fancy_grid", "pipe" 等
             floatfmt=".2f"
         ))
@@ -1890,52 +1922,27 @@ if __name__ == "__main__":
                 for item in error_rate_sorted
         ]
 
+        headers = ["RSSI (dBm)", "cnt", "Sinr"]
         # 使用 tabulate 打印表格
         print(tabulate(
             table_data,
-            headers=["RSSI (dBm)", "cnt", "Sinr"],
+            headers=headers,
             tablefmt="pretty",  # 可选: "plain", "simple", "grid", "fancy_grid", "pipe" 等
             floatfmt=".2f"
         ))
+    with summary_tables_lock:
+        summary_tables["error_rate_by_rssi"] = {"headers": headers, "rows": table_data}
         
 
-    channel_stats_array = ChannelStatsArray(max_channel=MAX_CHANNELS)    
-    for j in range(MAX_CHANNELS):
-        stat=channel_stats_array._array[j];
-        stat["channel"] = j
-        sinr_db=0
-        sinr_mw=0
-        for i in sf_stats_array:
-            scan_rssi=get_signed_byte(i, j)
-            act_rssi=get_signed_byte(i, (MAX_CHANNELS+1)+j)            
-            sinr=(act_rssi-scan_rssi)
-            if (act_rssi<= MAX_RSSI_THRESHOLD and act_rssi >= MIN_RSSI_THRESHOLD):
-                stat["rx_ok"] += i[(MAX_CHANNELS+1)*2+j]
-                total=i[(MAX_CHANNELS+1)*2+j]+i[(MAX_CHANNELS+1)*3+j]
-                stat["total"] += total
-                sinr_db+=sinr*total
-                sinr_mw+=(10 ** (sinr/10))*total
-        if (stat["total"]>0):        
-            stat['sinr'] = sinr_db/stat["total"] 
-            stat['sinr_db'] = 10 * math.log10(sinr_mw/stat["total"])
-        else:
-            stat['sinr']=0
-            stat['sinr_db'] =0
     # 转换为表格数据
     table_data = []
     rx_total_all = 0
     rx_ok_all = 0
-    rx_audio_ok_all = 0
-    for item in channel_stats_array._array:
-        channel=item['channel']
-        rx_ok = item['rx_ok']
+    for channel in range(summary.max_channels + 1):
+        rx_ok = int(summary.channel_rx_ok[channel])
         rx_ok_all += rx_ok
-        total = item['total']    
+        total = int(summary.channel_total[channel])
         rx_total_all += total
-        audio_ok=item['rx_audio_ok'] 
-        rx_audio_ok_all += audio_ok
-        sinr_db_average=item['sinr']
-        sinr_linear_average=item['sinr_db']
         # 处理除零情况
         if total == 0:
             success_rate = "N/A"  # 或者 0.0%
@@ -1943,18 +1950,24 @@ if __name__ == "__main__":
             sinr_linear_average = "N/A"
         else:
             success_rate = f"{rx_ok / total:.2%}"
-            sinr_db_average=f"{sinr_db_average:.2f}"
-            sinr_linear_average=f"{sinr_linear_average:.2f}"
+            sinr_db_average = f"{summary.channel_sinr_db[channel] / total:.2f}"
+            sinr_linear_average = f"{10 * math.log10(summary.channel_sinr_mw[channel] / total):.2f}"
         table_data.append([f"{channel}", f"{rx_ok}",  f"{total}", success_rate,sinr_db_average,sinr_linear_average ])
+    headers = ["Channel","RX OK",  "Total", "Success Rate", "Sinr db", "Sinr linear"]
     # 使用 tabulate 打印表格
     print(tabulate(
         table_data,
-        headers=["Channel","RX OK",  "Total", "Success Rate", "Sinr db", "Sinr linear"],
+        headers=headers,
         tablefmt="pretty",  # 可选: "plain", "simple", "grid", "fancy_grid", "pipe" 等
         floatfmt=".2f"
     ))
+    with summary_tables_lock:
+        summary_tables["channel_success"] = {"headers": headers, "rows": table_data}
     print("------------------------------------------------------------------")
-    print("Average OK rate  %.4f%%" %(rx_ok_all/rx_total_all*100.0))
+    if rx_total_all:
+        print("Average OK rate  %.4f%%" %(rx_ok_all/rx_total_all*100.0))
+    else:
+        print("Average OK rate  N/A")
     
     total_error_rate=0
     total_cnt=0
@@ -1978,10 +1991,17 @@ if __name__ == "__main__":
         total_arith_sinr += i.arith_sinr * i.cnt
         total_cnt+=i.cnt
         total_crc_err += i.crc_error
+    if total_cnt == 0:
+        # 没有任何rx total记录（例如日志里没有统计块）
+        print("------------------------------------------------------------------")
+        print("Average RSSI / scan RSSI / error rate / sinr: N/A (no rx total records)")
+        print("------------------------------------------------------------------")
+        print("Rx audio crc err N/A")
+        return
     combined_avg_mw = total_mw / total_cnt
     combined_avg_dbm = 10 * math.log10(combined_avg_mw)
     combined_scan_mw = total_scan_mw / total_cnt
-    combined_avg_scan_dbm = 10 * math.log10(combined_scan_mw)
+    combined_avg_scan_dbm = 10 * math.log10(combined_scan_mw) if combined_scan_mw > 0 else float('nan')
     print("------------------------------------------------------------------")
     print("Average linear RSSI %.4fdbm" %(combined_avg_dbm))
     print("Mid RSSI %.4fdbm" %(error_rate_sorted[len(error_rate_sorted)>>1].rssi))
@@ -1998,26 +2018,257 @@ if __name__ == "__main__":
         print("Rx audio crc err %d in %d rate:%.2f%%" %(total_crc_err,total_cnt,total_crc_err/total_cnt*100))
     else:
         print("Rx audio crc err N/A")   
+
+def reset_parse_state(isble: bool) -> None:
+    """按BT/BLE设置信道数并重建解析依赖的全局统计数组"""
+    global MAX_CHANNELS, last_array, hist_array
+    MAX_CHANNELS = 39 if isble else 79
+    last_array = ChannelStatsArray(max_channel=MAX_CHANNELS)
+    hist_array = ChannelStatsArray(max_channel=MAX_CHANNELS)
+
+def analyze_file(task) -> ParseSummary:
+    """
+    批处理的工作进程入口：解析一个日志文件，输出单文件CSV、日志和统计表JSON
+
+    解析状态全部在模块全局变量里，因此每个文件都在新进程中处理（max_tasks_per_child=1）。
+    """
+    input_path, output_csv, isble, log_path, tables_path = task
+    reset_parse_state(isble)
+    with open(log_path, 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        parse_file(input_path, output_csv)
+        summary = summarize_parse(input_path)
+        print_parse_summary(summary)
+    with open(tables_path, 'w', encoding='utf-8') as f:
+        json.dump(summary_tables, f, ensure_ascii=False, indent=1)
+    return summary
+
+def collect_inputs(patterns: List[str]) -> List[str]:
+    """展开通配符和目录（目录下的*.log、*.txt），按给出的顺序去重"""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, '*.log')) + glob.glob(os.path.join(pattern, '*.txt')))
+        else:
+            matches = sorted(glob.glob(pattern))
+        if not matches:
+            print(f"警告: {pattern} 没有匹配到任何文件")
+        paths += [m for m in matches if os.path.isfile(m)]
+    return list(dict.fromkeys(paths))
+
+def write_table_csv(path: str, table: dict) -> None:
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(table["headers"])
+        writer.writerows(table["rows"])
+
+def run_batch(patterns: List[str], outdir: str, isble: bool, jobs: Optional[int] = None) -> Optional[ParseSummary]:
+    """
+    批量解析多个日志文件
+
+    每个文件在独立进程中解析，输出 <outdir>/<文件名>.csv、.log（单文件的完整打印）和 .tables.json；
+    各文件的ParseSummary回到主进程后直接相加合并，打印跨文件的RSSI错误率表和信道成功率表，
+    并保存为 <outdir>/merged_<表名>.csv。
+    """
+    inputs = collect_inputs(patterns)
+    if not inputs:
+        print("没有需要处理的文件")
+        return None
+    os.makedirs(outdir, exist_ok=True)
+
+    tasks = []
+    used_stems = set()
+    for path in inputs:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, n = stem, 1
+        while name in used_stems:
+            name = f"{stem}_{n}"
+            n += 1
+        used_stems.add(name)
+        base = os.path.join(outdir, name)
+        tasks.append((path, base + '.csv', isble, base + '.log', base + '.tables.json'))
+
+    print(f"批处理 {len(tasks)} 个文件，输出目录 {outdir}")
+    summaries = [None] * len(tasks)
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('spawn'),
+                             max_tasks_per_child=1) as executor:
+        futures = {executor.submit(analyze_file, task): i for i, task in enumerate(tasks)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                summaries[i] = future.result()
+            except Exception as e:
+                print(f"错误: 解析 {tasks[i][0]} 失败: {e}")
+                continue
+            print(f"[{sum(s is not None for s in summaries)}/{len(tasks)}] {tasks[i][0]} -> {tasks[i][1]}")
+
+    table_data = []
+    merged = None
+    for task, summary in zip(tasks, summaries):
+        if summary is None:
+            table_data.append([task[0], "FAILED", "", "", ""])
+            continue
+        rx_ok = int(summary.channel_rx_ok.sum())
+        rx_total = int(summary.channel_total.sum())
+        ok_rate = f"{rx_ok / rx_total:.2%}" if rx_total > 0 else "N/A"
+        table_data.append([task[0], len(summary.error_rates), rx_ok, rx_total, ok_rate])
+        merged = summary if merged is None else merged.merge(summary)
+    print(tabulate(table_data, headers=["File", "Blocks", "RX OK", "RX Total", "OK Rate"], tablefmt="grid"))
+
+    if merged is None:
+        return None
+    print(f"合并 {len(merged.sources)} 个文件的统计结果:")
+    print_parse_summary(merged)
+    for name, table in summary_tables.items():
+        write_table_csv(os.path.join(outdir, f"merged_{name}.csv"), table)
+    print(f"合并统计表已保存到 {outdir}")
+    return merged
+
+if __name__ == "__main__":
+
+    # 创建命令行参数解析器
+    parser = argparse.ArgumentParser(description='文件处理工具')
+    
+    # 添加参数
+    parser.add_argument('--isble', action='store_true', 
+                      default=False,  # 显式设置默认值为False
+                      help='启用BLE文件处理功能（默认不启用）')
+    # 添加参数
+    parser.add_argument('--figure', action='store_true', 
+                      default=False,  # 显式设置默认值为False
+                      help='启用Matlab画图（默认不启用）')
+    # input参数默认为argv[1]，如果未提供则使用位置参数
+    parser.add_argument('input', nargs='?', default=None,
+                      help='输入文件路径（默认为第一个位置参数）')
+    parser.add_argument('--output', type=str, default='result2.csv',
+                      help=f'输出文件路径（默认为result2.csv）')
+    parser.add_argument('--frames', type=str, default=None,
+                      help='将每个统计块的帧数据保存为二进制帧文件，可用FrameSource.from_file内存映射加载')
+    parser.add_argument('--loss-trace', type=str, default=None,
+                      help='将音频时隙的丢包图保存为按位打包的.npy文件，可用plc_harness.py --trace回放')
+    parser.add_argument('--scan-figure', choices=['bars', 'heatmap'], default=None,
+                      help='显示信道扫描RSSI：bars逐帧动画，heatmap一次画出通道×时间热力图（默认不显示）')
+    parser.add_argument('--stats-heatmap', nargs='?', const='', default=None,
+                      help='显示整个抓包的成功率/差值/AFH通道×时间热力图，给出文件名时保存为图片')
+    parser.add_argument('--live', action='store_true', default=False,
+                      help='解析在后台线程进行，统计帧边解析边显示（默认不启用）')
+    parser.add_argument('--tables', type=str, default=None,
+                      help='将RSSI错误率表和信道成功率表保存为JSON文件')
+    parser.add_argument('--serve', type=int, nargs='?', const=8765, default=None,
+                      help='在本机启动HTTP/WebSocket服务，用浏览器查看帧和统计表（默认端口8765）')
+    parser.add_argument('--batch', nargs='+', default=None, metavar='PATTERN',
+                      help='批量解析：文件、通配符或目录（目录下的*.log/*.txt），多进程处理并合并统计')
+    parser.add_argument('--outdir', type=str, default='batch_out',
+                      help='批处理输出目录（默认为batch_out）')
+    parser.add_argument('--jobs', type=int, default=None,
+                      help='批处理进程数（默认为CPU核数）')
+    
+    # 解析参数
+    args = parser.parse_args()
+    
+    if args.batch:
+        run_batch(args.batch, args.outdir, args.isble, args.jobs)
+        sys.exit(0)
+
+    reset_parse_state(args.isble)
+    print("MAX_CHANNELS:", MAX_CHANNELS)
+
+    # 确定输入文件路径：如果未通过位置参数提供，则检查argv[1]
+    input_path = args.input if args.input is not None else (sys.argv[1] if len(sys.argv) > 1 else None)    
+    server = None
+    if args.live:
+        # 解析放到后台线程，统计帧经有界队列实时送给跟踪器，主线程负责显示
+        from rssi_success_rate import FrameStream, RSSISuccessTracker
+        stream = FrameStream(num_channels=(MAX_CHANNELS+1), rx_hist_max=RX_HISTORY_MAX)
+        stats_frame_sink = stream.put
+
+        def parse_live():
+            try:
+                parse_file(input_path, args.output)
+            finally:
+                stream.close()
+
+        parser_thread = threading.Thread(target=parse_live, daemon=True)
+        parser_thread.start()
+        if args.serve is not None:
+            # 浏览器查看时由服务线程消费队列，不再打开matplotlib窗口
+            from frame_server import FrameServer
+            server = FrameServer(stream, tables=snapshot_summary_tables, port=args.serve).start()
+        else:
+            RSSISuccessTracker(
+                byte_arrays=stream,
+                num_channels=(MAX_CHANNELS+1),
+                int_format='b',
+                db_min=-100,
+                db_max=-30,
+                db_step=5,
+                delta_min=-40,
+                delta_max=40,
+                count_max=20,
+                rx_hist_max=RX_HISTORY_MAX,
+                update_interval=200
+            ).start_visualization()
+        parser_thread.join()
+        stats_frame_sink = None
+    else:
+        parse_file(input_path, args.output)
+    
+    print(f"处理完成，结果已保存到 {args.output}")
+    if args.frames:
+        from rssi_success_rate import save_frames
+        save_frames(args.frames, sf_stats_array, num_channels=(MAX_CHANNELS+1), rx_hist_max=RX_HISTORY_MAX)
+        print(f"帧数据已保存到 {args.frames}")
+    if args.loss_trace:
+        lost = save_loss_bitmap(args.loss_trace, audio_slot_loss)
+        print(f"音频时隙丢包图已保存到 {args.loss_trace}（{len(lost)} 个时隙，丢包率 {lost.mean() if len(lost) else 0:.2%}）")
+    print_parse_summary(summarize_parse(input_path))
     # Visualize the data
-    # visualize_rssi_list(sf_scaned_chns)
+    if args.scan_figure:
+        visualize_rssi_list(sf_scaned_chns, num_channels=(MAX_CHANNELS+1), mode=args.scan_figure)
+    
+    if args.stats_heatmap is not None:
+        from rssi_success_rate import FrameSource, show_channel_heatmaps
+        show_channel_heatmaps(
+            FrameSource(sf_stats_array, num_channels=(MAX_CHANNELS+1), rx_hist_max=RX_HISTORY_MAX),
+            output=args.stats_heatmap or None,
+            delta_min=-40,
+            delta_max=40
+        )
     
     # Create and run the tracker
-    print("Starting visualization...")
-    
-    tracker = RSSISuccessTracker(
-        byte_arrays=sf_stats_array,
-        num_channels=(MAX_CHANNELS+1),
-        int_format='b',
-        db_min=-100,
-        db_max=-30,
-        db_step=5,
-        delta_min=-40,
-        delta_max=40,        
-        count_max=20,
-        rx_hist_max=RX_HISTORY_MAX
-    )    
-    if (args.figure):
+    if (args.figure and not args.live):
+        # 只有需要显示图形时才加载跟踪器（matplotlib、字体和Tk都在这里才初始化）
+        from rssi_success_rate import RSSISuccessTracker
+        print("Starting visualization...")
+
+        tracker = RSSISuccessTracker(
+            byte_arrays=sf_stats_array,
+            num_channels=(MAX_CHANNELS+1),
+            int_format='b',
+            db_min=-100,
+            db_max=-30,
+            db_step=5,
+            delta_min=-40,
+            delta_max=40,
+            count_max=20,
+            rx_hist_max=RX_HISTORY_MAX
+        )
         #Start the visualization
         tracker.start_visualization()
 
     
+
+    if args.tables:
+        with open(args.tables, 'w', encoding='utf-8') as f:
+            json.dump(summary_tables, f, ensure_ascii=False, indent=1)
+        print(f"统计表已保存到 {args.tables}")
+
+    if args.serve is not None:
+        if server is None:
+            from frame_server import FrameServer
+            from rssi_success_rate import FrameSource
+            server = FrameServer(
+                FrameSource(sf_stats_array, num_channels=(MAX_CHANNELS+1), rx_hist_max=RX_HISTORY_MAX),
+                tables=snapshot_summary_tables,
+                port=args.serve
+            ).start()
+        server.wait()
@@ -0,0 +1,156 @@
+import os
+import copy
+import json
+
+import numpy as np
+
+# rx_total_parse.py统计帧的默认布局（BT：79个信道+1，RX RSSI历史2000个值）
+DEFAULT_NUM_CHANNELS = 80
+DEFAULT_RX_HIST_MAX = 2000
+DEFAULT_FRAME_PERIOD = 1.0   # 每个统计帧（一个rx total块）对应的原始时间（秒）
+
+def read_frame_layout(path):
+	"""
+	读取帧文件旁的<frames>.layout.json（rx_total_parse.py --frames写出的布局描述），没有时返回None
+
+	与log_parse/rssi_success_rate.py的read_layout()读的是同一个文件，模拟器不依赖log_parse，所以这里直接读JSON。
+	"""
+	layout_file = path + '.layout.json'
+	if not os.path.exists(layout_file):
+		return None
+	with open(layout_file, 'r', encoding='utf-8') as f:
+		return json.load(f)
+
+def forward_fill(matrix):
+	"""沿时间轴（第0维）用前一个有效值填充NaN，开头的NaN用之后的第一个有效值填充"""
+	valid = ~np.isnan(matrix)
+	index = np.where(valid, np.arange(len(matrix))[:, None], 0)
+	np.maximum.accumulate(index, axis=0, out=index)
+	filled = np.take_along_axis(matrix, index, axis=0)
+	# 开头没有有效值的部分
+	first = np.argmax(valid, axis=0)
+	head = np.isnan(filled)
+	filled[head] = np.take_along_axis(matrix, first[None, :], axis=0).repeat(len(matrix), axis=0)[head]
+	return filled
+
+class ChannelEnvironment:
+	"""
+	每信道、随时间变化的丢包概率
+
+	loss是(帧数, 信道数)矩阵，每帧覆盖frame_period秒（原始时间尺度）。按虚拟时间查表是O(1)：
+	帧号 = int(t / frame_period)，超过末尾时循环（loop=True）或停在最后一帧。
+	channels把模拟器的信道号（0..K-1）映射到矩阵的列（RF信道）。
+	"""
+
+	def __init__(self, loss, frame_period=DEFAULT_FRAME_PERIOD, channels=None, loop=True):
+		self.loss = np.ascontiguousarray(np.clip(loss, 0.0, 1.0), dtype=np.float64)
+		if self.loss.ndim != 2 or self.loss.shape[0] == 0:
+			raise ValueError("丢包概率矩阵必须是非空的(帧数, 信道数)二维数组")
+		self.frame_period = frame_period
+		self.channels = np.arange(self.loss.shape[1]) if channels is None else np.asarray(channels)
+		self.loop = loop
+		self.offset = 0   # 帧号偏移，见shifted()
+		self.num_frames = self.loss.shape[0]
+		self.num_channels = len(self.channels)
+		self.duration = self.num_frames * frame_period
+
+	@classmethod
+	def from_frames(cls, path, num_channels=None, rx_hist_max=None,
+					frame_period=DEFAULT_FRAME_PERIOD, channels=None, min_packets=1, loop=True):
+		"""
+		从rx_total_parse.py --frames保存的统计帧文件建立环境
+
+		每帧依次是：扫描RSSI、实际RSSI、rx_ok、失败数、AFH map（各num_channels字节），再加rx_hist_max字节RSSI历史。
+		收包数不少于min_packets的(帧, 信道)直接用 失败数/收包数；没有收包的（例如不在AFH map中的信道）
+		按同一抓包里扫描RSSI→丢包率的经验关系估计；仍无法估计的沿时间用前后的值填充。
+		最后一个信道是占位，不参与。
+		布局优先取自帧文件旁的布局文件，num_channels/rx_hist_max只在没有布局文件时使用
+		（默认BT布局），与布局文件不一致时报错；文件长度不是整数帧时报错。
+		"""
+		stored = read_frame_layout(path) or {}
+		requested = {'num_channels': num_channels, 'rx_hist_max': rx_hist_max}
+		defaults = {'num_channels': DEFAULT_NUM_CHANNELS, 'rx_hist_max': DEFAULT_RX_HIST_MAX}
+		for key, value in requested.items():
+			if value is not None and key in stored and stored[key] != value:
+				raise ValueError(f"{path}: {key}={value} 与布局文件中的 {stored[key]} 不一致")
+			requested[key] = value if value is not None else stored.get(key, defaults[key])
+		if stored.get('int_format', 'b') != 'b':
+			raise ValueError(f"{path}: 只支持8位有符号的统计帧，布局文件中为 {stored['int_format']}")
+		num_channels, rx_hist_max = requested['num_channels'], requested['rx_hist_max']
+
+		values_per_frame = num_channels * 5 + rx_hist_max
+		raw = np.memmap(path, dtype=np.uint8, mode='r')
+		if len(raw) % values_per_frame:
+			raise ValueError(f"{path}: 文件长度 {len(raw)} 不是帧长度 {values_per_frame} 的整数倍"
+							 f"（信道数 {num_channels}，RX历史 {rx_hist_max}），请检查布局")
+		frames = raw.reshape(-1, values_per_frame)
+		if len(frames) == 0:
+			raise ValueError(f"帧文件中没有完整的帧: {path}")
+		n = num_channels
+		used = n - 1
+		scan_rssi = frames[:, :used].view(np.int8).astype(np.int64)
+		rx_ok = frames[:, 2*n:2*n + used].astype(np.float64)
+		failures = frames[:, 3*n:3*n + used].astype(np.float64)
+		total = rx_ok + failures
+		observed = total >= max(min_packets, 1)
+		loss = np.full(total.shape, np.nan)
+		loss[observed] = failures[observed] / total[observed]
+
+		# 扫描RSSI（每dBm一个区间）→平均丢包率，用有观测的格子统计，按RSSI插值给没有观测的格子
+		if observed.any() and not observed.all():
+			offset = scan_rssi.min()
+			bins = scan_rssi - offset
+			weights = np.bincount(bins[observed], weights=total[observed], minlength=bins.max() + 1)
+			lost = np.bincount(bins[observed], weights=failures[observed], minlength=bins.max() + 1)
+			known = np.flatnonzero(weights > 0)
+			curve = np.interp(np.arange(len(weights)), known, lost[known] / weights[known])
+			loss[~observed] = curve[bins[~observed]]
+
+		if np.isnan(loss).all():
+			raise ValueError(f"帧文件中没有任何收包统计: {path}")
+		loss = forward_fill(loss)
+		# 整列都没有值的信道用全局平均值
+		loss[np.isnan(loss)] = np.nanmean(loss)
+		return cls(loss, frame_period, channels, loop)
+
+	def frame_index(self, t):
+		"""虚拟时间t（原始时间尺度，秒）对应的帧号"""
+		index = int(t / self.frame_period) + self.offset
+		if self.loop:
+			return index % self.num_frames
+		return min(max(index, 0), self.num_frames - 1)
+
+	def shifted(self, frames):
+		"""时间错开frames帧的环境，与原环境共用同一个矩阵（多链路的独立环境用）"""
+		env = copy.copy(self)
+		env.offset = self.offset + int(frames)
+		return env
+
+	def loss_at(self, channel, t):
+		"""模拟器信道channel在虚拟时间t的丢包概率"""
+		return self.loss[self.frame_index(t), self.channels[channel % self.num_channels]]
+
+	def loss_row(self, t):
+		"""虚拟时间t所有模拟器信道的丢包概率（视图或拷贝，按channels顺序）"""
+		return self.loss[self.frame_index(t), self.channels]
+
+def add_env_arguments(parser):
+	"""信道环境的命令行参数（simu.py和multilink.py共用）"""
+	parser.add_argument('--env', type=str, default=None,
+					  help='rx_total_parse.py --frames保存的统计帧文件，按信道和时间决定误包率')
+	parser.add_argument('--env-channels', type=int, nargs='+', default=None,
+					  help='模拟器使用的RF信道（默认帧文件中的全部信道）')
+	parser.add_argument('--env-period', type=float, default=DEFAULT_FRAME_PERIOD,
+					  help=f'每个统计帧对应的原始时间 (秒, 默认{DEFAULT_FRAME_PERIOD})')
+	parser.add_argument('--env-num-channels', type=int, default=None,
+					  help=f'统计帧的信道数，默认取自帧文件的布局文件，没有时为{DEFAULT_NUM_CHANNELS} (BT为80, BLE为40)')
+	parser.add_argument('--env-rx-hist', type=int, default=None,
+					  help=f'统计帧中RSSI历史的长度，默认取自帧文件的布局文件，没有时为{DEFAULT_RX_HIST_MAX}')
+	return parser
+
+def channel_env_from_args(args):
+	"""按add_env_arguments的参数建立信道环境，没有--env时返回None"""
+	if not args.env:
+		return None
+	return ChannelEnvironment.from_frames(args.env, args.env_num_channels, args.env_rx_hist,
+										  args.env_period, args.env_channels)
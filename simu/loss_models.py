@@ -0,0 +1,168 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+# 每次预先生成的随机数个数（逐次调用lost()时从中取用）
+DEFAULT_BLOCK_SIZE = 4096
+
+class LossModel(ABC):
+	"""
+	丢包模型接口
+
+	draw(n, error_rate): 一次向量化生成n次传输的结果（True=丢失），用于批量扫描
+	lost(error_rate):    单次传输的结果，模拟器每次发送时调用；误包率每次都可能变化，
+	                     因此只预先整块生成随机数，比较在取用时进行
+	"""
+	name = 'base'
+
+	def __init__(self, seed=None, block_size=DEFAULT_BLOCK_SIZE):
+		self.rng = np.random.default_rng(seed)
+		self.block_size = block_size
+		self._uniforms = np.empty(0)
+		self._pos = 0
+
+	def _next_uniform(self):
+		if self._pos >= len(self._uniforms):
+			self._uniforms = self.rng.random(self.block_size)
+			self._pos = 0
+		u = self._uniforms[self._pos]
+		self._pos += 1
+		return u
+
+	@abstractmethod
+	def draw(self, n, error_rate):
+		pass
+
+	@abstractmethod
+	def lost(self, error_rate):
+		pass
+
+class BernoulliLoss(LossModel):
+	"""每次传输独立以error_rate的概率丢失（原random_packet_loss的行为）"""
+	name = 'bernoulli'
+
+	def draw(self, n, error_rate):
+		return self.rng.random(n) < error_rate
+
+	def lost(self, error_rate):
+		return self._next_uniform() < error_rate
+
+class GilbertElliottLoss(LossModel):
+	"""
+	两状态Gilbert-Elliott突发丢包：坏状态全丢、好状态不丢
+
+	坏状态平均持续burst次传输；好→坏的转移概率按error_rate计算，使长期平均丢包率等于error_rate，
+	因此误包率变化时突发长度不变，只是突发出现得更频繁。好状态至少持续1次传输，所以误包率高于
+	burst/(burst+1)时转移概率已经是1，这时加长坏状态的平均持续时间来保持平均丢包率。
+	"""
+	name = 'gilbert'
+
+	def __init__(self, burst=4.0, seed=None, block_size=DEFAULT_BLOCK_SIZE):
+		super().__init__(seed, block_size)
+		self.burst = max(float(burst), 1.0)
+		self.bad = False
+
+	def _parameters(self, error_rate):
+		"""(好→坏转移概率, 坏状态平均持续次数)，0 < error_rate < 1"""
+		odds = error_rate / (1 - error_rate)
+		burst = max(self.burst, odds)
+		return odds / burst, burst
+
+	def lost(self, error_rate):
+		if error_rate <= 0:
+			self.bad = False
+		elif error_rate >= 1:
+			self.bad = True
+		elif self.bad:
+			self.bad = self._next_uniform() >= 1 / self._parameters(error_rate)[1]
+		else:
+			self.bad = self._next_uniform() < self._parameters(error_rate)[0]
+		return self.bad
+
+	def draw(self, n, error_rate):
+		"""按状态持续时间（几何分布）整段生成，不逐次模拟状态转移"""
+		if error_rate <= 0:
+			self.bad = False
+			return np.zeros(n, dtype=bool)
+		if error_rate >= 1:
+			self.bad = True
+			return np.ones(n, dtype=bool)
+		p_enter, burst = self._parameters(error_rate)
+		runs = []
+		total = 0
+		state = self.bad
+		while total < n:
+			count = int((n - total) * p_enter) + 16
+			bad = self.rng.geometric(1 / burst, count)
+			good = self.rng.geometric(p_enter, count)
+			# 当前处于坏状态时先生成坏状态段
+			lengths = np.column_stack([bad, good] if state else [good, bad]).ravel()
+			runs.append(lengths)
+			total += int(lengths.sum())
+		lengths = np.concatenate(runs)
+		states = np.resize(np.array([state, not state]), len(lengths))
+		result = np.repeat(states, lengths)[:n]
+		self.bad = bool(result[-1]) if n else self.bad
+		return result
+
+class TraceLoss(LossModel):
+	"""
+	按丢包轨迹回放（忽略error_rate），到末尾后从头循环
+
+	轨迹可以是布尔/0-1数组，或rx_total_parse.py --loss-trace导出的按位打包.npy文件。
+	"""
+	name = 'trace'
+
+	def __init__(self, trace, offset=0):
+		super().__init__()
+		if isinstance(trace, str):
+			trace = load_trace(trace)
+		self.trace = np.asarray(trace, dtype=bool).ravel()
+		if self.trace.size == 0:
+			raise ValueError("丢包轨迹为空")
+		self._index = offset % len(self.trace)
+
+	def lost(self, error_rate=None):
+		result = self.trace[self._index]
+		self._index = (self._index + 1) % len(self.trace)
+		return bool(result)
+
+	def draw(self, n, error_rate=None):
+		indices = (self._index + np.arange(n)) % len(self.trace)
+		self._index = (self._index + n) % len(self.trace)
+		return self.trace[indices]
+
+def load_trace(path):
+	"""
+	读取丢包轨迹文件（.npy或每行一个0/1的文本），返回完整轨迹，由TraceLoss循环使用
+	"""
+	if path.endswith('.npy'):
+		trace = np.load(path)
+		if trace.dtype.names and 'bits' in trace.dtype.names:
+			# rx_total_parse.py --loss-trace的格式：slots个时隙，按位打包
+			return np.unpackbits(trace['bits'], count=int(trace['slots']), bitorder='little').astype(bool)
+		return trace.astype(bool).ravel()
+	return np.loadtxt(path, dtype=np.uint8).astype(bool).ravel()
+
+LOSS_MODELS = {model.name: model for model in (BernoulliLoss, GilbertElliottLoss, TraceLoss)}
+
+def add_loss_arguments(parser):
+	"""丢包模型的命令行参数（simu.py和multilink.py共用）"""
+	parser.add_argument('--loss-model', choices=list(LOSS_MODELS), default='bernoulli',
+					  help='丢包模型: bernoulli独立丢包, gilbert突发丢包, trace按轨迹回放 (默认bernoulli)')
+	parser.add_argument('--burst', type=float, default=4.0, help='gilbert模型坏状态平均持续的传输次数')
+	parser.add_argument('--trace', type=str, default=None, help='trace模型的丢包轨迹文件(.npy或0/1文本)')
+	parser.add_argument('--seed', type=int, default=None, help='随机数种子（数据生成和丢包模型）')
+	return parser
+
+def create_loss_model(name='bernoulli', burst=4.0, trace=None, seed=None):
+	"""按名称创建丢包模型（命令行参数用）"""
+	if name == 'gilbert':
+		return GilbertElliottLoss(burst=burst, seed=seed)
+	if name == 'trace':
+		if not trace:
+			raise ValueError("trace丢包模型需要指定轨迹文件")
+		return TraceLoss(trace)
+	if name == 'bernoulli':
+		return BernoulliLoss(seed=seed)
+	raise ValueError(f"未知的丢包模型: {name}")
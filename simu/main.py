@@ -1,16 +1,23 @@
 import subprocess
 import csv
+import json
 import time
 from datetime import datetime
 
+from metrics import SimulationMetrics
+
+# 每个场景写入CSV的合并统计项（SimulationMetrics.summary()中的键）
+METRIC_COLUMNS = ['retransmissions', 'retransmit_ratio', 'ack1_rtt_mean', 'ack1_rtt_p95', 'ack2_rtt_mean',
+                  'mismatch_s', 'activation_lag_mean', 'updates_failed', 'disconnects']
+
 def run_simulation(initial_error, max_error, algorithm, duration=120, speedup=5):
-    """运行单次模拟并返回通信事件计数器结果"""
+    """运行单次模拟并返回统计结果（SimulationMetrics），失败时返回None"""
     try:
         # 使用独立的Python脚本作为入口，避免导入问题
         result = subprocess.run(
             [
                 "python", "-c", 
-                "import sys; "
+                "import sys, json; "
                 "from simu import MasterSlaveSimulator; "  # 直接从simulator.py导入
                 "ie = float(sys.argv[1]); "
                 "me = float(sys.argv[2]); "
@@ -19,7 +26,7 @@ def run_simulation(initial_error, max_error, algorithm, duration=120, speedup=5)
                 "sp = int(sys.argv[5]); "
                 "sim = MasterSlaveSimulator(initial_error_rate=ie, max_error_rate=me, "
                 "merge_success_rate=0.5, algorithm=alg, speedup=sp); "
-                "print(sim.run_simulation(max_duration=dur))",
+                "print(json.dumps(sim.run_simulation(max_duration=dur).to_dict()))",
                 str(initial_error),
                 str(max_error),
                 str(algorithm),
@@ -32,10 +39,10 @@ def run_simulation(initial_error, max_error, algorithm, duration=120, speedup=5)
         )
         
         output_lines = result.stdout.strip().split('\n')
-        # 查找最后一个整数输出（通信事件计数器）
+        # 查找最后一行JSON输出（统计结果）
         for line in reversed(output_lines):
-            if line.isdigit():
-                return int(line)
+            if line.startswith('{'):
+                return SimulationMetrics.from_dict(json.loads(line))
         return None
     except Exception as e:
         print(f"❌ 模拟失败: {str(e)}")
@@ -103,6 +110,8 @@ def main():
     # 输出CSV文件
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_file = f"algorithm_comparison_{timestamp}.csv"
+    metrics_file = f"algorithm_comparison_{timestamp}_metrics.json"
+    scenario_metrics = []
     
     with open(output_file, 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
@@ -110,7 +119,7 @@ def main():
             '初始误包率', '最大误包率', '算法', 
             '第1次通信事件数', '第2次通信事件数', '第3次通信事件数', 
             '平均值', '最小值', '最大值'
-        ])
+        ] + METRIC_COLUMNS)
     
     current_scenario = 0
     start_time = time.time()
@@ -126,19 +135,24 @@ def main():
                 print_scenario_header(initial_error, max_error, algorithm, current_scenario, valid_scenarios)
                 
                 results = []
+                merged = SimulationMetrics()
                 for run in range(1, runs_per_scenario + 1):
-                    event_count = run_simulation(
+                    metrics = run_simulation(
                         initial_error=initial_error,
                         max_error=max_error,
                         algorithm=algorithm,
                         duration=simulation_duration,
                         speedup=speedup
                     )
+                    event_count = metrics.events if metrics is not None else None
+                    if metrics is not None:
+                        merged.merge(metrics)
                     results.append(event_count)
                     print_run_result(run, runs_per_scenario, event_count)
                     time.sleep(0.5)  # 短暂延迟，避免资源占用过高
                 
                 print_scenario_stats(results)
+                summary = merged.summary()
                 
                 # 计算统计值
                 valid_results = [r for r in results if r is not None]
@@ -158,11 +172,18 @@ def main():
                         round(avg, 2) if avg else None,
                         min_val,
                         max_val
-                    ])
+                    ] + [round(summary[name], 3) if summary[name] is not None else None for name in METRIC_COLUMNS])
+                
+                # 合并后的计数器和直方图（不保存每次运行的原始记录）
+                scenario_metrics.append({'initial_error': initial_error, 'max_error': max_error,
+                                         'algorithm': algorithm, 'metrics': merged.to_dict()})
+                with open(metrics_file, 'w', encoding='utf-8') as f:
+                    json.dump(scenario_metrics, f)
     
     total_time = time.time() - start_time
     print(f"\n所有模拟完成！总耗时: {total_time:.2f}秒")
     print(f"结果已保存至: {output_file}")
+    print(f"合并统计（含直方图）已保存至: {metrics_file}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
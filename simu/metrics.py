@@ -0,0 +1,115 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# 以通信事件数计的直方图：第k格为k个事件，最后一格收集 >= EVENT_BINS-1 的值
+EVENT_BINS = 256
+# 断线事件序号的直方图按2的幂分格：第k格为[2^(k-1), 2^k)，第0格为0
+DISCONNECT_BINS = 32
+
+COUNTER_FIELDS = ['runs', 'events', 'master_tx', 'retransmissions', 'master_lost', 'slave_lost',
+				  'mismatch_events', 'mismatch_seconds', 'updates_generated', 'updates_activated', 'updates_failed', 'disconnects']
+HISTOGRAM_FIELDS = ['ack1_rtt', 'ack2_rtt', 'mismatch_runs', 'activation_lag', 'disconnect_event']
+
+def _event_histogram():
+	return np.zeros(EVENT_BINS, dtype=np.int64)
+
+def histogram_mean(hist):
+	"""直方图的平均值（按格号计，溢出格按下限计）"""
+	total = hist.sum()
+	return float(np.dot(np.arange(len(hist)), hist) / total) if total else None
+
+def histogram_percentile(hist, q):
+	"""直方图的q分位数（格号）"""
+	total = hist.sum()
+	if not total:
+		return None
+	return int(np.searchsorted(np.cumsum(hist), total * q / 100.0))
+
+@dataclass
+class SimulationMetrics:
+	"""
+	一次（或合并后多次）模拟的性能统计
+
+	全部是预先分配的计数器和固定分格的直方图，记录是O(1)的加法，不保存逐事件的原始记录，
+	因此扫参时可以用merge()把任意多次运行合并成一个结果。
+	时间类指标都以通信事件数计：
+	  ack1_rtt:       非空包第一次发送到Master收到ACK1经过的事件数（1表示一次成功）
+	  ack2_rtt:       信道更新包第一次发送到Master发出ACK2（算法2）经过的事件数
+	  mismatch_runs:  每段主从信道不一致持续的事件数
+	  activation_lag: 信道更新包生成到主从都切换到新信道经过的事件数
+	  disconnect_event: 断线时的通信事件序号（按2的幂分格）
+	"""
+	runs: int = 0
+	events: int = 0
+	master_tx: int = 0            # Master发送次数（含空包和重传）
+	retransmissions: int = 0
+	master_lost: int = 0          # Master发送的包丢失次数
+	slave_lost: int = 0           # Slave响应丢失次数
+	mismatch_events: int = 0      # 主从信道不一致的事件数
+	mismatch_seconds: float = 0.0 # 主从信道不一致的总时长（原始时间尺度，秒），按各自链路的事件间隔累加
+	updates_generated: int = 0
+	updates_activated: int = 0
+	updates_failed: int = 0       # 过期、被后续更新取代或激活后主从不一致
+	disconnects: int = 0
+	ack1_rtt: np.ndarray = field(default_factory=_event_histogram)
+	ack2_rtt: np.ndarray = field(default_factory=_event_histogram)
+	mismatch_runs: np.ndarray = field(default_factory=_event_histogram)
+	activation_lag: np.ndarray = field(default_factory=_event_histogram)
+	disconnect_event: np.ndarray = field(default_factory=lambda: np.zeros(DISCONNECT_BINS, dtype=np.int64))
+
+	def record_ack1(self, events):
+		self.ack1_rtt[min(events, EVENT_BINS - 1)] += 1
+
+	def record_ack2(self, events):
+		self.ack2_rtt[min(events, EVENT_BINS - 1)] += 1
+
+	def record_mismatch_run(self, events):
+		self.mismatch_runs[min(events, EVENT_BINS - 1)] += 1
+
+	def record_activation(self, events):
+		self.updates_activated += 1
+		self.activation_lag[min(events, EVENT_BINS - 1)] += 1
+
+	def record_disconnect(self, event_index):
+		self.disconnects += 1
+		self.disconnect_event[min(int(event_index).bit_length(), DISCONNECT_BINS - 1)] += 1
+
+	def merge(self, other):
+		"""把另一个结果累加到本结果（返回self）"""
+		for name in COUNTER_FIELDS:
+			setattr(self, name, getattr(self, name) + getattr(other, name))
+		for name in HISTOGRAM_FIELDS:
+			hist = getattr(self, name)
+			hist += getattr(other, name)
+		return self
+
+	def summary(self):
+		"""便于打印/写CSV的标量汇总"""
+		return {
+			'runs': self.runs,
+			'events_avg': self.events / self.runs if self.runs else None,
+			'retransmissions': self.retransmissions,
+			'retransmit_ratio': self.retransmissions / self.master_tx if self.master_tx else None,
+			'ack1_rtt_mean': histogram_mean(self.ack1_rtt),
+			'ack1_rtt_p95': histogram_percentile(self.ack1_rtt, 95),
+			'ack2_rtt_mean': histogram_mean(self.ack2_rtt),
+			'mismatch_s': self.mismatch_seconds,
+			'activation_lag_mean': histogram_mean(self.activation_lag),
+			'updates_failed': self.updates_failed,
+			'disconnects': self.disconnects,
+		}
+
+	def to_dict(self):
+		"""转为可JSON序列化的dict（直方图为列表）"""
+		result = {name: getattr(self, name) for name in COUNTER_FIELDS}
+		for name in HISTOGRAM_FIELDS:
+			result[name] = getattr(self, name).tolist()
+		return result
+
+	@classmethod
+	def from_dict(cls, data):
+		metrics = cls(**{name: data[name] for name in COUNTER_FIELDS})
+		for name in HISTOGRAM_FIELDS:
+			getattr(metrics, name)[:] = data[name]
+		return metrics
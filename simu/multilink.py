@@ -0,0 +1,245 @@
+import csv
+import time
+import heapq
+import random
+import argparse
+import itertools
+
+import numpy as np
+from tabulate import tabulate
+
+from simu import MasterSlaveSimulator, VirtualClock
+from loss_models import TraceLoss, add_loss_arguments, create_loss_model, load_trace
+from channel_env import add_env_arguments, channel_env_from_args
+from metrics import SimulationMetrics
+
+LINK_HEADERS = ['link', 'interval_ms', 'events', 'deferred', 'mean_defer_ms', 'skipped', 'disconnected', 'disconnect_s']
+
+class MultiLinkScheduler:
+	"""
+	多链路调度器：K条主从链路的通信事件按各自的连接间隔交错排在同一条虚拟时间线上
+
+	所有链路共用一个VirtualClock，待处理的通信事件按时间放在一个最小堆中，
+	每次取出最早的事件、把时钟拨到该时刻、调用该链路的step()，再按它的间隔排下一次事件；
+	断线的链路不再排事件。每个事件的处理是O(log K)，不sleep，因此一个进程可以跑几百条链路。
+
+	air_time > 0 时模拟空口竞争：一个通信事件占用空口air_time秒，开始时空口仍被其它链路
+	占用的事件直接预约空口的下一个空闲时隙（按推迟先后排队），记入deferred和推迟时间；
+	每个事件最多重新入堆一次，空口竞争时每个事件仍是O(log K)。
+	链路的锚点不变，下一次事件仍按原间隔排。只有空口过载、推迟超过一个间隔时，
+	已经错过的锚点才被跳过，记入skipped。
+	"""
+
+	def __init__(self, links, clock, air_time=0.0, offsets=None):
+		self.links = links
+		self.clock = clock
+		self.air_time = air_time
+		self.offsets = offsets if offsets is not None else [0.0] * len(links)
+		self.deferred = np.zeros(len(links), dtype=np.int64)
+		self.defer_time = np.zeros(len(links))   # 推迟时间之和（秒）
+		self.skipped = np.zeros(len(links), dtype=np.int64)
+		self.disconnect_at = np.full(len(links), np.nan)   # 断线时刻（原始时间尺度，相对开始）
+		self.wall_time = 0.0
+		self.duration = 0.0
+
+	@classmethod
+	def build(cls, count, initial_error_rate, max_error_rate, merge_success_rate, algorithm=1,
+			  intervals=(0.0225,), channel_env=None, shared_env=True, loss_model_factory=None,
+			  air_time=0.0, seed=None):
+		"""
+		建立count条链路，连接间隔按intervals循环分配（原始时间，秒），各链路的首个事件在一个间隔内随机错开
+
+		channel_env给出时，shared_env=True所有链路看到同一个信道环境（同一时刻相同的丢包率）；
+		否则每条链路使用时间随机错开的视图（共用同一个矩阵，不复制）。
+		loss_model_factory(i)返回第i条链路的丢包模型，None时每条链路用独立种子的Bernoulli模型。
+		"""
+		rng = np.random.default_rng(seed)
+		clock = VirtualClock()
+		if loss_model_factory is None:
+			seeds = rng.integers(2**32, size=count)
+			loss_model_factory = lambda i: create_loss_model('bernoulli', seed=int(seeds[i]))
+		links = []
+		offsets = []
+		for i, interval in zip(range(count), itertools.cycle(intervals)):
+			env = channel_env
+			if channel_env is not None and not shared_env:
+				env = channel_env.shifted(rng.integers(channel_env.num_frames))
+			links.append(MasterSlaveSimulator(initial_error_rate, max_error_rate, merge_success_rate, algorithm,
+											  speedup=1, loss_model=loss_model_factory(i), channel_env=env,
+											  clock=clock, verbose=False, base_connection_interval=interval))
+			offsets.append(rng.random() * interval)
+		return cls(links, clock, air_time, offsets)
+
+	def run(self, max_duration=60):
+		"""运行max_duration秒（原始时间），全部链路断线时提前结束"""
+		wall_start = time.time()
+		start = self.clock()
+		end = start + max_duration
+		# 堆元素：(事件时间, 入堆序号, 链路号, 锚点, 是否已预约空口)，时间相同时按入堆先后处理
+		sequence = itertools.count()
+		heap = []
+		for i, link in enumerate(self.links):
+			# 链路从同一时刻开始计时（超时、信道更新都以此为起点）
+			link.start_time = start
+			link.last_channel_update_time = start
+			link.master_last_receive_time = start
+			link.slave_last_receive_time = start
+			anchor = start + self.offsets[i]
+			heap.append((anchor, next(sequence), i, anchor, False))
+		heapq.heapify(heap)
+
+		busy_until = start   # 空口（含已预约的时隙）空闲的时刻
+		while heap:
+			t, _, i, anchor, reserved = heapq.heappop(heap)
+			if t >= end:
+				break
+			if not reserved:
+				if t < busy_until:
+					# 空口被占用：预约下一个空闲时隙，不丢弃
+					heapq.heappush(heap, (busy_until, next(sequence), i, anchor, True))
+					busy_until += self.air_time
+					continue
+				busy_until = t + self.air_time
+			self.clock.now = t
+			link = self.links[i]
+			if t > anchor:
+				self.deferred[i] += 1
+				self.defer_time[i] += t - anchor
+			link.step()
+			if link.disconnected:
+				self.disconnect_at[i] = link.disconnect_time - start
+				continue
+			interval = link.connection_interval
+			anchor += interval
+			if anchor <= t:
+				# 空口过载，推迟超过了一个间隔：跳过已经错过的锚点
+				missed = int((t - anchor) // interval) + 1
+				self.skipped[i] += missed
+				anchor += missed * interval
+			heapq.heappush(heap, (anchor, next(sequence), i, anchor, False))
+
+		for link in self.links:
+			link.finish_metrics()
+		# 堆里还有事件说明跑满了时长，否则是全部链路断线提前结束
+		self.duration = (end if heap else self.clock.now) - start
+		self.wall_time = time.time() - wall_start
+		return self.summary()
+
+	def link_stats(self):
+		"""每条链路一行统计"""
+		rows = []
+		for i, link in enumerate(self.links):
+			rows.append({
+				'link': i,
+				'interval_ms': round(link.connection_interval * 1000, 3),
+				'events': link.connection_event_counter,
+				'deferred': int(self.deferred[i]),
+				'mean_defer_ms': round(float(self.defer_time[i] / self.deferred[i]) * 1000, 3) if self.deferred[i] else 0.0,
+				'skipped': int(self.skipped[i]),
+				'disconnected': int(link.disconnected),
+				'disconnect_s': '' if np.isnan(self.disconnect_at[i]) else round(float(self.disconnect_at[i]), 3),
+			})
+		return rows
+
+	def merged_metrics(self):
+		"""全部链路的性能统计合并成一个SimulationMetrics"""
+		merged = SimulationMetrics()
+		for link in self.links:
+			merged.merge(link.metrics)
+		return merged
+
+	def summary(self):
+		"""汇总统计：断线链路数与比例、断线时间分布、事件总数"""
+		disconnected = self.disconnect_at[~np.isnan(self.disconnect_at)]
+		events = sum(link.connection_event_counter for link in self.links)
+		return {
+			'links': len(self.links),
+			'disconnected': len(disconnected),
+			'disconnect_ratio': len(disconnected) / len(self.links) if self.links else 0.0,
+			'mean_disconnect_s': float(disconnected.mean()) if len(disconnected) else None,
+			'median_disconnect_s': float(np.median(disconnected)) if len(disconnected) else None,
+			'min_disconnect_s': float(disconnected.min()) if len(disconnected) else None,
+			'events': events,
+			'deferred': int(self.deferred.sum()),
+			'mean_defer_ms': float(self.defer_time.sum() / self.deferred.sum()) * 1000 if self.deferred.sum() else None,
+			'skipped': int(self.skipped.sum()),
+			'duration_s': self.duration,
+			'wall_s': self.wall_time,
+			'events_per_wall_s': events / self.wall_time if self.wall_time > 0 else None,
+		}
+
+def print_interval_table(scheduler):
+	"""按连接间隔分组打印断线情况"""
+	rows = scheduler.link_stats()
+	table = []
+	for interval in sorted({row['interval_ms'] for row in rows}):
+		group = [row for row in rows if row['interval_ms'] == interval]
+		times = [row['disconnect_s'] for row in group if row['disconnected']]
+		table.append([interval, len(group), len(times), f"{len(times) / len(group):.2%}",
+					  f"{np.mean(times):.3f}" if times else '-', sum(row['events'] for row in group),
+					  sum(row['deferred'] for row in group), sum(row['skipped'] for row in group)])
+	print(tabulate(table, headers=['间隔(ms)', '链路数', '断线数', '断线比例', '平均断线时间(s)', '事件数', '推迟', '跳过'],
+				   tablefmt='grid'))
+
+def write_link_csv(rows, path):
+	with open(path, 'w', newline='', encoding='utf-8') as f:
+		writer = csv.DictWriter(f, fieldnames=LINK_HEADERS)
+		writer.writeheader()
+		writer.writerows(rows)
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description='多链路主从通信模拟：多条链路的通信事件在同一虚拟时间线上调度')
+	parser.add_argument('--links', type=int, default=8, help='链路数')
+	parser.add_argument('--intervals', type=float, nargs='+', default=[22.5],
+					  help='连接间隔列表 (毫秒，按链路循环分配，默认22.5)')
+	parser.add_argument('--initial-error', type=float, default=0.1, help='初始误包率 (0-1)')
+	parser.add_argument('--max-error', type=float, default=0.5, help='最大误包率 (0-1)')
+	parser.add_argument('--merge-success', type=float, default=0.5, help='信道合并成功率 (0-1)')
+	parser.add_argument('--duration', type=float, default=60, help='模拟时长 (原始时间，秒)')
+	parser.add_argument('--algorithm', type=int, default=1, choices=[1, 2],
+					  help='1: 定时激活（强制更新）; 2: ACK确认后激活 (默认1)')
+	parser.add_argument('--air-time', type=float, default=0.0,
+					  help='每个通信事件占用空口的时间 (毫秒，0表示不模拟空口竞争，默认0)')
+	add_loss_arguments(parser)
+	add_env_arguments(parser)
+	parser.add_argument('--independent-env', action='store_true',
+					  help='每条链路使用时间错开的信道环境（默认所有链路共用同一环境）')
+	parser.add_argument('--output', type=str, default=None, help='每条链路的统计CSV')
+
+	args = parser.parse_args()
+
+	if args.links <= 0:
+		raise ValueError("链路数必须为正数")
+	if args.duration <= 0:
+		raise ValueError("模拟时长必须为正数")
+
+	# 数据生成用random模块，丢包用各链路自己的模型
+	random.seed(args.seed)
+	seeds = np.random.default_rng(args.seed).integers(2**32, size=args.links)
+
+	trace = load_trace(args.trace) if args.loss_model == 'trace' and args.trace else None
+
+	def loss_model_factory(i):
+		if trace is not None:
+			return TraceLoss(trace, offset=int(seeds[i]))   # 各链路从轨迹的不同位置开始
+		return create_loss_model(args.loss_model, args.burst, args.trace, int(seeds[i]))
+
+	channel_env = channel_env_from_args(args)
+
+	scheduler = MultiLinkScheduler.build(
+		args.links, args.initial_error, args.max_error, args.merge_success, args.algorithm,
+		intervals=[interval / 1000 for interval in args.intervals],
+		channel_env=channel_env,
+		shared_env=not args.independent_env,
+		loss_model_factory=loss_model_factory,
+		air_time=args.air_time / 1000,
+		seed=args.seed
+	)
+	summary = scheduler.run(max_duration=args.duration)
+
+	print_interval_table(scheduler)
+	print(tabulate([[key, '-' if value is None else (f"{value:.3f}" if isinstance(value, float) else value)]
+					for key, value in summary.items()], headers=['统计项', '值'], tablefmt='grid'))
+	if args.output:
+		write_link_csv(scheduler.link_stats(), args.output)
+		print(f"每条链路的统计已保存到 {args.output}")
@@ -1,12 +1,46 @@
 import time
 import random
+import json
+import string
 import argparse
 from datetime import datetime
 
+from loss_models import BernoulliLoss, add_loss_arguments, create_loss_model
+from channel_env import add_env_arguments, channel_env_from_args
+from metrics import SimulationMetrics
+
+def format_timestamp(timestamp):
+	"""时间戳（秒）按 时:分:秒.毫秒 显示"""
+	return datetime.fromtimestamp(timestamp).strftime('%H:%M:%S.%f')[:-3]
+
+class LogFormatter(string.Formatter):
+	"""日志模板的格式化：除str.format的语法外，{!t}把时间戳参数显示为 时:分:秒.毫秒（没有时间戳时为N/A）"""
+	def convert_field(self, value, conversion):
+		if conversion == 't':
+			return format_timestamp(value) if value else "N/A"
+		return super().convert_field(value, conversion)
+
+LOG_FORMATTER = LogFormatter()
+
+class VirtualClock:
+	"""虚拟时钟：模拟器不再sleep，由调用者推进时间（单链路的run_simulation或多链路调度器）"""
+	def __init__(self, start=0.0):
+		self.now = start
+
+	def __call__(self):
+		return self.now
+
+	def advance(self, dt):
+		self.now += dt
+
 class MasterSlaveSimulator:
-	def __init__(self, initial_error_rate, max_error_rate, merge_success_rate, algorithm=1, speedup=5):
-		# 基础时间参数
-		base_connection_interval = 0.0225  # 通信事件间隔（原始时间）
+	def __init__(self, initial_error_rate, max_error_rate, merge_success_rate, algorithm=1, speedup=5, loss_model=None, channel_env=None,
+				 clock=None, verbose=True, base_connection_interval=0.0225):
+		# 时钟（默认为实际时间；VirtualClock时不sleep，由调用者推进），verbose=False时不输出逐事件日志
+		self.clock = clock if clock is not None else time.time
+		self.verbose = verbose
+		
+		# 基础时间参数（base_connection_interval为通信事件间隔，原始时间）
 		base_channel_update_interval = 1.5
 		self.base_timeout_duration = 4.0  # 基础超时时间（4秒，未加速）
 		
@@ -19,12 +53,12 @@ class MasterSlaveSimulator:
 		
 		# 算法选择 (1: 定时激活, 2: ACK确认后激活)
 		self.algorithm = algorithm
-		print(f"使用算法 {algorithm}: {'定时激活' if algorithm == 1 else 'ACK确认后激活'}")
-		print(f"核心特性: 两种算法均为每个channel map update生成唯一且固定的激活时间（生成后永不改变）")
-		print(f"算法1: 到达激活时间强制更新；算法2: 激活时间前收到ACK2则激活，超时则失效")
-		print(f"误包率规则: 激活时间点未更新且主从信道一致时，误包率保持在max_error rate")
-		print(f"空包特性: EMPTY_PACKET不会重传，即使丢失也不重传")
-		print(f"回退特性: 回退channel map且主从信道一致时，误包率保持在max_error rate")
+		self._log("使用算法 {}: {}", algorithm, '定时激活' if algorithm == 1 else 'ACK确认后激活', stamp=False)
+		self._log("核心特性: 两种算法均为每个channel map update生成唯一且固定的激活时间（生成后永不改变）", stamp=False)
+		self._log("算法1: 到达激活时间强制更新；算法2: 激活时间前收到ACK2则激活，超时则失效", stamp=False)
+		self._log("误包率规则: 激活时间点未更新且主从信道一致时，误包率保持在max_error rate", stamp=False)
+		self._log("空包特性: EMPTY_PACKET不会重传，即使丢失也不重传", stamp=False)
+		self._log("回退特性: 回退channel map且主从信道一致时，误包率保持在max_error rate", stamp=False)
 		
 		# 可配置参数
 		self.initial_error_rate = initial_error_rate
@@ -35,7 +69,7 @@ class MasterSlaveSimulator:
 		self.master_channel = 0
 		self.slave_channel = 0
 		self.last_master_channel = 0
-		self.last_channel_update_time = time.time()
+		self.last_channel_update_time = self.clock()
 		self.last_channel_activation_time = None
 		self.is_backed_off = False  # 标记是否处于回退状态
 		self.activation_time_missed = False  # 新增：标记是否错过激活时间点且未更新
@@ -67,17 +101,50 @@ class MasterSlaveSimulator:
 		self.current_error_rate = self.initial_error_rate
 		self.running = True
 		
+		# 丢包模型（默认每次独立按当前误包率丢包），见loss_models.py
+		self.loss_model = loss_model if loss_model is not None else BernoulliLoss()
+		
+		# 信道环境（见channel_env.py）：给出时主从信道一致时的误包率取当前信道在当前虚拟时间的实测丢包率
+		self.channel_env = channel_env
+		self.num_channels = channel_env.num_channels if channel_env is not None else 10
+		self.start_time = self.clock()
+		
 		# 断线检测
-		self.master_last_receive_time = time.time()  # Master最后收到任何数据/ACK1的时间
-		self.slave_last_receive_time = time.time()   # Slave最后收到任何数据的时间
+		self.master_last_receive_time = self.clock()  # Master最后收到任何数据/ACK1的时间
+		self.slave_last_receive_time = self.clock()   # Slave最后收到任何数据的时间
 		self.disconnected = False
 		self.disconnect_time = None
+		
+		# 性能统计（见metrics.py），只保存计数器和直方图
+		self.metrics = SimulationMetrics()
+		self.base_connection_interval = base_connection_interval
+		self.update_generated_event = {}  # 未完成的更新包: update_id → 生成时的事件序号
+		self.packet_first_event = 0       # 当前pending非空包第一次发送时的事件序号
+		self.mismatch_run = 0             # 当前主从信道不一致已持续的事件数
+
+	def _log(self, message='', *args, stamp=True):
+		"""
+		逐事件日志：message是str.format模板（时间戳参数用{!t}），args是原始值
+		格式化全部在这里进行，verbose关闭时直接返回；调用处只传原始值，不要预先格式化。
+		stamp时在前面加当前时间
+		"""
+		if not self.verbose:
+			return
+		if args:
+			message = LOG_FORMATTER.format(message, *args)
+		if stamp and message:
+			message = f"[{format_timestamp(time.time())}] {message}"
+		print(message)
+
+	def virtual_time(self):
+		"""模拟开始后经过的原始时间尺度时间（秒）"""
+		return (self.clock() - self.start_time) * self.speedup
 
 	def random_packet_loss(self):
-		return random.random() < self.current_error_rate
+		return self.loss_model.lost(self.current_error_rate)
 
 	def update_error_rate(self):
-		current_time = time.time()
+		current_time = self.clock()
 		
 		# 优先判断：激活时间点未更新且主从信道一致，保持最大误包率
 		if self.activation_time_missed and self.master_channel == self.slave_channel:
@@ -90,7 +157,9 @@ class MasterSlaveSimulator:
 			return
 				
 		# 正常状态下的误包率计算
-		if self.master_channel == self.slave_channel:
+		if self.master_channel == self.slave_channel and self.channel_env is not None:
+			self.current_error_rate = self.channel_env.loss_at(self.master_channel, self.virtual_time())
+		elif self.master_channel == self.slave_channel:
 			if not self.last_channel_activation_time:
 				self.current_error_rate = self.initial_error_rate
 				self.last_channel_activation_time=current_time
@@ -127,7 +196,7 @@ class MasterSlaveSimulator:
 		if self.disconnected:
 			return
 			
-		current_time = time.time()
+		current_time = self.clock()
 		
 		# 检查是否需要生成新的信道更新
 		if current_time - self.last_channel_update_time >= self.channel_update_interval:
@@ -137,24 +206,26 @@ class MasterSlaveSimulator:
 			
 			is_backed_off = False  # 标记本次更新是否为回退
 			if self.current_error_rate > self.max_error_rate:
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 误包率过高 ({self.current_error_rate:.2f})，回退到信道 {self.last_master_channel}")
+				self._log("Event ID: N/A - 误包率过高 ({:.2f})，回退到信道 {}", self.current_error_rate, self.last_master_channel)
 				new_channel = self.last_master_channel
 				is_backed_off = True
 				self.is_backed_off = True  # 设置回退状态
 			else:
 				self.last_master_channel = self.master_channel
-				new_channel = (self.master_channel + 1) % 10
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 生成新信道配置 {new_channel} (当前Master信道: {self.master_channel})")
+				new_channel = (self.master_channel + 1) % self.num_channels
+				self._log("Event ID: N/A - 生成新信道配置 {} (当前Master信道: {})", new_channel, self.master_channel)
 				self.is_backed_off = False  # 清除回退状态
 				self.activation_time_missed = False  # 新更新生成时清除未更新标记
 			
 			# 两种算法均为当前更新包生成唯一且固定的激活时间
 			update_id = self.channel_update_id
 			activation_time = current_time + self.channel_activation_delay
+			self.update_generated_event[update_id] = self.connection_event_counter
+			self.metrics.updates_generated += 1
 			self.scheduled_updates.append((activation_time, new_channel, update_id, is_backed_off))
 			
-			print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 为更新包 #{update_id} 确定激活时间: {datetime.fromtimestamp(activation_time).strftime('%H:%M:%S.%f')[:-3]} (此时间生成后永不改变)")
-			print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - {'算法1: 到达时间强制激活' if self.algorithm == 1 else '算法2: 需在激活时间前收到ACK2才会激活'}")
+			self._log("Event ID: N/A - 为更新包 #{} 确定激活时间: {!t} (此时间生成后永不改变)", update_id, activation_time)
+			self._log("Event ID: N/A - {}", '算法1: 到达时间强制激活' if self.algorithm == 1 else '算法2: 需在激活时间前收到ACK2才会激活')
 			
 			# 生成带编号的信道更新包
 			channel_update_pkg = f"CHANNEL_UPDATE_{new_channel}_{update_id}"
@@ -166,7 +237,7 @@ class MasterSlaveSimulator:
 		if self.disconnected or not self.scheduled_updates:
 			return
 			
-		current_time = time.time()
+		current_time = self.clock()
 		self.activation_time_missed = False  # 默认为未错过激活时间
 		
 		# 算法1: 检查所有计划中的更新是否到达激活时间（到点强制激活）
@@ -196,23 +267,34 @@ class MasterSlaveSimulator:
 				
 				# 打印激活信息
 				backoff_info = "（回退状态）" if is_backed_off else ""
-				print(f"\n[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 算法1信道激活时间到达 (更新包 #{update_id}) {backoff_info}:")
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 激活时间: {datetime.fromtimestamp(activation_time).strftime('%H:%M:%S.%f')[:-3]} (生成后未改变)")
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - Master信道变更: {old_master_channel} → {self.master_channel}")
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - Slave信道变更: {old_slave_channel} → {self.slave_channel}")
+				self._log()
+				self._log("Event ID: N/A - 算法1信道激活时间到达 (更新包 #{}) {}:", update_id, backoff_info)
+				self._log("Event ID: N/A - 激活时间: {!t} (生成后未改变)", activation_time)
+				self._log("Event ID: N/A - Master信道变更: {} → {}", old_master_channel, self.master_channel)
+				self._log("Event ID: N/A - Slave信道变更: {} → {}", old_slave_channel, self.slave_channel)
 				
 				# 关键逻辑：如果未成功更新且主从信道一致，设置未更新标记
 				if not update_successful and self.master_channel == self.slave_channel:
 					self.activation_time_missed = True
-					print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 激活时间点未更新信道且主从信道一致，误包率将保持在 {self.max_error_rate}")
+					self._log("Event ID: N/A - 激活时间点未更新信道且主从信道一致，误包率将保持在 {}", self.max_error_rate)
 				elif is_backed_off and self.master_channel == self.slave_channel:
-					print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 回退状态且信道一致，误包率将保持在 {self.max_error_rate}")
-				print("")
+					self._log("Event ID: N/A - 回退状态且信道一致，误包率将保持在 {}", self.max_error_rate)
+				self._log()
 				
 				# 移除已激活的更新并添加到历史记录
 				for update in to_activate:
 					self.processed_updates.append(update)
 					self.scheduled_updates.remove(update)
+				
+				# 统计：主从都在新信道上才算激活成功，同时到期的其它更新被取代
+				generated = self.update_generated_event.pop(update_id, self.connection_event_counter)
+				if self.master_channel == self.slave_channel == new_channel:
+					self.metrics.record_activation(self.connection_event_counter - generated)
+				else:
+					self.metrics.updates_failed += 1
+				for update in to_activate[1:]:
+					self.update_generated_event.pop(update[2], None)
+					self.metrics.updates_failed += 1
 					
 				self.last_channel_activation_time = current_time
 		
@@ -227,17 +309,20 @@ class MasterSlaveSimulator:
 					channels_unchanged = (self.master_channel != new_channel) or (self.slave_channel != new_channel)
 					self.activation_time_missed = channels_unchanged and (self.master_channel == self.slave_channel)
 					
-					print(f"\n[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 算法2更新包 #{update_id} 已过期:")
-					print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 激活时间: {datetime.fromtimestamp(activation_time).strftime('%H:%M:%S.%f')[:-3]} (生成后未改变)")
-					print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 未在激活时间前收到ACK2，更新失效")
+					self._log()
+					self._log("Event ID: N/A - 算法2更新包 #{} 已过期:", update_id)
+					self._log("Event ID: N/A - 激活时间: {!t} (生成后未改变)", activation_time)
+					self._log("Event ID: N/A - 未在激活时间前收到ACK2，更新失效")
 					
 					# 关键逻辑：如果未更新且主从信道一致，提示误包率保持最大
 					if self.activation_time_missed:
-						print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 激活时间点未更新信道且主从信道一致，误包率将保持在 {self.max_error_rate}")
-					print("")
+						self._log("Event ID: N/A - 激活时间点未更新信道且主从信道一致，误包率将保持在 {}", self.max_error_rate)
+					self._log()
 					
 					self.processed_updates.append(update)
 					self.scheduled_updates.remove(update)
+					self.update_generated_event.pop(update_id, None)
+					self.metrics.updates_failed += 1
 					
 					# 清除相关等待状态
 					if hasattr(self, '_waiting_for_ack1') and self._waiting_for_ack1 and self._master_pending_channel == new_channel:
@@ -281,7 +366,7 @@ class MasterSlaveSimulator:
 		if self.disconnected:
 			return
 			
-		current_time = time.time()
+		current_time = self.clock()
 		
 		# Master超时判断：超过4秒（原始时间）未收到任何数据或ACK1
 		master_timeout = current_time - self.master_last_receive_time > self.timeout_duration
@@ -291,11 +376,12 @@ class MasterSlaveSimulator:
 		if master_timeout or slave_timeout:
 			self.disconnected = True
 			self.disconnect_time = current_time
-			reason = (f"Master超过{self.base_timeout_duration}秒未收到数据或ACK1" 
-					 if master_timeout else f"Slave超过{self.base_timeout_duration}秒未收到数据")
-			print(f"\n[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 断线! 原因: {reason}")
-			print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 断线时信道: Master={self.master_channel}, Slave={self.slave_channel}")
-			print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 断线时间: {datetime.fromtimestamp(self.disconnect_time).strftime('%H:%M:%S.%f')[:-3]}")
+			self.metrics.record_disconnect(self.connection_event_counter)
+			self._log()
+			self._log("Event ID: N/A - 断线! 原因: {}超过{}秒未收到{}", "Master" if master_timeout else "Slave",
+					  self.base_timeout_duration, "数据或ACK1" if master_timeout else "数据")
+			self._log("Event ID: N/A - 断线时信道: Master={}, Slave={}", self.master_channel, self.slave_channel)
+			self._log("Event ID: N/A - 断线时间: {!t}", self.disconnect_time)
 
 	def process_communication_event(self):
 		"""处理单个通信事件"""
@@ -306,7 +392,7 @@ class MasterSlaveSimulator:
 		self.connection_event_counter += 1
 		current_event_id = self.event_id
 		self.event_id += 1
-		current_time = time.time()
+		current_time = self.clock()
 			
 		master_sent = None
 		is_channel_update = False
@@ -318,6 +404,8 @@ class MasterSlaveSimulator:
 		if self.master_pending_packet is not None and self.retransmit_needed:
 			master_sent = self.master_pending_packet
 			self.retransmit_count += 1
+			self.metrics.master_tx += 1
+			self.metrics.retransmissions += 1
 			is_channel_update = master_sent.startswith("CHANNEL_UPDATE_")
 			
 			# 提取重传包的编号
@@ -327,10 +415,11 @@ class MasterSlaveSimulator:
 			elif "Master_Data_" in master_sent:
 				received_packet_id = int(master_sent.split("_")[2])  # 提取数据编号
 			
-			print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Master重传: {master_sent} (重传次数: {self.retransmit_count}, 编号: {received_packet_id}, 误包率: {self.current_error_rate:.2f}, 当前信道: Master={self.master_channel}, Slave={self.slave_channel})")
+			self._log("通信事件 #{} | Event ID: {} - Master重传: {} (重传次数: {}, 编号: {}, 误包率: {:.2f}, 当前信道: Master={}, Slave={})", self.connection_event_counter, current_event_id, master_sent, self.retransmit_count, received_packet_id, self.current_error_rate, self.master_channel, self.slave_channel)
 			
 			if self.random_packet_loss():
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - 重传数据包丢失，将在下一个通信事件再次尝试")
+				self._log("通信事件 #{} | Event ID: {} - 重传数据包丢失，将在下一个通信事件再次尝试", self.connection_event_counter, current_event_id)
+				self.metrics.master_lost += 1
 				self.retransmit_needed = True
 				self.check_disconnection()
 				return
@@ -359,18 +448,21 @@ class MasterSlaveSimulator:
 				# 标记为pending并记录编号
 				self.master_pending_packet = master_sent
 				self.pending_packet_id = received_packet_id
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Master发送: {master_sent} (编号: {received_packet_id}, 误包率: {self.current_error_rate:.2f}, 当前信道: Master={self.master_channel}, Slave={self.slave_channel})")
+				self.packet_first_event = self.connection_event_counter
+				self._log("通信事件 #{} | Event ID: {} - Master发送: {} (编号: {}, 误包率: {:.2f}, 当前信道: Master={}, Slave={})", self.connection_event_counter, current_event_id, master_sent, received_packet_id, self.current_error_rate, self.master_channel, self.slave_channel)
 			else:
 				# 发送空包（空包不进入pending状态，不重传）
 				master_sent = "EMPTY_PACKET"
 				is_empty_packet = True
 				received_packet_id = self.ack1_counter  # 空包使用基础计数器作为编号
 				self.ack1_counter += 1
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Master无数据，发送空包 (编号: {received_packet_id}, 空包不重传，当前信道: Master={self.master_channel}, Slave={self.slave_channel})")
+				self._log("通信事件 #{} | Event ID: {} - Master无数据，发送空包 (编号: {}, 空包不重传，当前信道: Master={}, Slave={})", self.connection_event_counter, current_event_id, received_packet_id, self.master_channel, self.slave_channel)
 			
 			# 检查数据包是否丢失
+			self.metrics.master_tx += 1
 			if self.random_packet_loss():
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - {'空包丢失，不重传' if is_empty_packet else '数据包丢失，将在下一个通信事件重传'} (编号: {received_packet_id})")
+				self._log("通信事件 #{} | Event ID: {} - {} (编号: {})", self.connection_event_counter, current_event_id, '空包丢失，不重传' if is_empty_packet else '数据包丢失，将在下一个通信事件重传', received_packet_id)
+				self.metrics.master_lost += 1
 				if not is_empty_packet:
 					self.retransmit_needed = True
 				self.check_disconnection()
@@ -386,7 +478,7 @@ class MasterSlaveSimulator:
 			if is_channel_update and update_id is not None:
 				parts = master_sent.split("_")
 				new_channel = int(parts[2])
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Slave收到信道更新 ({new_channel}, 编号: {received_packet_id}) (当前信道: Slave={self.slave_channel})")
+				self._log("通信事件 #{} | Event ID: {} - Slave收到信道更新 ({}, 编号: {}) (当前信道: Slave={})", self.connection_event_counter, current_event_id, new_channel, received_packet_id, self.slave_channel)
 				
 				# 查找该更新包对应的激活时间和回退状态
 				activation_time = None
@@ -409,30 +501,27 @@ class MasterSlaveSimulator:
 				is_expired = False
 				if activation_time:
 					is_expired = current_time > activation_time
-					activation_status = f"已过激活时间({datetime.fromtimestamp(activation_time).strftime('%H:%M:%S.%f')[:-3]})" if is_expired else f"激活时间未到({datetime.fromtimestamp(activation_time).strftime('%H:%M:%S.%f')[:-3]})"
-					backoff_status = "（回退更新）" if is_backed_off else ""
-					print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - 信道更新检查: {activation_status} {backoff_status} (时间生成后未改变)")
+					self._log("通信事件 #{} | Event ID: {} - 信道更新检查: {}({!t}) {} (时间生成后未改变)", self.connection_event_counter, current_event_id,
+							  "已过激活时间" if is_expired else "激活时间未到", activation_time, "（回退更新）" if is_backed_off else "")
 				
 				# 处理逻辑：已过期则仅发送ACK1不更新
 				if is_expired:
-					print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - 信道更新已过期，Slave仅发送ACK1，不更新配置")
+					self._log("通信事件 #{} | Event ID: {} - 信道更新已过期，Slave仅发送ACK1，不更新配置", self.connection_event_counter, current_event_id)
 				else:
 					# 算法1：记录计划信道等待激活时间
 					if self.algorithm == 1:
 						self.slave_scheduled_channel = new_channel
-						activation_time_str = datetime.fromtimestamp(activation_time).strftime('%H:%M:%S.%f')[:-3]
-						print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Slave将在 {activation_time_str} 激活信道 {new_channel} (算法1定时激活)")
+						self._log("通信事件 #{} | Event ID: {} - Slave将在 {!t} 激活信道 {} (算法1定时激活)", self.connection_event_counter, current_event_id, activation_time, new_channel)
 					# 算法2：等待ACK2确认
 					elif self.algorithm == 2:
 						self.slave_pending_channel = new_channel
 						self.waiting_for_ack2 = True
-						activation_time_str = datetime.fromtimestamp(activation_time).strftime('%H:%M:%S.%f')[:-3]
-						print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Slave等待ACK2确认，需在 {activation_time_str} 前完成 (算法2)")
+						self._log("通信事件 #{} | Event ID: {} - Slave等待ACK2确认，需在 {!t} 前完成 (算法2)", self.connection_event_counter, current_event_id, activation_time)
 			
 			elif is_empty_packet:
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Slave收到空包 (编号: {received_packet_id}) (当前信道: Slave={self.slave_channel})")
+				self._log("通信事件 #{} | Event ID: {} - Slave收到空包 (编号: {}) (当前信道: Slave={})", self.connection_event_counter, current_event_id, received_packet_id, self.slave_channel)
 			else:
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Slave收到数据 (编号: {received_packet_id}) (当前信道: Slave={self.slave_channel})")
+				self._log("通信事件 #{} | Event ID: {} - Slave收到数据 (编号: {}) (当前信道: Slave={})", self.connection_event_counter, current_event_id, received_packet_id, self.slave_channel)
 			
 			# 生成Slave响应（无论是否过期都发送ACK1）
 			self.slave_generate_data()
@@ -447,12 +536,15 @@ class MasterSlaveSimulator:
 			if self.slave_send_queue:
 				slave_data = self.slave_send_queue.pop(0)
 			
-			response_info = f"{slave_data} ({ack1_str})" if slave_data else f"({ack1_str})"
-			print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Slave发送响应: {response_info}")
+			if slave_data:
+				self._log("通信事件 #{} | Event ID: {} - Slave发送响应: {} ({})", self.connection_event_counter, current_event_id, slave_data, ack1_str)
+			else:
+				self._log("通信事件 #{} | Event ID: {} - Slave发送响应: ({})", self.connection_event_counter, current_event_id, ack1_str)
 			
 			# 检查Slave响应是否丢失
 			if self.random_packet_loss():
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Slave响应丢失 (丢失ACK: {ack1_str})")
+				self._log("通信事件 #{} | Event ID: {} - Slave响应丢失 (丢失ACK: {})", self.connection_event_counter, current_event_id, ack1_str)
+				self.metrics.slave_lost += 1
 				if slave_data:
 					self.slave_send_queue.insert(0, slave_data)
 				if not is_empty_packet:
@@ -463,26 +555,28 @@ class MasterSlaveSimulator:
 			# Master收到响应，重置超时计时器
 			self.master_last_receive_time = current_time
 			ack2_sent = False
+			if not is_empty_packet:
+				self.metrics.record_ack1(self.connection_event_counter - self.packet_first_event + 1)
 			
 			# 仅在收到channel map的ACK1时才发送ACK2（算法2）
 			if is_channel_update and self.algorithm == 2 and not is_expired:
 				ack2_id = received_packet_id  # ACK2编号也与原始数据包编号一致
 				self.ack2_packet_id = max(self.ack2_packet_id, ack2_id + 1)  # 确保计数器同步
-				print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Master收到{ack1_str}，发送ACK2_{ack2_id}")
+				self._log("通信事件 #{} | Event ID: {} - Master收到{}，发送ACK2_{}", self.connection_event_counter, current_event_id, ack1_str, ack2_id)
 				ack2_sent = True
+				self.metrics.record_ack2(self.connection_event_counter - self.packet_first_event + 1)
 				
 				if not self.waiting_for_ack1:
 					self.master_pending_channel = int(master_sent.split("_")[2])
 					self.waiting_for_ack1 = True
-					activation_time_str = datetime.fromtimestamp(activation_time).strftime('%H:%M:%S.%f')[:-3] if activation_time else "N/A"
-					print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Master等待更新信道，需在 {activation_time_str} 前完成ACK2确认 (算法2)")
+					self._log("通信事件 #{} | Event ID: {} - Master等待更新信道，需在 {!t} 前完成ACK2确认 (算法2)", self.connection_event_counter, current_event_id, activation_time)
 			
 			# 非信道更新包或算法1不发送ACK2
 			else:
 				if is_channel_update and self.algorithm == 2 and is_expired:
-					print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - 信道更新已过期，不发送ACK2 (算法2)")
+					self._log("通信事件 #{} | Event ID: {} - 信道更新已过期，不发送ACK2 (算法2)", self.connection_event_counter, current_event_id)
 				else:
-					print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Master收到{ack1_str}，{'算法1不使用ACK2' if self.algorithm == 1 else '不发送ACK2'}")
+					self._log("通信事件 #{} | Event ID: {} - Master收到{}，{}", self.connection_event_counter, current_event_id, ack1_str, '算法1不使用ACK2' if self.algorithm == 1 else '不发送ACK2')
 			
 			# 处理信道更新的ACK2（算法2）
 			if is_channel_update and self.algorithm == 2 and ack2_sent and self.waiting_for_ack1 and not is_expired:
@@ -508,52 +602,89 @@ class MasterSlaveSimulator:
 							self.processed_updates.append(update)
 							self.scheduled_updates.remove(update)
 							break
+					generated = self.update_generated_event.pop(update_id, self.connection_event_counter)
+					self.metrics.record_activation(self.connection_event_counter - generated)
 					
 					backoff_info = "（回退状态）" if is_backed_off else ""
-					print(f"\n[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - 算法2信道激活完成 {backoff_info}:")
-					print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - 激活时间: {datetime.fromtimestamp(activation_time).strftime('%H:%M:%S.%f')[:-3]} (生成后未改变)")
-					print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Master信道变更: {old_master_channel} → {self.master_channel}")
-					print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - Slave信道变更: {old_slave_channel} → {self.slave_channel}")
+					self._log()
+					self._log("通信事件 #{} | Event ID: {} - 算法2信道激活完成 {}:", self.connection_event_counter, current_event_id, backoff_info)
+					self._log("通信事件 #{} | Event ID: {} - 激活时间: {!t} (生成后未改变)", self.connection_event_counter, current_event_id, activation_time)
+					self._log("通信事件 #{} | Event ID: {} - Master信道变更: {} → {}", self.connection_event_counter, current_event_id, old_master_channel, self.master_channel)
+					self._log("通信事件 #{} | Event ID: {} - Slave信道变更: {} → {}", self.connection_event_counter, current_event_id, old_slave_channel, self.slave_channel)
 					if is_backed_off and self.master_channel == self.slave_channel:
-						print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Event ID: N/A - 回退状态且信道一致，误包率将保持在 {self.max_error_rate}")
-					print("")
+						self._log("Event ID: N/A - 回退状态且信道一致，误包率将保持在 {}", self.max_error_rate)
+					self._log()
 			
 			# 清除非空包的pending状态
 			if not is_empty_packet:
 				self.master_pending_packet = None
 				self.pending_packet_id = None
 			self.retransmit_needed = False
-			print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] 通信事件 #{self.connection_event_counter} | Event ID: {current_event_id} - 完成本次通信事件处理\n")
+			self._log("通信事件 #{} | Event ID: {} - 完成本次通信事件处理\n", self.connection_event_counter, current_event_id)
+
+	def step(self):
+		"""处理一个通信事件周期（单链路循环和多链路调度器共用）"""
+		self.update_error_rate()
+		self.process_channel_update()
+		self.check_channel_activation()  # 检查激活或过期
+		self.master_generate_data()
+		self.process_communication_event()  # 每个循环处理一个通信事件
+		
+		# 主从信道不一致的持续时间
+		if self.master_channel != self.slave_channel:
+			self.metrics.mismatch_events += 1
+			self.metrics.mismatch_seconds += self.base_connection_interval
+			self.mismatch_run += 1
+		elif self.mismatch_run:
+			self.metrics.record_mismatch_run(self.mismatch_run)
+			self.mismatch_run = 0
+
+	def finish_metrics(self):
+		"""结束时补齐统计（未结束的不一致段、事件总数），返回self.metrics"""
+		if self.mismatch_run:
+			self.metrics.record_mismatch_run(self.mismatch_run)
+			self.mismatch_run = 0
+		self.metrics.runs = 1
+		self.metrics.events = self.connection_event_counter
+		return self.metrics
 
 	def run_simulation(self, max_duration=60):
 		print("启动主从通信模拟...")
 		print(f"初始信道状态: Master={self.master_channel}, Slave={self.slave_channel}")
 		print(f"参数: 初始误包率={self.initial_error_rate}, 最大误包率={self.max_error_rate}, 合并成功率={self.merge_success_rate}")
 		print(f"超时设置: Master/Slave {self.base_timeout_duration}秒(原始时间)未收到数据则断线")
+		print(f"丢包模型: {self.loss_model.name}")
 		print(f"加速倍数: {self.speedup}x\n")
 		
+		if self.channel_env is not None:
+			print(f"信道环境: {self.channel_env.num_frames} 帧 × {self.num_channels} 信道, 每帧 {self.channel_env.frame_period}s")
+		
 		actual_max_duration = max_duration / self.speedup
-		start_time = time.time()
+		wall_start = time.time()
+		start_time = self.clock()
+		self.start_time = start_time
 		
-		while self.running and time.time() - start_time < actual_max_duration and not self.disconnected:
-			self.update_error_rate()
-			self.process_channel_update()
-			self.check_channel_activation()  # 检查激活或过期
-			self.master_generate_data()
-			self.process_communication_event()  # 每个循环处理一个通信事件
-			time.sleep(self.connection_interval)  # 等待下一个通信事件周期
+		while self.running and self.clock() - start_time < actual_max_duration and not self.disconnected:
+			self.step()
+			# 等待下一个通信事件周期（虚拟时钟直接推进）
+			if isinstance(self.clock, VirtualClock):
+				self.clock.advance(self.connection_interval)
+			else:
+				time.sleep(self.connection_interval)
 		
 		print("\n模拟结束")
 		print(f"最终信道状态: Master={self.master_channel}, Slave={self.slave_channel}")
 		print(f"总通信事件数: {self.connection_event_counter}")
 		print(f"处理的通信事件总数: {self.event_id}")
+		metrics = self.finish_metrics()
+		for name, value in metrics.summary().items():
+			print(f"{name}: {'-' if value is None else round(value, 3)}")
 		if self.disconnected:
 			original_disconnect_time = start_time + (self.disconnect_time - start_time) * self.speedup
-			print(f"因断线提前结束。原始时间尺度断线时间: {datetime.fromtimestamp(original_disconnect_time).strftime('%H:%M:%S.%f')[:-3]}")
-			return self.connection_event_counter
+			print(f"因断线提前结束。原始时间尺度断线时间: {format_timestamp(original_disconnect_time)}")
 		else:
-			print(f"正常结束。原始时间尺度总时长: {max_duration}s, 实际运行时间: {time.time() - start_time:.2f}s")
-			return self.connection_event_counter
+			print(f"正常结束。原始时间尺度总时长: {max_duration}s, 实际运行时间: {time.time() - wall_start:.2f}s")
+		return metrics
 
 if __name__ == "__main__":
 	parser = argparse.ArgumentParser(description='激活时间未更新时保持最大误包率的主从通信模拟器')
@@ -563,6 +694,10 @@ if __name__ == "__main__":
 	parser.add_argument('--duration', type=int, default=60, help='原始时间尺度模拟时长 (秒)')
 	parser.add_argument('--algorithm', type=int, default=1, choices=[1, 2], 
 					  help='1: 定时激活（强制更新）; 2: ACK确认后激活 (默认1)')
+	parser.add_argument('--virtual-clock', action='store_true',
+					  help='按虚拟时间运行，不sleep（与--seed一起使用时结果可完全复现）')
+	add_loss_arguments(parser)
+	add_env_arguments(parser)
 	
 	args = parser.parse_args()
 	
@@ -576,11 +711,17 @@ if __name__ == "__main__":
 	if args.duration <= 0:
 		raise ValueError("模拟时长必须为正数")
 	
+	# 数据生成用random模块，丢包模型用自己的随机数发生器，两者都按--seed初始化
+	random.seed(args.seed)
 	simulator = MasterSlaveSimulator(
 		initial_error_rate=args.initial_error,
 		max_error_rate=args.max_error,
 		merge_success_rate=args.merge_success,
 		algorithm=args.algorithm,
-		speedup=5
+		speedup=5,
+		loss_model=create_loss_model(args.loss_model, args.burst, args.trace, args.seed),
+		channel_env=channel_env_from_args(args),
+		clock=VirtualClock(time.time()) if args.virtual_clock else None
 	)
-	print(simulator.run_simulation(max_duration=args.duration))
+	# 最后一行输出JSON格式的统计结果（main.py解析这一行）
+	print(json.dumps(simulator.run_simulation(max_duration=args.duration).to_dict()))
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from loss_models import BernoulliLoss, GilbertElliottLoss, LossModel
+
+SAMPLES = 200000
+RATES = [0.05, 0.3, 0.5, 0.8, 0.9, 0.97]
+
+@pytest.mark.parametrize('rate', RATES)
+@pytest.mark.parametrize('burst', [1.0, 4.0])
+def test_gilbert_lost_hits_target_rate(rate, burst):
+	model = GilbertElliottLoss(burst=burst, seed=1)
+	measured = np.mean([model.lost(rate) for _ in range(SAMPLES)])
+	assert measured == pytest.approx(rate, abs=0.015)
+
+@pytest.mark.parametrize('rate', RATES)
+@pytest.mark.parametrize('burst', [1.0, 4.0])
+def test_gilbert_draw_hits_target_rate(rate, burst):
+	model = GilbertElliottLoss(burst=burst, seed=2)
+	assert model.draw(SAMPLES, rate).mean() == pytest.approx(rate, abs=0.015)
+
+def test_gilbert_burst_length():
+	model = GilbertElliottLoss(burst=4.0, seed=3)
+	lost = np.array([model.lost(0.2) for _ in range(SAMPLES)])
+	# 坏状态段的平均长度
+	edges = np.diff(np.concatenate([[0], lost.astype(np.int8), [0]]))
+	runs = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+	assert runs.mean() == pytest.approx(4.0, rel=0.05)
+
+@pytest.mark.parametrize('model', [GilbertElliottLoss(seed=4), BernoulliLoss(seed=4)])
+def test_edge_rates(model):
+	assert all(model.lost(1.0) for _ in range(1000))
+	assert model.draw(1000, 1.0).all()
+	assert not any(model.lost(0.0) for _ in range(1000))
+	assert not model.draw(1000, 0.0).any()
+
+def test_incomplete_model_rejected():
+	class DrawOnly(LossModel):
+		def draw(self, n, error_rate):
+			return np.zeros(n, dtype=bool)
+	with pytest.raises(TypeError):
+		DrawOnly()
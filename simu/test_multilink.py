@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from simu import MasterSlaveSimulator, VirtualClock
+from loss_models import BernoulliLoss
+from multilink import MultiLinkScheduler
+
+INTERVAL = 0.0225
+
+def make_scheduler(count, air_time, offsets):
+	random.seed(1)
+	clock = VirtualClock()
+	links = [MasterSlaveSimulator(0.0, 0.5, 0.5, 1, speedup=1, loss_model=BernoulliLoss(seed=i), clock=clock,
+								  verbose=False, base_connection_interval=INTERVAL) for i in range(count)]
+	return MultiLinkScheduler(links, clock, air_time, offsets)
+
+def test_contended_links_all_run():
+	# 两条链路的锚点完全重合：后一条每次都被推迟，但不能一个事件都跑不了
+	scheduler = make_scheduler(2, 0.001, [0.0, 0.0])
+	scheduler.run(max_duration=1.0)
+	events = [link.connection_event_counter for link in scheduler.links]
+	assert events[0] == pytest.approx(events[1], abs=1)
+	assert min(events) > 0
+	assert scheduler.deferred[0] == 0
+	assert scheduler.deferred[1] == pytest.approx(events[1], abs=1)
+	assert scheduler.defer_time[1] / scheduler.deferred[1] == pytest.approx(0.001)
+
+def test_deferred_events_queue_in_slots():
+	# K条链路同时到达：按到达顺序依次预约空口，第k条推迟k个air_time
+	count, air_time = 10, 0.001
+	scheduler = make_scheduler(count, air_time, [0.0] * count)
+	scheduler.run(max_duration=INTERVAL / 2)
+	assert [link.connection_event_counter for link in scheduler.links] == [1] * count
+	for i in range(count):
+		assert scheduler.defer_time[i] == pytest.approx(i * air_time)
+	assert scheduler.skipped.sum() == 0
+
+def test_overloaded_air_skips_anchors():
+	# 空口过载（每个间隔只能容纳一部分事件）时所有链路仍轮流得到时隙，错过的锚点记入skipped
+	count = 30
+	scheduler = make_scheduler(count, INTERVAL / 10, [i * INTERVAL / count for i in range(count)])
+	scheduler.run(max_duration=2.0)
+	events = [link.connection_event_counter for link in scheduler.links]
+	assert min(events) > 0
+	assert scheduler.skipped.sum() > 0
+	assert sum(events) <= 2.0 / (INTERVAL / 10) + count